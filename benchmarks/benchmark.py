@@ -0,0 +1,262 @@
+"""
+Benchmarks for the overhead of GridSearcher itself, runnable on a machine without GPUs (the GPU ids are fake and the runs are a
+sleeping Python script instead of a training script).
+
+Usage:
+    python benchmarks/benchmark.py all                                  # all benchmarks with the default sizes
+    python benchmarks/benchmark.py all --quick                          # smaller sizes, e.g. for a quick check
+    python benchmarks/benchmark.py expansion --points 1000000           # a single benchmark
+    python benchmarks/benchmark.py all --save base.json                 # save the results as a baseline
+    python benchmarks/benchmark.py all --compare base.json --tolerance 0.2  # exit with code 1 if a throughput dropped by more than 20%
+
+Each benchmark case runs in its own process, such that the peak memory (RSS) is measured separately for each case.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+from string import Template
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine, LogConfig
+from gridsearcher.ledger import RunLedger
+from gridsearcher.file_locker import FileLock
+from gridsearcher.tools import build_final_cmd
+
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+def peak_rss_mb():
+    """
+        Returns the peak resident memory of the current process in MiB (None on Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10 # bytes on macOS, KiB on Linux
+
+def make_grid(n_points, root):
+    """
+        Returns a GridSearcher and a SchedulingConfig whose grid has `n_points` points (a power of 10), with templates for the
+        experiment folder and for two parameters, as in a typical experiment.
+    """
+    dims = max(1, len(str(n_points)) - 1)
+    assert n_points == 10 ** dims, 'The number of points must be a power of 10'
+    gs = GridSearcher(script='train.py', defaults=dict(batch_size=128, epochs=10, lr_decay_at=[82, 123]))
+    gs.add_param('wandb_project', 'benchmark')
+    gs.add_param('wandb_group', Template('E=${epochs}_bs=${batch_size}_p0=${p0}'))
+    gs.add_param('wandb_name', Template('p1=${p1}_p2=${p2}'))
+    gs.exp_folder_template = Template(os.path.join(root, '${wandb_group}', '${wandb_name}', '_'.join(f'${{p{i}}}' for i in range(dims))))
+    params_values = {f'p{i}': list(range(10)) for i in range(dims)}
+    for i in range(dims, 3): # the templates use p0, p1 and p2
+        params_values[f'p{i}'] = [0]
+    cfg_sched = SchedulingConfig(distributed_training=True, max_jobs_per_gpu=1, gpus=[0, 1, 2, 3], params_values=params_values)
+    return gs, cfg_sched
+
+def bench_expansion(args):
+    """
+        Expands the grid and renders the final command of each point, without storing the points.
+    """
+    gs, cfg_sched = make_grid(args.points, '/tmp/results')
+    cfg_torchrun = TorchRunConfig()
+    start = time.perf_counter()
+    n = 0
+    for point in gs._expand_grid('root_folder', cfg_sched):
+        build_final_cmd(gs.exe, point.cmd, cfg_sched.gpus, cfg_torchrun)
+        n += 1
+    elapsed = time.perf_counter() - start
+    return dict(points=n, seconds=elapsed, points_per_second=n / elapsed, peak_rss_mb=peak_rss_mb())
+
+def bench_resume(args):
+    """
+        Checks which points of a grid were already finished, once with the state.finished files of a results tree where half of the
+        points are finished and once with a run ledger.
+    """
+    root = tempfile.mkdtemp(prefix='gs-bench-resume-')
+    try:
+        gs, cfg_sched = make_grid(args.points, root)
+        points = list(gs._expand_grid('root_folder', cfg_sched))
+        for point in points[::2]:
+            os.makedirs(point.root, exist_ok=True)
+            open(os.path.join(point.root, 'state.finished'), 'w').close()
+
+        result = dict(points=len(points))
+        start = time.perf_counter()
+        counts = dict(total=0, runnable=0)
+        for _ in GridSearcher._skip_finished(points, counts):
+            pass
+        elapsed = time.perf_counter() - start
+        result.update(files_seconds=elapsed, files_checks_per_second=len(points) / elapsed, runnable=counts['runnable'])
+
+        ledger_path = os.path.join(root, 'ledger.jsonl')
+        for _ in GridSearcher._skip_finished(points, dict(total=0, runnable=0), RunLedger(ledger_path)): # imports the state.finished files
+            pass
+        start = time.perf_counter()
+        for _ in GridSearcher._skip_finished(points, dict(total=0, runnable=0), RunLedger(ledger_path)):
+            pass
+        elapsed = time.perf_counter() - start
+        result.update(ledger_seconds=elapsed, ledger_checks_per_second=len(points) / elapsed, peak_rss_mb=peak_rss_mb())
+        return result
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def _lock_worker(path, counter, iterations, out):
+    waits = []
+    lock = FileLock(path)
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with lock:
+            waits.append(time.perf_counter() - start)
+            with open(counter) as f:
+                value = int(f.read() or 0)
+            with open(counter, 'w') as f:
+                f.write(str(value + 1))
+    with open(out, 'w') as f:
+        json.dump(waits, f)
+
+def bench_locks(args):
+    """
+        Starts `workers` processes that increment a counter file under the same FileLock and measures the acquisitions per second
+        and the time spent waiting for the lock.
+    """
+    folder = tempfile.mkdtemp(prefix='gs-bench-locks-')
+    try:
+        counter = os.path.join(folder, 'counter')
+        open(counter, 'w').close()
+        outs = [os.path.join(folder, f'waits{i}.json') for i in range(args.workers)]
+        procs = [Process(target=_lock_worker, args=(os.path.join(folder, 'lock'), counter, args.iterations, out)) for out in outs]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - start
+        waits = sorted(w for out in outs for w in json.load(open(out)))
+        with open(counter) as f:
+            total = int(f.read())
+        assert total == args.workers * args.iterations, f'Lost updates: {total} != {args.workers * args.iterations}'
+        return dict(workers=args.workers, acquisitions=total, seconds=elapsed, acquisitions_per_second=total / elapsed,
+                    wait_mean_ms=1e3 * sum(waits) / len(waits), wait_p95_ms=1e3 * waits[int(0.95 * (len(waits) - 1))])
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def bench_launcher(args):
+    """
+        Runs a grid end to end with fake GPU ids and a script that only sleeps, then measures the throughput and the time the GPU
+        slots were idle (from the trace of the runs).
+    """
+    folder = tempfile.mkdtemp(prefix='gs-bench-launcher-')
+    try:
+        script = os.path.join(folder, 'sleep.py')
+        with open(script, 'w') as w:
+            w.write('import sys, time\ntime.sleep(float(sys.argv[sys.argv.index("--sleep") + 1]))\n')
+        gs = GridSearcher(script=script)
+        gs.add_param('sleep', args.sleep)
+        n_slots = args.gpus * args.jobs_per_gpu
+        cfg_sched = SchedulingConfig(distributed_training=False, max_jobs_per_gpu=args.jobs_per_gpu, gpus=list(range(args.gpus)),
+                                     params_values=dict(i=list(range(args.runs))))
+        trace = os.path.join(folder, 'trace.json')
+
+        start = time.perf_counter()
+        gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(folder, 'results', '${i}')), cfg_sched=cfg_sched,
+               cfg_torchrun=TorchRunConfig(torchrun=False), streaming=True, engine=GSEngine[args.engine.upper()], logs=LogConfig(),
+               trace=trace)
+        elapsed = time.perf_counter() - start
+
+        events = json.load(open(trace))['traceEvents']
+        busy = sum(e['dur'] for e in events if e.get('ph') == 'X' and e['name'] == 'run') / 1e6
+        ideal = -(-args.runs // n_slots) * args.sleep # ceil(runs / slots) waves of the sleep duration
+        return dict(engine=args.engine, runs=args.runs, slots=n_slots, seconds=elapsed, jobs_per_second=args.runs / elapsed,
+                    slot_idle_seconds=n_slots * elapsed - busy, slot_idle_fraction=1 - busy / (n_slots * elapsed),
+                    overhead_per_run_ms=1e3 * (elapsed - ideal) * n_slots / args.runs, peak_rss_mb=peak_rss_mb())
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+BENCHMARKS = dict(expansion=bench_expansion, resume=bench_resume, locks=bench_locks, launcher=bench_launcher)
+
+def suite(quick):
+    """
+        Returns the list of benchmark cases (command line arguments) run by the "all" command.
+    """
+    sizes = [10**3, 10**4] if quick else [10**3, 10**4, 10**5, 10**6]
+    cases = [['expansion', '--points', str(n)] for n in sizes]
+    cases += [['resume', '--points', str(n)] for n in ([10**3] if quick else [10**3, 10**4, 10**5])]
+    cases += [['locks', '--workers', str(w), '--iterations', '100' if quick else '500'] for w in [2, 8, 32]]
+    runs = '64' if quick else '256'
+    cases += [['launcher', '--engine', engine, '--runs', runs, '--gpus', '8', '--jobs-per-gpu', '2', '--sleep', '0.2']
+              for engine in ['pool', 'asyncio']]
+    return cases
+
+def run_case(case):
+    """
+        Runs a benchmark case in a new process and returns its result.
+    """
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__)] + case, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f'Benchmark {" ".join(case)} failed:\n{proc.stdout[-2000:]}\n{proc.stderr[-2000:]}')
+
+def compare(results, baseline, tolerance):
+    """
+        Returns the list of the throughput metrics (keys ending with "_per_second") that dropped by more than `tolerance` (relative).
+    """
+    regressions = []
+    for name, result in results.items():
+        for key, value in result.items():
+            old = baseline.get(name, {}).get(key)
+            if key.endswith('_per_second') and old is not None and value < (1 - tolerance) * old:
+                regressions.append(f'{name} {key}: {value:.1f} < {old:.1f}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the overhead of GridSearcher')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('all')
+    p.add_argument('--quick', action='store_true')
+    p.add_argument('--save', type=str, default=None, help='write the results to this JSON file')
+    p.add_argument('--compare', type=str, default=None, help='compare the throughputs to the results in this JSON file')
+    p.add_argument('--tolerance', type=float, default=0.2)
+    p = sub.add_parser('expansion')
+    p.add_argument('--points', type=int, default=10**5)
+    p = sub.add_parser('resume')
+    p.add_argument('--points', type=int, default=10**4)
+    p = sub.add_parser('locks')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--iterations', type=int, default=500)
+    p = sub.add_parser('launcher')
+    p.add_argument('--engine', choices=['pool', 'asyncio'], default='pool')
+    p.add_argument('--runs', type=int, default=256)
+    p.add_argument('--gpus', type=int, default=8)
+    p.add_argument('--jobs-per-gpu', type=int, default=2)
+    p.add_argument('--sleep', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command != 'all':
+        print(RESULT_PREFIX + json.dumps(BENCHMARKS[args.command](args)))
+        return
+
+    results = {}
+    for case in suite(args.quick):
+        name = ' '.join(case)
+        results[name] = run_case(case)
+        print(f'{name}\n    ' + '  '.join(f'{k}={v:.4g}' if type(v) is float else f'{k}={v}' for k, v in results[name].items()), flush=True)
+
+    if args.save is not None:
+        with open(args.save, 'w') as w:
+            json.dump(results, w, indent=4)
+    if args.compare is not None:
+        regressions = compare(results, json.load(open(args.compare)), args.tolerance)
+        for r in regressions:
+            print(f'REGRESSION {r}')
+        sys.exit(1 if len(regressions) > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,43 @@
-from .sbatch import SBATCH
-from .gridsearcher import GridSearcher
-from .tools import GSExe, GSKeyValSep
-from .configs import SchedulingConfig, TorchRunConfig
-
-__all__ = [
-    'SBATCH',
-    'GridSearcher',
-    'GSExe',
-    'GSKeyValSep',
-    'SchedulingConfig',
-    'TorchRunConfig',
-]
+from .sbatch import SBATCH
+from .gridsearcher import GridSearcher
+from .tools import GSExe, GSKeyValSep, GSEngine, GSSampling, GSFailure
+from .configs import SchedulingConfig, TorchRunConfig, SamplingConfig, HalvingConfig, ShardConfig, SlurmConfig, LogConfig, TelemetryConfig, OrderingConfig, CacheConfig, RetryConfig, AutoTuneConfig, ShutdownConfig, Host
+from .hosts import Transport, SSHTransport, LocalTransport
+from .gpu_probe import GPUProbe, GPUStats, NvidiaSmiProbe, NVMLProbe, FakeProbe
+from .sampling import Uniform, LogUniform
+from .search_space import Choice
+
+__all__ = [
+    'SBATCH',
+    'GridSearcher',
+    'GSExe',
+    'GSKeyValSep',
+    'GSEngine',
+    'GSSampling',
+    'GSFailure',
+    'SchedulingConfig',
+    'TorchRunConfig',
+    'SamplingConfig',
+    'HalvingConfig',
+    'ShardConfig',
+    'SlurmConfig',
+    'LogConfig',
+    'TelemetryConfig',
+    'OrderingConfig',
+    'CacheConfig',
+    'RetryConfig',
+    'AutoTuneConfig',
+    'ShutdownConfig',
+    'Host',
+    'Transport',
+    'SSHTransport',
+    'LocalTransport',
+    'GPUProbe',
+    'GPUStats',
+    'NvidiaSmiProbe',
+    'NVMLProbe',
+    'FakeProbe',
+    'Uniform',
+    'LogUniform',
+    'Choice',
+]
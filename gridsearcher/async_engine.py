@@ -0,0 +1,187 @@
+import time
+import asyncio
+from .tools import GSFailure, RunResult, build_final_cmd, prepare_root, mark_finished, launch_failure
+from .scheduler import PointQueue, create_scheduler, gpus_for_point, memory_for_point
+from .ports import create_port_allocator
+from .run_logs import RunOutput
+from .retries import RetryPolicy
+from .autotune import ConcurrencyTuner
+
+class AsyncLauncher:
+    """
+    Description:
+        Runs the points of a grid from a single asyncio event loop. Each command is started with `asyncio.create_subprocess_shell`
+        (the same shell command as the pool engine, but no worker process per run) and the exit codes, durations and GPU slots are tracked in-process,
+        which allows supervising hundreds of concurrent runs with negligible overhead.
+    Attributes:
+        exe (str): the executable used when torchrun is disabled (python3 or composer)
+        cfg_sched (SchedulingConfig): the scheduling configuration
+        cfg_torchrun (TorchRunConfig): the torchrun configuration
+        create_state_finished (bool): whether to create the file "state.finished" for the runs that exit with code 0
+        listeners (List[RunListener]): objects that are notified when a run is launched and when it exits
+        cfg_logs (LogConfig): if set, the output of the runs is written to log files in their root folders instead of the console
+        retry_policy (RetryPolicy): if set, decides which failed runs are started again
+        shutdown (ShutdownHandler): if set, the runs are started in their own process group and no new run is started once a signal was
+                                    received (the handler forwards it to the running runs)
+    """
+    def __init__(self, exe, cfg_sched, cfg_torchrun, create_state_finished=True, listeners=(), cfg_logs=None, cfg_retries=None,
+                 shutdown=None):
+        self.exe = exe
+        self.cfg_sched = cfg_sched
+        self.cfg_torchrun = cfg_torchrun
+        self.create_state_finished = create_state_finished
+        self.listeners = list(listeners)
+        self.cfg_logs = cfg_logs
+        self.retry_policy = None if cfg_retries is None else RetryPolicy(cfg_retries, cfg_logs)
+        self.shutdown = shutdown
+        self.scheduler = create_scheduler(cfg_sched)
+        self.tuner = None
+        if cfg_sched.autotune is not None:
+            self.tuner = ConcurrencyTuner(cfg_sched.autotune, self.scheduler, cfg_sched.max_jobs_per_gpu)
+            self.listeners.append(self.tuner)
+        self.ports = create_port_allocator(cfg_torchrun) # None if the runs use the fixed master_port
+        self.results = []
+
+    def run(self, points):
+        """
+        Description:
+            Runs all points and blocks until they finish.
+
+        Args:
+            :param points: an iterable of GridPoint objects, consumed lazily when GPU slots become free
+            :return: a list of RunResult objects, in the order the runs finished
+        """
+        if self.tuner is not None:
+            self.tuner.start()
+        try:
+            asyncio.run(self._dispatch(points))
+        finally:
+            if self.tuner is not None:
+                self.tuner.stop()
+        return self.results
+
+    async def _dispatch(self, points):
+        queue = PointQueue(points, lambda point: gpus_for_point(point, self.cfg_sched), self.cfg_sched.lookahead,
+                           lambda point: memory_for_point(point, self.cfg_sched))
+        slot_freed = asyncio.Condition()
+        tasks = set()
+        last_launch = None
+
+        # with retries, a running point might come back to the queue, so the loop also waits for the running points
+        while not queue.empty() or (self.retry_policy is not None and len(tasks) > 0):
+            async with slot_freed: # returns the point and its GPU ids once a pending point fits on the free slots
+                placed = await self._wait_placeable(queue, slot_freed)
+            if self.shutdown is not None and self.shutdown.requested: # the pending points are left for the next launch
+                if placed is not None:
+                    self.scheduler.release(placed[1])
+                break
+            if placed is None: # all runs finished without being retried
+                continue
+            point, gpus = placed
+
+            if self.cfg_sched.warmup_seconds > 0 and last_launch is not None:
+                # give the previous script some time to allocate its GPU memory
+                await asyncio.sleep(max(0., last_launch + self.cfg_sched.warmup_seconds - time.monotonic()))
+            last_launch = time.monotonic()
+
+            for listener in self.listeners:
+                listener.on_launch(point, gpus)
+
+            task = asyncio.create_task(self._run_point(point, gpus, slot_freed, queue))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if len(tasks) > 0:
+            await asyncio.gather(*tasks)
+
+    async def _wait_placeable(self, queue, slot_freed):
+        """
+            Waits until a pending point can be placed. The points are checked again when a run exits and, if the GPUs are probed,
+            every `poll_interval` seconds, since memory can also be freed by other processes. With retries, auto-tuning or signal handling,
+            the points are also checked every second (for the retries whose delay passed and the slots added by the tuner) and None is
+            returned once no point is pending or running, or once a signal was received. Must be called with the condition held.
+        """
+        poll = self.scheduler.poll_interval
+        if self.retry_policy is not None or self.tuner is not None or self.shutdown is not None:
+            poll = 1. if poll is None else min(poll, 1.)
+        if poll is None:
+            return await slot_freed.wait_for(lambda: queue.pop_placeable(self.scheduler))
+        placed = queue.pop_placeable(self.scheduler)
+        while placed is None:
+            if (queue.empty() and self.scheduler.busy() == 0) or (self.shutdown is not None and self.shutdown.requested):
+                return None
+            try:
+                await asyncio.wait_for(slot_freed.wait(), poll)
+            except asyncio.TimeoutError:
+                pass
+            placed = queue.pop_placeable(self.scheduler)
+        return placed
+
+    async def _run_point(self, point, gpus, slot_freed, queue):
+        port = None
+        setup = time.time()
+        try:
+            try:
+                port = None if self.ports is None else self.ports.acquire()
+                result = await self._start(point, gpus, port, setup)
+            except Exception as e: # e.g. the root folder could not be prepared, the run is reported like any other failed run
+                print(f'[GridSearcher] could not start the run in {point.root}: {e}')
+                result = launch_failure(point, gpus, e, setup)
+            self.results.append(result)
+
+            interrupted = self.shutdown is not None and self.shutdown.on_exit(result)
+            if self.retry_policy is not None and not interrupted:
+                retry = self.retry_policy.on_exit(result)
+                if retry is not None:
+                    queue.push_later(*retry)
+            for listener in self.listeners:
+                listener.on_exit(result)
+        finally:
+            if port is not None:
+                self.ports.release(port)
+            self.scheduler.release(gpus)
+            async with slot_freed:
+                slot_freed.notify_all()
+
+    async def _start(self, point, gpus, port, setup):
+        """
+            Prepares the root folder of the point, runs its command and returns its RunResult once it exited.
+        """
+        prepare_root(point)
+        final_cmd = build_final_cmd(self.exe, point.cmd, gpus, self.cfg_torchrun, port)
+
+        output = None
+        if self.cfg_logs is None:
+            print(final_cmd)
+        else:
+            output = RunOutput(point.root, self.cfg_logs)
+            output.write('stdout', f'{final_cmd}\n'.encode())
+
+        start = time.time()
+        failure = None
+        new_session = self.shutdown is not None # the handler forwards the signals to the process group of the run
+        try:
+            if output is None:
+                proc = await asyncio.create_subprocess_shell(final_cmd, start_new_session=new_session)
+                if new_session:
+                    self.shutdown.register(point, proc.pid)
+            else: # the pipes are drained by the event loop while the process runs
+                proc = await asyncio.create_subprocess_shell(final_cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+                                                             stderr=asyncio.subprocess.PIPE, start_new_session=new_session)
+                if new_session:
+                    self.shutdown.register(point, proc.pid)
+                await asyncio.gather(output.pump_async('stdout', proc.stdout), output.pump_async('stderr', proc.stderr))
+            code = await proc.wait()
+        except OSError as e: # e.g. the shell could not be started (too many processes)
+            print(f'[GridSearcher] could not start {final_cmd}: {e}')
+            if output is not None:
+                output.write('stderr', f'could not start {final_cmd}: {e}\n'.encode())
+            code, failure = 127, GSFailure.LAUNCH
+        tail = None
+        if output is not None:
+            output.close()
+            tail = output.tail.get()
+
+        if code == 0 and self.create_state_finished:
+            mark_finished(point.root)
+        return RunResult(point=point, gpus=gpus, code=code, start=start, end=time.time(), tail=tail, setup=setup, failure=failure)
@@ -0,0 +1,176 @@
+import os
+import time
+import threading
+from .tools import RunListener
+
+def read_progress(path):
+    """
+        Returns the number on the last line of a progress file, None if the file does not exist (yet) or is being written.
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().strip().splitlines()
+        return float(lines[-1]) if len(lines) > 0 else None
+    except (OSError, ValueError):
+        return None
+
+class ConcurrencyTuner(RunListener):
+    """
+    Description:
+        Adapts the number of runs per GPU to the throughput of the grid (see AutoTuneConfig). It starts with `min_jobs_per_gpu` slots per
+        GPU and measures the aggregate throughput over a window of `interval` seconds, which starts `settle` seconds after each change.
+        While the throughput grows by at least `min_gain` and the GPUs are not saturated, one more slot per GPU is added (up to the
+        `max_jobs_per_gpu` of the SchedulingConfig). Once a level is not better than the best one, the tuner goes back to the best level.
+
+        After that, the tuner keeps measuring each window and compares the throughput per slot (the throughput divided by the number of
+        runs per GPU) with the one of the best level. If it drops by more than `min_gain` while all slots are busy (e.g. the GPUs are
+        shared with other jobs or the later runs of the grid are heavier), one slot per GPU is removed, down to `min_jobs_per_gpu`. If it
+        grows by more than `min_gain` (e.g. the later runs are lighter), the tuner starts climbing again from the current level.
+
+        The throughput is the number of runs completed per hour or, if the script reports its progress (a cumulative number, e.g. the
+        training steps, on the last line of `progress_file` in its root folder), the progress made by all runs per hour.
+    Attributes:
+        cfg (AutoTuneConfig): the tuning configuration
+        scheduler (GPUSlotScheduler): the scheduler whose slots per GPU are changed
+        upper (int): the maximum number of runs per GPU
+        level (int): the current number of runs per GPU
+        best_level (int): the level with the highest throughput so far
+        converged (bool): whether the tuner stopped climbing, from then on it only watches the throughput per slot
+        reference (float): the throughput per slot of the best level when the tuner converged
+        history (List[dict]): the measured level, throughput and utilization of each window
+    """
+    def __init__(self, cfg, scheduler, upper):
+        self.cfg = cfg
+        self.scheduler = scheduler
+        self.upper = upper
+        self.level = min(cfg.min_jobs_per_gpu, upper)
+        self.best_level = None
+        self.best_throughput = None
+        self.converged = False
+        self.reference = None
+        self.history = []
+        self.progress = {} # (index, root) -> last progress read for the running runs
+        self.work = 0.
+        self.level_start = None
+        self.window_start = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+            Sets the initial number of runs per GPU and starts the thread that measures the throughput.
+        """
+        self._set_level(self.level)
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def on_launch(self, point, gpus):
+        if self.cfg.progress_file is not None:
+            progress = read_progress(os.path.join(point.root, self.cfg.progress_file))
+            with self._lock: # a resumed run might start from the progress of its checkpoint
+                self.progress[(point.index, point.root)] = 0. if progress is None else progress
+
+    def on_exit(self, result):
+        with self._lock:
+            if self.cfg.progress_file is not None:
+                key = (result.point.index, result.point.root)
+                self._update_progress(key, self.progress.pop(key, None))
+            elif result.code == 0:
+                self.work += 1
+
+    def step(self, now=None):
+        """
+            Reads the progress of the running runs and, at the end of a measurement window, evaluates the current level.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.cfg.progress_file is not None:
+                for key, last in list(self.progress.items()):
+                    self._update_progress(key, last)
+            if now - self.level_start < self.cfg.settle: # the runs started before the change are still running
+                self.work = 0.
+                self.window_start = now
+                return
+            if now - self.window_start < self.cfg.interval:
+                return
+            throughput = 3600 * self.work / (now - self.window_start)
+        self.evaluate(throughput)
+
+    def evaluate(self, throughput):
+        """
+            Decides the next level from the throughput measured at the current level.
+        """
+        utilization = self._utilization()
+        self.history.append(dict(level=self.level, throughput=throughput, utilization=utilization))
+        info = f'{self.level} runs/GPU: {throughput:.1f} {"runs" if self.cfg.progress_file is None else "progress"}/hour' + \
+               ('' if utilization is None else f', utilization {utilization:.0f}%')
+        if self.converged:
+            self._watch(throughput, utilization, info)
+            return
+
+        if self.best_throughput is None or throughput > self.best_throughput * (1 + self.cfg.min_gain):
+            self.best_level, self.best_throughput = self.level, throughput
+            if self.level < self.upper and (utilization is None or utilization < self.cfg.saturation):
+                print(f'[GridSearcher] auto-tuning: {info}, trying {self.level + 1} runs/GPU')
+                self._set_level(self.level + 1)
+                return
+        print(f'[GridSearcher] auto-tuning: {info}, keeping {self.best_level} runs/GPU')
+        self.converged = True
+        self.reference = self.best_throughput / self.best_level
+        if self.level != self.best_level:
+            self._set_level(self.best_level)
+
+    def _watch(self, throughput, utilization, info):
+        """
+            Compares the throughput per slot of a window measured after the convergence with the reference, steps down if it degraded
+            and climbs again if it improved.
+        """
+        per_slot = throughput / self.level
+        full = self.scheduler.busy() >= self.scheduler.total_slots() # otherwise, the grid does not have enough pending runs to judge
+        if per_slot < self.reference * (1 - self.cfg.min_gain) and full and self.level > self.cfg.min_jobs_per_gpu:
+            print(f'[GridSearcher] auto-tuning: {info}, the throughput per slot degraded, trying {self.level - 1} runs/GPU')
+            self._set_level(self.level - 1)
+        elif per_slot > self.reference * (1 + self.cfg.min_gain) and self.level < self.upper and \
+                (utilization is None or utilization < self.cfg.saturation):
+            print(f'[GridSearcher] auto-tuning: {info}, the throughput per slot improved, trying {self.level + 1} runs/GPU')
+            self.converged = False
+            self.best_level, self.best_throughput = self.level, throughput
+            self._set_level(self.level + 1)
+
+    def _set_level(self, level):
+        self.level = level
+        self.scheduler.set_max_jobs_per_gpu(level)
+        with self._lock:
+            self.level_start = self.window_start = time.time()
+            self.work = 0.
+
+    def _update_progress(self, key, last):
+        """
+            Adds the progress made by a run since the last read to the work of the window. Must be called with the lock held.
+        """
+        progress = read_progress(os.path.join(key[1], self.cfg.progress_file))
+        if progress is None or last is None:
+            return
+        self.work += max(0., progress - last)
+        if key in self.progress:
+            self.progress[key] = progress
+
+    def _utilization(self):
+        """
+            Returns the mean utilization (in percent) of the GPUs of the scheduler, None without a probe.
+        """
+        if self.cfg.gpu_probe is None:
+            return None
+        stats = self.cfg.gpu_probe.query()
+        values = [stats[gpu].utilization for gpu in getattr(self.scheduler, 'gpus', []) if gpu in stats]
+        return sum(values) / len(values) if len(values) > 0 else None
+
+    def _loop(self):
+        while not self._stop.wait(min(5., self.cfg.interval / 10)):
+            self.step()
@@ -1,6 +1,11 @@
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Union, Callable
 import ipaddress
+from .tools import GSSampling, GSFailure
+from .sampling import Uniform
+from .hosts import Transport, SSHTransport
+from .gpu_probe import GPUProbe, NvidiaSmiProbe
+from .search_space import Choice
 
 def is_valid_ip(address: str) -> bool:
     if address.lower() == "localhost":
@@ -11,6 +16,84 @@ def is_valid_ip(address: str) -> bool:
     except ValueError:
         return False
 
+@dataclass
+class SamplingConfig:
+    """
+    Description:
+        Represents a sampling configuration for GridSearcher, used to run a fixed number of points from the search space instead of the
+        full cartesian product of params_values.
+    Attributes:
+        method (GSSampling): how to draw the points (uniform random, latin hypercube or scrambled Sobol)
+        budget (int): the number of points to draw
+        seed (int): seed of the random generator, the same seed produces the same points
+    """
+    method: GSSampling
+    budget: int
+    seed: int = 0
+
+    def __post_init__(self):
+        assert isinstance(self.method, GSSampling), f'Variable method must be of type {GSSampling}'
+        assert type(self.budget) is int and self.budget > 0
+        assert type(self.seed) is int
+
+@dataclass
+class Host:
+    """
+    Description:
+        Represents a machine of a multi-host pool for GridSearcher.
+    Attributes:
+        name (str): the address of the host, as given to the transport (e.g. "node01" or "user@10.0.0.5" for SSH)
+        gpus (List[int]): the IDs of the GPUs of this host the runs can use
+        transport (Transport): how the commands are started on the host (SSHTransport with the default options if not set)
+    """
+    name: str
+    gpus: List[int]
+    transport: Transport = None
+
+    def __post_init__(self):
+        assert type(self.name) is str and len(self.name) > 0
+        assert type(self.gpus) is list and len(self.gpus) > 0 and all([type(gpu) is int for gpu in self.gpus])
+        assert len(set(self.gpus)) == len(self.gpus), f'Host {self.name} has duplicate GPU ids'
+        if self.transport is None:
+            self.transport = SSHTransport()
+        assert isinstance(self.transport, Transport), f'Variable transport must be of type {Transport}'
+
+@dataclass
+class AutoTuneConfig:
+    """
+    Description:
+        Represents the adaptive number of runs per GPU (see ConcurrencyTuner): the grid starts with `min_jobs_per_gpu` runs per GPU and
+        one more run per GPU is allowed as long as the measured throughput grows, up to the `max_jobs_per_gpu` of the SchedulingConfig.
+        The throughput keeps being measured afterwards and the number of runs per GPU is lowered when the throughput per run degrades.
+    Attributes:
+        min_jobs_per_gpu (int): the number of runs per GPU at the start, also the lower bound
+        interval (float): number of seconds over which the throughput of a level is measured
+        settle (float): number of seconds ignored after each change, while the runs started at the previous level are still running
+        min_gain (float): the relative improvement of the throughput required to keep a higher level (e.g. 0.05 for 5%), also the
+                          relative change of the throughput per slot that makes the tuner step down or climb again after converging
+        saturation (int): no more runs are added when the mean utilization of the GPUs (in percent) reaches this value
+        progress_file (str): if set, the throughput is the progress reported by the runs in this file in their root folder (a cumulative
+                             number on its last line, e.g. the number of training steps) instead of the number of completed runs. This
+                             is more accurate when the runs are long compared to `interval`
+        gpu_probe (GPUProbe): reports the utilization of the GPUs (e.g. NvidiaSmiProbe), None to only use the throughput
+    """
+    min_jobs_per_gpu: int = 1
+    interval: float = 600
+    settle: float = 60
+    min_gain: float = 0.05
+    saturation: int = 95
+    progress_file: str = None
+    gpu_probe: GPUProbe = None
+
+    def __post_init__(self):
+        assert type(self.min_jobs_per_gpu) is int and self.min_jobs_per_gpu >= 1
+        assert type(self.interval) in [int, float] and self.interval > 0
+        assert type(self.settle) in [int, float] and self.settle >= 0
+        assert type(self.min_gain) in [int, float] and self.min_gain >= 0
+        assert type(self.saturation) is int and 0 < self.saturation <= 100
+        assert self.progress_file is None or type(self.progress_file) is str
+        assert self.gpu_probe is None or isinstance(self.gpu_probe, GPUProbe), f'Variable gpu_probe must be of type {GPUProbe}'
+
 @dataclass
 class SchedulingConfig:
     """
@@ -22,23 +105,88 @@ class SchedulingConfig:
                                      Otherwise, only one GPU id will be used for CUDA_VISIBLE_DEVICES.
         max_jobs_per_gpu (int): specifies how many processes should run on each GPU at most (num_processes = len(gpus) * max_jobs_per_gpu)
         gpus (List[int]): a list containing IDs of GPUs you want to run your tasks on
-        params_values (Dict[str, List]): a dictionary that contains the grid for your hyper-parameters (the cartesian product will be computed)
+        params_values (Dict[str, List]): a dictionary that contains the grid for your hyper-parameters (the cartesian product will be computed).
+                                         When `sampling` is set, the values can also be continuous ranges (Uniform or LogUniform).
+                                         Otherwise, the values can also be conditional parameters (Choice) with a sub-grid for each value
+        warmup_seconds (float): minimum number of seconds between two consecutive launches, useful when the scripts do not allocate
+                                GPU memory immediately (0 means that a run is launched as soon as a GPU slot is free)
+        sampling (SamplingConfig): if set, `sampling.budget` points are sampled from params_values instead of computing the cartesian product
+        gpus_per_run (Union[int, Callable]): number of GPUs requested by each run, either fixed or given by a function that receives the
+                                             parameters of the run as a dictionary (e.g. lambda p: 4 if p['model'] == 'large' else 1).
+                                             If set, it overrides `distributed_training`
+        lookahead (int): how many pending runs are considered when GPUs become free: with lookahead > 1, runs requesting fewer GPUs can
+                         start while the first pending run waits for enough GPUs (backfilling)
+        hosts (List[Host]): if set, the runs are dispatched to the GPUs of these hosts, which are used as a single pool, instead of the
+                            local `gpus`. All GPUs of a run are taken from the same host and, for distributed training, a run uses as many
+                            GPUs as the smallest host has
+        memory_per_run (Union[int, Callable]): expected GPU memory (in MiB, on each GPU of the run) of a run, either fixed or given by
+                                               a function of the parameters of the run. If set, a run is only started on GPUs where
+                                               the probed free memory, minus the memory reserved for the runs that were started but did
+                                               not allocate their memory yet, is large enough. This replaces the need for warmup_seconds
+        max_utilization (int): if set, no run is started on GPUs with a probed utilization (in percent) above this value
+        gpu_probe (GPUProbe): reports the memory and utilization of the GPUs (NvidiaSmiProbe if not set and memory_per_run or
+                              max_utilization is set)
+        reservation_seconds (float): the memory reserved for a run is released after this many seconds even if the allocation was not
+                                     observed, e.g. for runs that use less memory than declared
+        constraints (List[Union[str, Callable]]): the points that do not satisfy all constraints are removed while the grid is expanded,
+                                                  before they are rendered. A constraint is an expression of the parameters (e.g.
+                                                  "lr * batch_size < 0.5") or a function that receives the parameters as a dictionary
+                                                  and returns a boolean (see ConstraintFilter)
+        autotune (AutoTuneConfig): if set, the number of runs per GPU is adapted to the measured throughput, between
+                                   `autotune.min_jobs_per_gpu` and `max_jobs_per_gpu`
     """
     distributed_training: bool
     max_jobs_per_gpu: int
     gpus: List[int]
-    params_values: Dict[str, List]
+    params_values: Dict[str, Union[List, Uniform]]
+    warmup_seconds: float = 0
+    sampling: SamplingConfig = None
+    gpus_per_run: Union[int, Callable] = None
+    lookahead: int = 1
+    hosts: List[Host] = None
+    memory_per_run: Union[int, Callable] = None
+    max_utilization: int = None
+    gpu_probe: GPUProbe = None
+    reservation_seconds: float = 300
+    constraints: List[Union[str, Callable]] = None
+    autotune: AutoTuneConfig = None
 
     def __post_init__(self):
         assert type(self.distributed_training) is bool
         assert type(self.max_jobs_per_gpu) is int
         assert type(self.gpus) is list and all([type(gpu) is int for gpu in self.gpus])
         assert type(self.params_values) is dict
-        assert all([type(k) is str and type(v) is list for k, v in self.params_values.items()])
+        assert type(self.warmup_seconds) in [int, float] and self.warmup_seconds >= 0
+        assert self.sampling is None or isinstance(self.sampling, SamplingConfig)
+        assert self.hosts is None or (type(self.hosts) is list and len(self.hosts) > 0 and all([isinstance(h, Host) for h in self.hosts]))
+        assert self.hosts is None or len(set(h.name for h in self.hosts)) == len(self.hosts), 'Host names must be unique'
+        max_gpus = len(self.gpus) if self.hosts is None else max(len(h.gpus) for h in self.hosts)
+        assert self.gpus_per_run is None or callable(self.gpus_per_run) or (type(self.gpus_per_run) is int and 1 <= self.gpus_per_run <= max_gpus)
+        assert type(self.lookahead) is int and self.lookahead >= 1
+        assert self.memory_per_run is None or callable(self.memory_per_run) or (type(self.memory_per_run) is int and self.memory_per_run >= 0)
+        assert self.max_utilization is None or (type(self.max_utilization) is int and 0 <= self.max_utilization <= 100)
+        assert self.gpu_probe is None or isinstance(self.gpu_probe, GPUProbe), f'Variable gpu_probe must be of type {GPUProbe}'
+        assert type(self.reservation_seconds) in [int, float] and self.reservation_seconds > 0
+        if self.gpu_probe is None and (self.memory_per_run is not None or self.max_utilization is not None):
+            self.gpu_probe = NvidiaSmiProbe()
+        assert self.gpu_probe is None or self.hosts is None, 'GPU probing is only supported for the local GPUs'
+        if self.sampling is None:
+            assert all([type(k) is str and (type(v) is list or isinstance(v, Choice)) for k, v in self.params_values.items()])
+        else:
+            assert all([type(k) is str and (type(v) is list or isinstance(v, Uniform)) for k, v in self.params_values.items()])
+
+        if self.constraints is None:
+            self.constraints = []
+        assert type(self.constraints) is list and all([type(c) is str or callable(c) for c in self.constraints])
+        assert self.autotune is None or isinstance(self.autotune, AutoTuneConfig), f'Variable autotune must be of type {AutoTuneConfig}'
+        assert self.autotune is None or self.autotune.min_jobs_per_gpu <= self.max_jobs_per_gpu, \
+            'autotune.min_jobs_per_gpu must not be larger than max_jobs_per_gpu'
+        assert self.autotune is None or self.autotune.gpu_probe is None or self.hosts is None, 'GPU probing is only supported for the local GPUs'
 
         # remove duplicates
         for k, v in self.params_values.items():
-            self.params_values[k] = list(set(v))
+            if type(v) is list:
+                self.params_values[k] = list(dict.fromkeys(v)) # keeps the order of the values, independent of the hash seed
 
 @dataclass
 class TorchRunConfig:
@@ -51,16 +199,312 @@ class TorchRunConfig:
         master_addr (str): IP address of the master node
         master_port (int): port of the master node
         rdzv_backend (str): use "static" to use a predefined configuration to avoid trying to discover or resolve the hostname over the network
+        auto_port (bool): if True, each run gets its own free port, starting from `master_port`, such that concurrent torchrun runs on the
+                          same machine do not collide on the rendezvous endpoint. The port is released when the run exits
+        unique_rdzv_id (bool): if True, each run also gets a distinct --rdzv_id (only used together with auto_port)
     """
     launch_blocking: int = 0
     torchrun: bool = True
     master_addr: str = '127.0.0.1'
     master_port: int = 29500
     rdzv_backend: str = 'c10d'
+    auto_port: bool = False
+    unique_rdzv_id: bool = False
 
     def __post_init__(self):
         assert self.launch_blocking in [0, 1]
         assert type(self.torchrun) is bool
         assert is_valid_ip(self.master_addr)
         assert type(self.master_port) is int
-        assert self.rdzv_backend in ['c10d', 'static']
\ No newline at end of file
+        assert self.rdzv_backend in ['c10d', 'static']
+        assert type(self.auto_port) is bool
+        assert type(self.unique_rdzv_id) is bool
+
+@dataclass
+class ShardConfig:
+    """
+    Description:
+        Represents the slice of the grid run by one of `num_shards` launchers that are started independently (e.g. the same script on
+        several machines), without a central coordinator.
+    Attributes:
+        shard_index (int): the index of this launcher, in [0, num_shards)
+        num_shards (int): the number of launchers
+        cost (Callable): optional function that receives the parameters of a run as a dictionary and returns its estimated cost
+                         (e.g. lambda p: p['epochs'] * p['model_size']). If set, the shards get the same total cost instead of the same
+                         number of runs
+        work_stealing (bool): if True, a launcher that finished its slice runs the unclaimed runs of the other slices. The runs are
+                              claimed through the file "state.claimed" in their root folder, which must be shared by all launchers
+    """
+    shard_index: int
+    num_shards: int
+    cost: Callable = None
+    work_stealing: bool = False
+
+    def __post_init__(self):
+        assert type(self.num_shards) is int and self.num_shards >= 1
+        assert type(self.shard_index) is int and 0 <= self.shard_index < self.num_shards
+        assert self.cost is None or callable(self.cost)
+        assert type(self.work_stealing) is bool
+
+@dataclass
+class SlurmConfig:
+    """
+    Description:
+        Represents a SLURM job array configuration for GridSearcher. Instead of running the grid locally, the runs are written to a
+        manifest file and submitted with a single `sbatch --array` call, where each array task runs the command at its index.
+    Attributes:
+        manifest (str): path of the manifest file, the batch script is written next to it. It must be readable from the compute nodes
+        sbatch_args (Dict[str, str]): arguments of sbatch used by every array task (e.g. job-name, time, gres, partition, output)
+        env_vars (Dict[str, str]): variables set in the --export argument of sbatch, as for SBATCH (if it is not empty, SLURM only
+                                   exports these variables to the tasks)
+        max_concurrent (int): maximum number of array tasks running at the same time (the %K suffix of --array), None means no limit
+        pack_workers (int): if set, packing mode is used: instead of one array task per run, this many allocations are submitted and
+                            each one runs a worker that pulls pending runs from the manifest and runs them on the GPUs of its node
+                            (with `max_jobs_per_gpu` runs per GPU), until the time limit of the allocation (sbatch_args["time"]) is
+                            nearly exhausted. This is useful when the runs are much shorter than the queue wait
+        pack_batch_size (int): number of runs a packing worker claims from the manifest at once
+        pack_reserve_seconds (float): a packing worker does not start new runs when less time than this (or than its longest run so far)
+                                      is left in the allocation
+        reset_claims (bool): in packing mode, the runs claimed by the workers of a previous submission are not run again, since these
+                             workers might still be running. Set it to True once they are gone to remove their claims and run again the
+                             runs they did not finish
+    """
+    manifest: str
+    sbatch_args: Dict[str, str]
+    env_vars: Dict[str, str] = None
+    max_concurrent: int = None
+    pack_workers: int = None
+    pack_batch_size: int = 8
+    pack_reserve_seconds: float = 60
+    reset_claims: bool = False
+
+    def __post_init__(self):
+        assert type(self.manifest) is str
+        assert type(self.sbatch_args) is dict and 'array' not in self.sbatch_args, 'The array argument is set by GridSearcher'
+        if self.env_vars is None:
+            self.env_vars = {}
+        assert type(self.env_vars) is dict
+        assert self.max_concurrent is None or (type(self.max_concurrent) is int and self.max_concurrent >= 1)
+        assert self.pack_workers is None or (type(self.pack_workers) is int and self.pack_workers >= 1)
+        assert self.pack_workers is None or 'time' in self.sbatch_args, 'Packing mode requires the time limit in sbatch_args["time"]'
+        assert type(self.pack_batch_size) is int and self.pack_batch_size >= 1
+        assert type(self.pack_reserve_seconds) in [int, float] and self.pack_reserve_seconds >= 0
+        assert type(self.reset_claims) is bool
+
+@dataclass
+class LogConfig:
+    """
+    Description:
+        Represents the capture of the output of the runs. The stdout and stderr of each run are written to log files in its root folder
+        instead of the console of GridSearcher, which only shows a status line and the last lines of the output of the failed runs.
+    Attributes:
+        stdout_file (str): name of the stdout log file in the root folder
+        stderr_file (str): name of the stderr log file in the root folder
+        max_bytes (int): if set, a log file is rotated when it reaches this size
+        backups (int): number of rotated files kept for each log file (e.g. stdout.log.1, stdout.log.2)
+        tail_lines (int): number of lines of output kept in memory for each run, used to report failures
+    """
+    stdout_file: str = 'stdout.log'
+    stderr_file: str = 'stderr.log'
+    max_bytes: int = None
+    backups: int = 1
+    tail_lines: int = 20
+
+    def __post_init__(self):
+        assert type(self.stdout_file) is str and type(self.stderr_file) is str and self.stdout_file != self.stderr_file
+        assert self.max_bytes is None or (type(self.max_bytes) is int and self.max_bytes > 0)
+        assert type(self.backups) is int and self.backups >= 0
+        assert type(self.tail_lines) is int and self.tail_lines >= 1
+
+@dataclass
+class TelemetryConfig:
+    """
+    Description:
+        Represents the publication of the progress of GridSearcher while the grid is running.
+    Attributes:
+        port (int): if set, the metrics are served in the Prometheus text format at http://addr:port/metrics (0 picks a free port)
+        addr (str): the address the metrics endpoint listens on
+        status_file (str): if set, a JSON file with the same values is rewritten every `interval` seconds
+        interval (float): number of seconds between two updates of the status file
+    """
+    port: int = None
+    addr: str = '127.0.0.1'
+    status_file: str = None
+    interval: float = 10
+
+    def __post_init__(self):
+        assert self.port is None or (type(self.port) is int and 0 <= self.port < 65536)
+        assert is_valid_ip(self.addr)
+        assert self.status_file is None or type(self.status_file) is str
+        assert type(self.interval) in [int, float] and self.interval > 0
+        assert self.port is not None or self.status_file is not None, 'Set at least one of port and status_file'
+
+@dataclass
+class OrderingConfig:
+    """
+    Description:
+        Represents the order in which the runs are started. By default, the runs start in the order of the grid, so the longest ones
+        might start last and leave most GPUs idle at the end. With an OrderingConfig, the duration of each run is estimated and the
+        longest runs start first (longest processing time first), which shortens the total time of the grid.
+
+        The duration of a run is estimated from the ledgers of previous grids (runs with the same parameters, otherwise the runs that
+        differ in a single parameter) and, for the runs without history, from the cost hint (scaled to seconds using the runs having both).
+    Attributes:
+        cost (Union[str, Callable]): cost hint, either an expression of the parameters (e.g. "epochs * batch_size") or a function that
+                                     receives the parameters of a run as a dictionary and returns its estimated cost
+        history (List[str]): paths of ledger files (see the `ledger` parameter of GridSearcher.run) of previous grids. If None, the ledger
+                             of the current grid is used, if any
+        priority (Callable): optional function that receives the parameters of a run and its estimated duration (None if unknown) and
+                             returns its priority. The runs with the highest priority start first. If None, the priority is the estimated
+                             duration
+    """
+    cost: Union[str, Callable] = None
+    history: List[str] = None
+    priority: Callable = None
+
+    def __post_init__(self):
+        assert self.cost is None or type(self.cost) is str or callable(self.cost)
+        assert self.history is None or (type(self.history) is list and all(type(path) is str for path in self.history))
+        assert self.priority is None or callable(self.priority)
+
+@dataclass
+class RetryConfig:
+    """
+    Description:
+        Represents how the failed runs are retried. Each failure is classified from the exit code and, if the output of the runs is
+        captured (see LogConfig), from the last lines of the output: running out of GPU memory, killed by a signal, timeout or generic.
+        The runs failing with one of the classes in `retry_on` are started again after a delay that grows exponentially with the attempt,
+        and the runs that ran out of memory are started again on GPUs without other runs. The attempts of each run are recorded in the
+        file "attempts.jsonl" in its root folder and the logs of the failed attempts are kept as "<log file>.attempt<N>".
+    Attributes:
+        max_retries (int): maximum number of times a run is started again (0 disables the retries but keeps the classification)
+        retry_on (List[GSFailure]): the classes of failures that are retried. Generic failures (e.g. a bug in the script) are not
+                                    retried by default
+        backoff (float): number of seconds before the first retry
+        backoff_factor (float): the delay is multiplied by this factor for each further attempt
+        max_backoff (float): maximum number of seconds before a retry
+        oom_exclusive (bool): if True, a run that ran out of GPU memory is retried with exclusive access to its GPUs (no co-located runs)
+        oom_patterns (List[str]): regular expressions (case insensitive) that identify an out-of-memory error in the output
+        timeout_patterns (List[str]): regular expressions (case insensitive) that identify a timeout in the output. The exit code 124 (used
+                                      by the timeout command) is also classified as a timeout
+    """
+    max_retries: int = 2
+    retry_on: List[GSFailure] = None
+    backoff: float = 30
+    backoff_factor: float = 2
+    max_backoff: float = 600
+    oom_exclusive: bool = True
+    oom_patterns: List[str] = None
+    timeout_patterns: List[str] = None
+
+    def __post_init__(self):
+        if self.retry_on is None:
+            self.retry_on = [GSFailure.OOM, GSFailure.SIGNAL, GSFailure.TIMEOUT]
+        if self.oom_patterns is None:
+            self.oom_patterns = [r'CUDA out of memory', r'OutOfMemoryError', r'CUBLAS_STATUS_ALLOC_FAILED', r'CUDA error: out of memory']
+        if self.timeout_patterns is None:
+            self.timeout_patterns = [r'collective operation timeout', r'NCCL.*tim(ed )?e?out', r'DUE TO TIME LIMIT', r'TimeoutError']
+        assert type(self.max_retries) is int and self.max_retries >= 0
+        assert type(self.retry_on) is list and all([isinstance(f, GSFailure) for f in self.retry_on])
+        assert type(self.backoff) in [int, float] and self.backoff >= 0
+        assert type(self.backoff_factor) in [int, float] and self.backoff_factor >= 1
+        assert type(self.max_backoff) in [int, float] and self.max_backoff >= self.backoff
+        assert type(self.oom_exclusive) is bool
+        assert all([type(p) is str for p in self.oom_patterns + self.timeout_patterns])
+
+@dataclass
+class CacheConfig:
+    """
+    Description:
+        Represents a results store shared by several grids. Each successful run is added to the store under the fingerprint of its
+        configuration (the command line arguments of the script, except the root folder and the volatile parameters). A run whose
+        configuration is already in the store is not started again: the stored outputs are linked or copied to its root folder.
+    Attributes:
+        store (str): the folder of the results store
+        volatile_params (List[str]): the parameters that do not change the result of a run and are ignored by the fingerprint (e.g.
+                                     "wandb_name" when it contains the date)
+        mode (str): "link" to create hard links to the stored files (files are copied if the store is on another file system) or "copy".
+                    Hard links share their content with the root folders, use "copy" if the outputs are modified after the runs ended
+        copy_patterns (List[str]): file name patterns of the outputs that are copied even in link mode, because they might be written
+                                   again in place (logs, metrics, small text files). The large artifacts, e.g. checkpoints, are linked
+    """
+    store: str
+    volatile_params: List[str] = None
+    mode: str = 'link'
+    copy_patterns: List[str] = None
+
+    def __post_init__(self):
+        assert type(self.store) is str
+        if self.volatile_params is None:
+            self.volatile_params = []
+        assert type(self.volatile_params) is list and all(type(p) is str for p in self.volatile_params)
+        assert self.mode in ['link', 'copy']
+        if self.copy_patterns is None:
+            self.copy_patterns = ['*.log', '*.log.*', '*.txt', '*.json', '*.jsonl', '*.csv', '*.yaml']
+        assert type(self.copy_patterns) is list and all(type(p) is str for p in self.copy_patterns)
+
+@dataclass
+class ShutdownConfig:
+    """
+    Description:
+        Represents how the launcher stops when it receives SIGINT or SIGTERM (e.g. Ctrl+C or a node being drained). No new run is
+        started and the signal is forwarded to the process group of each running run, which gets `grace_period` seconds to save a
+        checkpoint and exit before being killed (a second signal kills the runs immediately). The runs that exit with a non-zero code
+        after receiving the signal are marked as interrupted (file "state.interrupted" in their root folder and, if a ledger is used,
+        status "interrupted") and the next launch of the grid starts them before the other runs. Without a ShutdownConfig, the signals
+        keep their default behavior. Not supported for hosts using SSHTransport, where the signal would only reach the local ssh client.
+    Attributes:
+        grace_period (float): number of seconds between forwarding the signal and killing the runs that are still running
+        resume_flag (str): arguments appended to the command of the interrupted runs when they are started again (e.g. "--resume"),
+                           None to start them with the same command
+        resume_first (bool): whether the interrupted runs are started before the other runs of the grid. With streaming, the grid is
+                             never fully expanded, so they keep their position
+    """
+    grace_period: float = 60
+    resume_flag: str = None
+    resume_first: bool = True
+
+    def __post_init__(self):
+        assert type(self.grace_period) in [int, float] and self.grace_period >= 0
+        assert self.resume_flag is None or type(self.resume_flag) is str
+        assert type(self.resume_first) is bool
+
+@dataclass
+class HalvingConfig:
+    """
+    Description:
+        Represents a multi-fidelity (successive halving / Hyperband) configuration for GridSearcher. All configurations are first run
+        with a small value of `budget_param` (e.g. epochs), then only the best 1/eta of them are run again with eta times more budget,
+        until `max_budget` is reached. The scripts must write the metric to `metric_file` in their root folder.
+    Attributes:
+        budget_param (str): name of the cmd argument that controls the budget of a run, e.g. "epochs"
+        min_budget (Union[int, float]): budget of the first rung
+        max_budget (Union[int, float]): budget of the last rung
+        eta (int): only 1/eta of the configurations are promoted to the next rung, which has eta times more budget
+        metric (str): name of the metric to read from `metric_file`
+        metric_file (str): file in the root folder of each run containing the metric: a JSON dictionary or a CSV file with a header
+                           (the last row is used)
+        mode (str): "min" if lower values of the metric are better, "max" otherwise
+        hyperband (bool): if True, run Hyperband brackets (successive halving started at different budgets) instead of a single
+                          successive halving bracket
+        seed (int): seed used by Hyperband to split the configurations between the brackets
+    """
+    budget_param: str
+    min_budget: Union[int, float]
+    max_budget: Union[int, float]
+    metric: str
+    eta: int = 3
+    metric_file: str = 'metrics.json'
+    mode: str = 'min'
+    hyperband: bool = False
+    seed: int = 0
+
+    def __post_init__(self):
+        assert type(self.budget_param) is str
+        assert type(self.min_budget) in [int, float] and type(self.max_budget) in [int, float]
+        assert 0 < self.min_budget <= self.max_budget
+        assert type(self.eta) is int and self.eta >= 2
+        assert type(self.metric) is str and type(self.metric_file) is str
+        assert self.mode in ['min', 'max']
+        assert type(self.hyperband) is bool
+        assert type(self.seed) is int
\ No newline at end of file
@@ -1,19 +1,93 @@
 import os
+import time
 
-LOCK_FILE = 'locker.lock'
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
 
 # https://github.com/dmfrey/FileLock/blob/master/filelock/filelock.py
 # https://superfastpython.com/multiprocessing-pool-mutex-lock/
 
-def lock_acquire():
-    while True:
-        if not os.path.isfile(LOCK_FILE):
-            break
-    open(LOCK_FILE, 'w').close()
+class LockTimeoutError(TimeoutError):
+    pass
 
-def lock_release():
-    if os.path.isfile(LOCK_FILE):
+class FileLock:
+    """
+    Description:
+        Cross-process lock backed by an OS-level lock on a file (fcntl.flock on Linux/macOS, msvcrt.locking on Windows).
+        Waiting for the lock blocks in the kernel instead of spinning, acquisition is atomic and the lock is released automatically by the
+        OS if the holding process dies, so a crashed worker cannot leave a stale lock behind.
+
+        The object only stores the path of the lock file and can be sent to multiprocessing workers: each process opens its own file
+        descriptor on first use.
+    Attributes:
+        path (str): absolute path of the lock file
+        timeout (float): default number of seconds to wait in `acquire`, None means wait forever
+    """
+    def __init__(self, path, timeout=None):
+        self.path = os.path.abspath(path)
+        self.timeout = timeout
+        self._fd = None
+
+    def acquire(self, timeout=None):
+        """
+        Description:
+            Blocks until the lock is acquired. If a timeout is given (or set in the constructor) and the lock could not be acquired in
+            that many seconds, a LockTimeoutError is raised.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if timeout is None and fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX) # blocking wait in the kernel
+            else:
+                self._acquire_with_timeout(fd, timeout)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self):
+        if self._fd is None:
+            return
         try:
-            os.remove(LOCK_FILE)
-        except:
-            pass
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def _acquire_with_timeout(self, fd, timeout):
+        """
+            Tries to lock in non-blocking mode and sleeps with exponential backoff (capped at 50ms) between the attempts.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = 0.001
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise LockTimeoutError(f'Could not acquire the lock {self.path} in {timeout} seconds')
+            time.sleep(delay)
+            delay = min(2 * delay, 0.05)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def __getstate__(self):
+        # file descriptors are per process, the child will open its own one
+        return dict(path=self.path, timeout=self.timeout, _fd=None)
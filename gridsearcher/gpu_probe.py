@@ -0,0 +1,84 @@
+import subprocess
+from dataclasses import dataclass
+
+@dataclass
+class GPUStats:
+    """
+    Description:
+        Represents the state of a GPU at the moment it was probed.
+    Attributes:
+        memory_total (int): total memory in MiB
+        memory_used (int): used memory in MiB (by all processes, including the ones that were not started by GridSearcher)
+        utilization (int): compute utilization in percent
+    """
+    memory_total: int
+    memory_used: int
+    utilization: int = 0
+
+    @property
+    def memory_free(self):
+        return self.memory_total - self.memory_used
+
+class GPUProbe:
+    """
+    Description:
+        Base class for the objects that report the state of the GPUs to the scheduler. `query` returns a dictionary with the GPUStats
+        of each GPU id (the physical ids, as used in CUDA_VISIBLE_DEVICES).
+    """
+    def query(self):
+        raise NotImplementedError
+
+class NvidiaSmiProbe(GPUProbe):
+    """
+    Description:
+        Reads the state of the GPUs by calling nvidia-smi, which is available wherever the NVIDIA driver is installed.
+    """
+    def __init__(self, executable='nvidia-smi'):
+        self.executable = executable
+
+    def query(self):
+        output = subprocess.run(
+            [self.executable, '--query-gpu=index,memory.total,memory.used,utilization.gpu', '--format=csv,noheader,nounits'],
+            capture_output=True, text=True, check=True).stdout
+        stats = {}
+        for line in output.strip().splitlines():
+            index, total, used, utilization = [x.strip() for x in line.split(',')]
+            stats[int(index)] = GPUStats(memory_total=int(total), memory_used=int(used),
+                                         utilization=int(utilization) if utilization.isdigit() else 0)
+        return stats
+
+class NVMLProbe(GPUProbe):
+    """
+    Description:
+        Reads the state of the GPUs through NVML, which avoids starting a process for each query. Requires the package nvidia-ml-py.
+    """
+    def __init__(self):
+        try:
+            import pynvml
+        except ImportError:
+            raise ImportError('NVMLProbe requires nvidia-ml-py, please install it using "pip install nvidia-ml-py" or use NvidiaSmiProbe')
+        self.nvml = pynvml
+        self.nvml.nvmlInit()
+
+    def query(self):
+        stats = {}
+        for index in range(self.nvml.nvmlDeviceGetCount()):
+            handle = self.nvml.nvmlDeviceGetHandleByIndex(index)
+            memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+            utilization = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+            stats[index] = GPUStats(memory_total=memory.total // 2**20, memory_used=memory.used // 2**20, utilization=utilization.gpu)
+        return stats
+
+class FakeProbe(GPUProbe):
+    """
+    Description:
+        Probe returning the GPUStats given by the caller, for testing the scheduler on machines without GPUs. The attribute `stats`
+        can be changed at any time to simulate the runs allocating and freeing memory.
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.n_queries = 0
+
+    def query(self):
+        self.n_queries += 1
+        return {gpu: GPUStats(s.memory_total, s.memory_used, s.utilization) for gpu, s in self.stats.items()}
@@ -1,9 +1,28 @@
 import multiprocessing as mp
+import time
 from string import Template
-from itertools import product
 from copy import deepcopy
 from .tools import *
-from .configs import SchedulingConfig, TorchRunConfig
+from .configs import SchedulingConfig, TorchRunConfig, HalvingConfig, ShardConfig, SlurmConfig, LogConfig, TelemetryConfig, OrderingConfig, CacheConfig, RetryConfig, ShutdownConfig
+from .scheduler import Placement, PointQueue, create_scheduler, gpus_for_point, memory_for_point
+from .async_engine import AsyncLauncher
+from .renderer import CommandRenderer
+from .ledger import RunLedger
+from .sampling import sample_points
+from .search_space import ABSENT, grid_params, expand_space, ConstraintFilter
+from .halving import halving_brackets, read_metric, promote
+from .ports import create_port_allocator
+from .sharding import GridShard
+from .run_logs import ConsoleStatus
+from .telemetry import Telemetry
+from .trace import Tracer
+from .ordering import DurationHistory, order_points
+from .result_cache import ResultCache
+from .retries import RetryPolicy
+from .autotune import ConcurrencyTuner
+from .hosts import SSHTransport
+from .shutdown import ShutdownHandler, flag_interrupted, resumed_first
+from .slurm import write_manifest, submit_array, submit_pack_workers, parse_walltime, claimed_indices
 
 class GridSearcher:
     def __init__(self,
@@ -73,7 +92,20 @@ class GridSearcher:
             cfg_sched: SchedulingConfig,
             cfg_torchrun: TorchRunConfig,
             debug: bool = False,
-            create_state_finished: bool = True):
+            create_state_finished: bool = True,
+            streaming: bool = False,
+            engine: GSEngine = GSEngine.POOL,
+            ledger: str = None,
+            halving: HalvingConfig = None,
+            shard: ShardConfig = None,
+            slurm: SlurmConfig = None,
+            logs: LogConfig = None,
+            telemetry: TelemetryConfig = None,
+            trace: str = None,
+            ordering: OrderingConfig = None,
+            cache: CacheConfig = None,
+            retries: RetryConfig = None,
+            shutdown: ShutdownConfig = None):
         """
         Description:
             Runs the GridSearcher using the provided configuration.
@@ -90,145 +122,493 @@ class GridSearcher:
             :param create_state_finished: whether to create the file "state.finished" or not
             :param cfg_sched:an object of type SchedulingConfig
             :param cfg_torchrun: an object of type TorchRunConfig
+            :param streaming: if True, the grid is expanded lazily while the runs are executed, instead of building all the commands
+                before the first run starts. The memory stays constant regardless of the grid size, but the number of runnable commands
+                is only known at the end
+            :param engine: an instance of GSEngine. GSEngine.POOL runs each command in a multiprocessing worker, while GSEngine.ASYNCIO
+                supervises all commands from a single asyncio event loop in the GridSearcher process
+            :param ledger: path to a journal file that records the status of each run (see RunLedger). If set, the finished runs are
+                looked up in the journal instead of checking the file "state.finished" in each root folder
+            :param halving: an object of type HalvingConfig. If set, the configurations are run with successive halving (or Hyperband):
+                all of them start with a small budget and only the best ones are promoted to the next rungs
+            :param shard: an object of type ShardConfig. If set, only the slice of the grid assigned to this launcher is run (and, with
+                work stealing, the unclaimed runs of the other slices once this slice is done)
+            :param slurm: an object of type SlurmConfig. If set, the grid is not run locally: it is written to a manifest and the runs
+                that are not finished yet are submitted to SLURM as a single job array
+            :param logs: an object of type LogConfig. If set, the stdout and stderr of each run are written to log files in its root
+                folder and the console only shows a status line and the output of the failed runs
+            :param telemetry: an object of type TelemetryConfig. If set, the progress of the grid (counts, GPU slot occupancy, durations,
+                ETA) is published as Prometheus metrics on a local port and/or as a JSON status file
+            :param trace: path of a Chrome trace file (JSON) with the timeline of the launcher phases and of the runs on each GPU slot,
+                written when GridSearcher ends. It can be opened with chrome://tracing or https://ui.perfetto.dev
+            :param ordering: an object of type OrderingConfig. If set, the duration of each run is estimated (from the ledgers of previous
+                grids or from a cost hint) and the longest runs start first, instead of the order of the grid
+            :param cache: an object of type CacheConfig. If set, the runs whose configuration (the arguments, except the root folder and
+                the volatile parameters) was already run successfully by any grid using the same store are not run again: their outputs
+                are linked or copied from the store to their root folder
+            :param retries: an object of type RetryConfig. If set, the failed runs are classified (out of memory, signal, timeout,
+                generic) and started again after an exponential backoff, with exclusive GPUs after running out of memory
+            :param shutdown: an object of type ShutdownConfig. If set, on SIGINT/SIGTERM no new run is started, the signal is forwarded
+                to the runs, which get a grace period to save a checkpoint, and the interrupted runs are resumed first by the next launch
+                of the grid. If None, the signals keep their default behavior (e.g. Ctrl+C reaches the runs directly). Not supported
+                together with hosts using SSHTransport, since the signal would only reach the local ssh client
         """
-        n_gpus = len(cfg_sched.gpus)
-        if cfg_sched.distributed_training: # use all GPUs for a single run (distributed training)
-            n_workers = cfg_sched.max_jobs_per_gpu
-        else: # use GPUs to run one experiment per GPU
-            n_workers = n_gpus * cfg_sched.max_jobs_per_gpu
+        assert isinstance(engine, GSEngine), f'Variable engine must be of type {GSEngine}'
+        assert shard is None or halving is None, 'Sharding is not supported together with halving'
+        assert slurm is None or (halving is None and shard is None), 'SLURM job arrays are not supported together with halving or sharding'
+        assert ordering is None or (not streaming and halving is None), 'Ordering is not supported together with streaming or halving'
+        assert cache is None or (halving is None and slurm is None), 'The result cache is not supported together with halving or SLURM'
+        assert shutdown is None or cfg_sched.hosts is None or not any(isinstance(h.transport, SSHTransport) for h in cfg_sched.hosts), \
+            'The shutdown handling is not supported together with hosts using SSHTransport'
 
         self.exp_folder_template = deepcopy(exp_folder)
         os.system('cls' if on_windows() else 'clear')
         print(f'GridSearcher PID: {os.getpid()}')
 
-        cmds = [] # will store all commands to be run (as strings)
-        cmds_dict = [] # will store dictionaries containing key:value pairs of hyper-parameters
-        root_folders = [] # each command will have a separate value for the output folder specified by param_name_for_exp_root_folder
+        # lazily expands the cartesian product: each point is rendered only when the consumer asks for it
+        points = self._expand_grid(param_name_for_exp_root_folder, cfg_sched)
 
-        params = list(cfg_sched.params_values.keys()) # if we do grid search for lr and wd, then params will contain "lr" and "wd"
-
-        cart_prod = list(product(*list(cfg_sched.params_values.values()))) # perform the cartesian product of all hyper-parameters
-        for i, values in enumerate(cart_prod):
-            # for each element of cartesian product (contained in `values`), we have to (follow the steps given by numbers):
-
-            # step 1: add the values for hyper-parameter optimization (HPO)to GridSearcher object
-            for k, v in zip(params, values):
-                self.add_param(k, v)
-
-            # step 2: after filling in the values for HPO, go through all templated fields and fill them with the new values
-            for k, v in self.__dict__.items():
-                if k.startswith('template_'): # template parameters have "template_" prefix
-                    tmpl_filled = self._fill_template(v) # this returns string or the same template if there are no matching values
-                    self.__dict__[k.replace('template', '')] = tmpl_filled # only replace "template" prefix and keep "_" prefix
-
-            # step 3: if the cartesian product element `values` contains some values templated in param_name_for_exp_root_folder, fill them
-            root_folder = self._create_root_arg(
-                param_name_for_exp_root_folder,
-                self.exp_folder_template)
-
-            # create
-            p = {k: v for k, v in self.__dict__.items() if k.startswith('_')}
-
-            # step 4: add metadata
-            cmds.append(self._build_command()) # add the string commands
-            cmds_dict.append(p) # add current parameters from the GridSearch object's internal dictionary, as key:value dictionary
-            root_folders.append(root_folder) # add root folders (e.g., output_dir based on the example for param_name_for_exp_root_folder)
-        # end cartesian product loop
+        grid_shard = None
+        if shard is not None: # the same grid is expanded by all launchers, each one keeps its own slice
+            grid_shard = GridShard(shard, grid_params(cfg_sched.params_values))
+            points = grid_shard.split(points)
 
         if debug: # only print commands to check for correctness, do not run anything
             # set CUDA_VISIBLE_DEVICES variable
-            if not cfg_sched.distributed_training:
-                raise RuntimeError(f"Debug mode is only supported for distributed training!")
-
-            gpus = ",".join(map(str, cfg_sched.gpus))
-            cvd = f'CUDA_VISIBLE_DEVICES={gpus}'
-            clb = 'CUDA_LAUNCH_BLOCKING=1' if cfg_torchrun.launch_blocking else ''
-
-            for i in range(len(cmds)):
-                if cfg_torchrun.torchrun:
-                    addr = cfg_torchrun.master_addr
-                    port = cfg_torchrun.master_port
-                    cmds[i] = ' '.join([
-                        clb,
-                        cvd,
-                        'torchrun',
-                        f'--rdzv_backend={cfg_torchrun.rdzv_backend}',
-                        f'--rdzv_endpoint={addr}:{port}',
-                        f'--nnodes=1',
-                        f'--nproc-per-node={n_gpus}',
-                        cmds[i]
-                    ]).strip()
-                else:
-                    cmds[i] = f'{clb} {cvd} {self.exe} {cmds[i]}'.strip()
+            if not cfg_sched.distributed_training and cfg_sched.gpus_per_run is None:
+                raise RuntimeError(f"Debug mode is only supported for distributed training or when gpus_per_run is set!")
+
+            # the commands are shown on the first GPUs, the actual GPU ids are chosen by the scheduler at runtime
+            if cfg_sched.hosts is None:
+                cmds = [build_final_cmd(self.exe, point.cmd, cfg_sched.gpus[:gpus_for_point(point, cfg_sched)], cfg_torchrun) for point in points]
+            else: # shown on the first host
+                host = cfg_sched.hosts[0]
+                cmds = [build_final_cmd(self.exe, point.cmd, Placement(host.gpus[:gpus_for_point(point, cfg_sched)], host), cfg_torchrun) for point in points]
             # for index, cmd in enumerate(cmds):
             #     print(f'command {index+1}: {self.exe}', cmd.replace('\\', '/'))
             return cmds
         else: # actually run the processes for hyper-parameter optimizations
-            manager = mp.Manager()
-            gpu_processes_count = manager.dict() # shared dict, where key=gpu_id and value=how many processes were run that GPU id
-            for gpu in cfg_sched.gpus:
-                gpu_processes_count[gpu] = 0
-
             """
                 We will write the file `state.finished` to the folder specified by param_name_for_exp_root_folder when the experiment ends.
                 If some experiments were already run and have a file state.finished, they will not be run again and the experiment will be 
             skipped.
             """
+            if slurm is not None:
+                if ordering is not None: # the array tasks and the pack workers start the runs in the order of the manifest
+                    points = self._order(list(points), ordering, ledger, param_name_for_exp_root_folder)
+                self._submit_slurm(points, cfg_sched, cfg_torchrun, create_state_finished, slurm)
+                return
+
+            handler = None if shutdown is None else ShutdownHandler(shutdown)
+
+            run_ledger = None if ledger is None else RunLedger(ledger)
+            listeners = [] if run_ledger is None else [run_ledger]
+            if logs is not None:
+                listeners.append(ConsoleStatus())
+
+            result_cache = None
+            if cache is not None: # the successful runs are added to the store
+                result_cache = ResultCache(cache, self.exe, self.script, param_name_for_exp_root_folder, run_ledger, create_state_finished)
+                listeners.append(result_cache)
+
+            tracer = None
+            if trace is not None:
+                tracer = Tracer(trace, cfg_sched)
+                listeners.append(tracer)
+
+            run_telemetry = None
+            if telemetry is not None: # the counts are filled below, while the points are consumed
+                run_telemetry = Telemetry(telemetry, cfg_sched, streaming=streaming)
+                listeners.append(run_telemetry)
+                run_telemetry.start_publishing()
+
+            try:
+                if halving is not None:
+                    self._run_halving(param_name_for_exp_root_folder, cfg_sched, cfg_torchrun, create_state_finished, engine, run_ledger,
+                                      listeners, halving, logs, retries, tracer, handler)
+                    return
+
+                counts = dict(total=0, runnable=0) # updated by _skip_finished while the points are consumed
+                if run_telemetry is not None:
+                    run_telemetry.counts = counts
+                runnable_points = self._skip_finished(points, counts, run_ledger, full_grid=grid_shard is None)
+                if shutdown is not None:
+                    runnable_points = flag_interrupted(runnable_points, shutdown, counts, run_ledger)
+                if result_cache is not None: # the configurations already run by any grid are restored from the store
+                    runnable_points = result_cache.satisfy(runnable_points, counts)
+                if shard is not None:
+                    print(f'Shard:\t\t{shard.shard_index + 1}/{shard.num_shards}' + ('\twork stealing' if shard.work_stealing else ''))
+
+                if streaming:
+                    # the counts are only known at the end, because the grid is never fully materialized
+                    print(f'Commands:\tstreaming the grid, points are expanded when a GPU slot becomes free')
+                else:
+                    t_expand = time.time()
+                    runnable_points = list(runnable_points)
+                    if ordering is not None:
+                        runnable_points = self._order(runnable_points, ordering, ledger, param_name_for_exp_root_folder)
+                    if shutdown is not None and shutdown.resume_first:
+                        runnable_points = resumed_first(runnable_points)
+                    if counts.get('resumed', 0) > 0:
+                        print(f'Resuming:\t{counts["resumed"]} runs interrupted by a previous launch' +
+                              ('' if shutdown.resume_flag is None else f', with {shutdown.resume_flag}'))
+                    console_info = f'Commands:\tRunnable: {counts["runnable"]}\tFinished: {counts["total"] - counts["runnable"]}\tTotal: {counts["total"]}'
+                    print(console_info)
+
+                    t_pause = time.time()
+                    pause_process(seconds=5, message=f'Waiting 5 seconds before running GridSearcher...')
+                    if tracer is not None:
+                        tracer.span('expand grid and check finished runs', t_expand, t_pause, args=dict(counts))
+                        tracer.span('pause', t_pause, time.time())
+
+                if shard is not None and shard.work_stealing: # the points are claimed right before they are started
+                    runnable_points = grid_shard.claimed(runnable_points, lambda point: self._is_finished(point, run_ledger))
+
+                t_execute = time.time()
+                if tracer is not None:
+                    tracer.queue_start = t_execute
+                results = self._execute(runnable_points, cfg_sched, cfg_torchrun, create_state_finished, engine, listeners, logs, retries,
+                                        handler)
+                n_failed = self._count_failed(results)
+                if tracer is not None:
+                    tracer.span('execute', t_execute, time.time(), args=dict(runs=len(results), failed=n_failed))
+
+                console_info = f'Commands:\tRunnable: {counts["runnable"]}\tFinished: {counts["total"] - counts["runnable"]}\tTotal: {counts["total"]}\tFailed: {n_failed}'
+                if grid_shard is not None and shard.work_stealing:
+                    console_info += f'\tStolen: {grid_shard.n_stolen}'
+                if result_cache is not None:
+                    console_info += f'\tReused: {result_cache.n_reused}'
+                if retries is not None:
+                    console_info += f'\tRetried: {len(results) - len(set((r.point.index, r.point.root) for r in results))}'
+                stopped = handler is not None and handler.requested
+                if stopped:
+                    console_info += f'\tInterrupted: {handler.n_interrupted}'
+                print('GridSearcher ended. Summary:' if not stopped else 'GridSearcher stopped by a signal. Summary:')
+                print(console_info)
+                if stopped:
+                    handler.exit()
+            finally:
+                if result_cache is not None: # the outputs of the last runs might still be copied to the store
+                    result_cache.close()
+                if run_telemetry is not None:
+                    run_telemetry.stop_publishing()
+                if tracer is not None:
+                    tracer.export()
+
+    def _order(self, points, ordering, ledger, param_name_for_exp_root_folder):
+        """
+        Description:
+            Sorts the points according to `ordering` and prints where the estimated durations come from.
 
-            cmds_total = 0 # how many program instances (commands to run) were generated by the cartesian product of hyper-parameters grid
-            cmds_runnable = 0 # some runs might have already been run
+        Args:
+            :param points: a list of GridPoint objects
+            :param ordering: an object of type OrderingConfig
+            :param ledger: the path of the ledger of the current grid or None, used as history if `ordering.history` is None
+            :param param_name_for_exp_root_folder: the name of the cmd argument for the output directory of the script
+        """
+        paths = ordering.history
+        if paths is None:
+            paths = [] if ledger is None else [ledger]
+        history = None
+        if len(paths) > 0: # the templates and the root folder are derived from the other parameters, they are not compared
+            derived = {f'_{k[len("template_"):]}' for k in self.__dict__ if k.startswith('template_')}
+            derived.add(f'_{forward_key_replace(param_name_for_exp_root_folder)}')
+            keys = [k[1:] for k in self.__dict__ if k.startswith('_') and k not in derived]
+            history = DurationHistory(paths, keys)
+
+        points, counts = order_points(points, ordering, history)
+        print(f'Ordering:\t{"custom priority" if ordering.priority is not None else "longest first"}\t'
+              f'Estimated from history: {counts["history"]}\tFrom cost hint: {counts["cost"]}\tUnknown: {counts["unknown"]}')
+        return points
+
+    def _execute(self, points, cfg_sched, cfg_torchrun, create_state_finished, engine, listeners=(), logs=None, retries=None,
+                 handler=None):
+        """
+        Description:
+            Runs the points with the given engine and returns the list of RunResult objects (one for each attempt with retries).
+            The ShutdownHandler `handler` is installed while the runs are executed, if the signals can be handled by this process.
+        """
+        if handler is not None and not handler.install():
+            handler = None
+        try:
+            if engine == GSEngine.ASYNCIO:
+                return AsyncLauncher(self.exe, cfg_sched, cfg_torchrun, create_state_finished, listeners, logs, retries, handler).run(points)
+            return self._run_pool(points, cfg_sched, cfg_torchrun, create_state_finished, listeners, logs, retries, handler)
+        finally:
+            if handler is not None:
+                handler.uninstall()
+
+    @staticmethod
+    def _count_failed(results):
+        """
+            Returns the number of points whose last attempt failed, without the runs interrupted by a signal.
+        """
+        last = {(result.point.index, result.point.root): result for result in results} # the results are in the order the runs finished
+        return sum([result.code != 0 and result.failure != GSFailure.INTERRUPTED for result in last.values()])
 
-            params_list = [] # will hold the parameters to be send to the MultiProcessing worker to run experiments
-            for cmd, root, cmd_dict in zip(cmds, root_folders, cmds_dict):
-                cmds_total += 1
-                if os.path.isfile(os.path.join(root, 'state.finished')):
+    def _submit_slurm(self, points, cfg_sched, cfg_torchrun, create_state_finished, slurm):
+        """
+        Description:
+            Writes all points to the manifest and submits the indices of the points that are not finished yet as one SLURM job array.
+            The indices in the manifest do not change between submissions of the same grid, so a grid can be submitted again to run
+            the points that failed or did not start. In packing mode, the allocations of the packing workers are submitted instead, if
+            some unfinished points are not claimed by the workers of a previous submission (see SlurmConfig.reset_claims).
+        """
+        points = list(points)
+        pack = None
+        if slurm.pack_workers is not None:
+            pack = dict(walltime=parse_walltime(slurm.sbatch_args['time']), batch_size=slurm.pack_batch_size,
+                        reserve_seconds=slurm.pack_reserve_seconds)
+        write_manifest(slurm.manifest, points, self.exe, cfg_sched, cfg_torchrun, create_state_finished, pack)
+        indices = [index for index, point in enumerate(points) if not self._is_finished(point)]
+
+        console_info = f'Commands:\tRunnable: {len(indices)}\tFinished: {len(points) - len(indices)}\tTotal: {len(points)}'
+        print(console_info)
+        if len(indices) == 0:
+            print('[GridSearcher] all points are finished, nothing to submit')
+            return
+        if slurm.pack_workers is not None:
+            claimed = set() if slurm.reset_claims else claimed_indices(slurm.manifest) & set(indices)
+            if len(claimed) > 0:
+                print(f'[GridSearcher] {len(claimed)} unfinished points are claimed by packing workers of a previous submission, they are '
+                      f'not run again (set reset_claims=True once these workers are gone)')
+            if len(claimed) == len(indices):
+                return
+            submit_pack_workers(slurm.manifest, slurm)
+        else:
+            submit_array(slurm.manifest, indices, slurm)
+
+    def _run_halving(self, param_name_for_exp_root_folder, cfg_sched, cfg_torchrun, create_state_finished, engine, ledger, listeners,
+                     halving, logs=None, retries=None, tracer=None, handler=None):
+        """
+        Description:
+            Runs the configurations given by `cfg_sched` with successive halving or Hyperband. In each rung, the configurations are run
+            with the budget of the rung (given to the script as `halving.budget_param`), then the metric written by each run in its root
+            folder is read and only the best configurations are promoted to the next rung.
+            The exp_folder template must depend on the budget parameter, such that each rung writes to its own root folder.
+
+        Args:
+            :param halving: an object of type HalvingConfig
+            :param tracer: an object of type Tracer that records the execution of each rung, or None
+            :param handler: an object of type ShutdownHandler, the brackets are stopped after the rung during which a signal was received
+            (the other parameters have the same meaning as in `run`)
+        """
+        params = grid_params(cfg_sched.params_values)
+        assert halving.budget_param not in params, f'{halving.budget_param} is set by the halving scheduler, remove it from params_values'
+
+        renderer = CommandRenderer(self, params + [halving.budget_param], param_name_for_exp_root_folder, self.exp_folder_template)
+        if renderer.root_key not in renderer.affected[renderer.grid_keys[-1]]:
+            raise RuntimeError(f'The exp_folder template must use ${{{halving.budget_param}}}, otherwise the rungs of successive halving '
+                               f'write to the same root folders')
+
+        candidates = list(self._grid_values(cfg_sched))
+        final = [] # (metric, root) of the configurations that reached the last rung of their bracket
+
+        for bracket, (indices, budgets) in enumerate(halving_brackets(halving, len(candidates))):
+            for rung, budget in enumerate(budgets):
+                points = list(self._render_points(renderer, [candidates[i] + (budget,) for i in indices]))
+
+                counts = dict(total=0, runnable=0)
+                runnable_points = list(self._skip_finished(points, counts, ledger))
+                if handler is not None:
+                    runnable_points = list(flag_interrupted(runnable_points, handler.cfg, counts, ledger))
+                    if handler.cfg.resume_first:
+                        runnable_points = resumed_first(runnable_points)
+                t_execute = time.time()
+                if tracer is not None:
+                    tracer.queue_start = t_execute
+                results = self._execute(runnable_points, cfg_sched, cfg_torchrun, create_state_finished, engine, listeners, logs, retries,
+                                        handler)
+                n_failed = self._count_failed(results)
+                if tracer is not None:
+                    tracer.span('execute', t_execute, time.time(), args=dict(runs=len(results), failed=n_failed))
+                metrics = [read_metric(point.root, halving) for point in points]
+
+                print(f'Bracket {bracket}\tRung {rung}: {halving.budget_param}={budget}\t'
+                      f'Runnable: {counts["runnable"]}\tFinished: {counts["total"] - counts["runnable"]}\tTotal: {counts["total"]}\tFailed: {n_failed}')
+                if handler is not None and handler.requested: # the next launch resumes the interrupted runs of this rung
+                    print(f'GridSearcher stopped by a signal. Interrupted: {handler.n_interrupted}')
+                    handler.exit()
+
+                if rung == len(budgets) - 1:
+                    final.extend([(m, point.root) for m, point in zip(metrics, points) if m is not None])
+                else:
+                    indices = promote(indices, metrics, halving)
+                    if len(indices) == 0:
+                        print(f'Bracket {bracket}: no run reported the metric {halving.metric} in {halving.metric_file}, stopping the bracket')
+                        break
+
+        print('GridSearcher ended. Summary:')
+        if len(final) > 0:
+            metric, root = sorted(final, key=lambda item: item[0], reverse=(halving.mode == 'max'))[0]
+            print(f'Best configuration: {halving.metric}={metric}\t{root}')
+
+    def _run_pool(self, points, cfg_sched, cfg_torchrun, create_state_finished, listeners=(), logs=None, retries=None, shutdown=None):
+        """
+        Description:
+            Runs the points on a multiprocessing pool. The GPU slots are managed centrally by a GPUSlotScheduler: the next point is
+            sent to the pool as soon as a slot is free and the slot is given back by the pool callback when the run exits.
+
+        Args:
+            :param points: an iterable of GridPoint objects to run, it is consumed lazily
+            :param cfg_sched: an object of type SchedulingConfig
+            :param cfg_torchrun: an object of type TorchRunConfig
+            :param create_state_finished: whether to create the file "state.finished" or not
+            :param listeners: a list of RunListener objects that are notified when a run is launched and when it exits
+            :param logs: an object of type LogConfig to write the output of the runs to log files, None to print it to the console
+            :param retries: an object of type RetryConfig to start the failed runs again, None to run each point once
+            :param shutdown: an installed ShutdownHandler that stops the grid on SIGINT/SIGTERM, None to keep the default signal handling
+            :return: a list of RunResult objects, in the order the runs finished
+        """
+        scheduler = create_scheduler(cfg_sched)
+        n_workers = scheduler.total_slots() # at most one run per slot
+        if cfg_sched.gpus_per_run is None and cfg_sched.distributed_training: # each run uses all GPUs of a host (distributed training)
+            n_workers //= gpus_for_point(None, cfg_sched)
+
+        queue = PointQueue(points, lambda point: gpus_for_point(point, cfg_sched), cfg_sched.lookahead,
+                           lambda point: memory_for_point(point, cfg_sched))
+        ports = create_port_allocator(cfg_torchrun) # None if the runs use the fixed master_port
+        policy = None if retries is None else RetryPolicy(retries, logs)
+        results = []
+        last_launch = None
+
+        tuner = None
+        if cfg_sched.autotune is not None: # the pool is sized for max_jobs_per_gpu, the tuner starts with fewer slots per GPU
+            tuner = ConcurrencyTuner(cfg_sched.autotune, scheduler, cfg_sched.max_jobs_per_gpu)
+            listeners = list(listeners) + [tuner]
+            tuner.start()
+
+        initializer, initargs = (None, ()) if shutdown is None else (init_worker, (shutdown.pid_queue,))
+        with mp.Pool(processes=n_workers, initializer=initializer, initargs=initargs) as pool:
+            # with retries, a running point might come back to the queue, so the loop also waits for the running points
+            while not queue.empty() or (policy is not None and scheduler.busy() > 0):
+                # blocks until a run exits if no pending point fits on the free slots (with retries, checks the delayed points every second
+                # and, when the signals are handled, whether the grid is stopped)
+                placed = scheduler.wait_for(lambda: queue.pop_placeable(scheduler) or (queue.empty() and scheduler.busy() == 0),
+                                            timeout=None if policy is None and shutdown is None else 1.)
+                if shutdown is not None and shutdown.requested: # no new run is started, the pending points are left for the next launch
+                    if type(placed) is tuple:
+                        scheduler.release(placed[1])
+                    break
+                if type(placed) is not tuple: # all runs finished or no point is ready yet
                     continue
-                cmds_runnable += 1
-                params_list.append([cmd, root, cmd_dict])
-
-            console_info = f'Commands:\tRunnable: {cmds_runnable}\tFinished: {cmds_total - cmds_runnable}\tTotal: {cmds_total}'
-            print(console_info)
-
-            pause_process(seconds=5, message=f'Waiting 5 seconds before running GridSearcher...')
-
-            if cmds_runnable > 0:
-                # transform the params list (previously initialized)
-                params_list = [
-                    (
-                        self.exe, # python or composer
-                        index, # run index, zero based
-                        cmd,
-                        root,
-                        cmd_dict,
-                        gpu_processes_count, # shared dict where key=gpu id and value=processes cound per gpu id
-                        cfg_sched,
-                        cfg_torchrun,
-                        create_state_finished
-                    )
-                    for index, (cmd, root, cmd_dict) in enumerate(params_list)
-                ]
-
-                with mp.Pool(processes=n_workers) as pool:
-                    lock_release() # make sure there are no lock files on disk before starting pool
-                    pool.map(func=waiting_worker, iterable=params_list)
-
-            print('GridSearcher ended. Summary:')
-            print(console_info)
-
-    def _create_root_arg(self, param_name_for_exp_root_folder, exp_folder):
+                point, gpus = placed
+
+                if cfg_sched.warmup_seconds > 0 and last_launch is not None:
+                    # give the previous script some time to allocate its GPU memory
+                    time.sleep(max(0., last_launch + cfg_sched.warmup_seconds - time.monotonic()))
+                last_launch = time.monotonic()
+
+                port = None if ports is None else ports.acquire()
+                for listener in listeners:
+                    listener.on_launch(point, gpus)
+
+                def on_exit(result, point=point, gpus=gpus, port=port):
+                    if isinstance(result, BaseException): # the worker raised, e.g. the root folder could not be prepared
+                        print(f'[GridSearcher] could not start the run in {point.root}: {result}')
+                        result = launch_failure(point, gpus, result)
+                    results.append(result)
+                    interrupted = shutdown is not None and shutdown.on_exit(result)
+                    if policy is not None and not interrupted:
+                        retry = policy.on_exit(result)
+                        if retry is not None:
+                            queue.push_later(*retry)
+                    for listener in listeners:
+                        listener.on_exit(result)
+                    if port is not None:
+                        ports.release(port)
+                    scheduler.release(gpus)
+
+                pool.apply_async(
+                    func=waiting_worker,
+                    args=((self.exe, point, gpus, port, cfg_torchrun, create_state_finished, logs),),
+                    callback=on_exit,
+                    error_callback=on_exit)
+
+            if shutdown is not None:
+                while not scheduler.wait_idle(timeout=1.):
+                    shutdown.drain() # the runs started right before the signal get it once their pid is known
+            scheduler.wait_idle()
+            pool.close() # the workers exit on their own, they might ignore SIGTERM when terminated by the pool
+            pool.join()
+        if tuner is not None:
+            tuner.stop()
+        return results
+
+    def _expand_grid(self, param_name_for_exp_root_folder, cfg_sched):
+        """
+        Description:
+            Generator that expands the cartesian product of `cfg_sched.params_values` one point at a time. The points are never
+            stored in a list, which keeps the memory constant regardless of the grid size. If `cfg_sched.sampling` is set, the points
+            are sampled from the search space instead. The points violating `cfg_sched.constraints` are removed before being rendered.
+
+        Args:
+            :param param_name_for_exp_root_folder: the name of the cmd argument for the output directory of the script
+            :param cfg_sched: an object of type SchedulingConfig
+            :return: yields GridPoint objects in the order of the cartesian product
+        """
+        params = grid_params(cfg_sched.params_values) # if we do grid search for lr and wd, then params will contain "lr" and "wd"
+
+        # analyses the templates once, then each point only renders the templates that depend on the values that changed
+        renderer = CommandRenderer(self, params, param_name_for_exp_root_folder, self.exp_folder_template)
+        yield from self._render_points(renderer, self._grid_values(cfg_sched))
+
+    def _grid_values(self, cfg_sched):
+        """
+            Returns an iterable with the values of the points, e.g. the cartesian product of params_values (with the sub-grids of the
+            Choice parameters) or the sampled points, without the points violating the constraints.
+        """
+        if cfg_sched.sampling is None:
+            grid = expand_space(cfg_sched.params_values)
+        else:
+            grid = sample_points(cfg_sched.params_values, cfg_sched.sampling) # generated in a single vectorized batch
+        if len(cfg_sched.constraints) == 0:
+            return grid
+        # the constraints can also use the fixed parameters, but not the templates, which are only known after rendering
+        fixed = {k[1:]: v for k, v in self.__dict__.items() if k.startswith('_') and f'template{k}' not in self.__dict__ and v is not ABSENT}
+        return ConstraintFilter(cfg_sched.constraints, grid_params(cfg_sched.params_values), fixed)(grid)
+
+    @staticmethod
+    def _render_points(renderer, grid):
+        """
+            Generator that renders the points with values in `grid` using the CommandRenderer `renderer`.
+        """
+        for index, values in enumerate(grid):
+            cmd, root_folder, cmd_dict = renderer.render(values)
+            yield GridPoint(index=index, cmd=cmd, root=root_folder, cmd_dict=cmd_dict)
+
+    @staticmethod
+    def _skip_finished(points, counts, ledger=None, full_grid=False):
         """
         Description:
-            This method fills in the exp_folder template and adds it to the __dict__ to be used as output directory.
-            For example, if your python script requires setting the parameter "output_dir" to specify where to save checkpoints,
-            then you can specify param_name_for_exp_root_folder="output_dir" and the value for this parameter will be given by
-            the value of `exp_folder` (which can be a template).
+            Generator that filters out the points that were already run, e.g. the ones having the file `state.finished` in their root folder
+            or, if a ledger is given, the ones recorded as finished in the ledger.
 
         Args:
-            :param param_name_for_exp_root_folder: a string containing the argument name for the experiment root folder
+            :param points: an iterable of GridPoint objects
+            :param counts: a dictionary with keys "total" and "runnable" that is updated while the points are consumed
+            :param ledger: an object of type RunLedger or None
+            :param full_grid: whether `points` is the whole grid. The state.finished files are only marked as imported in the ledger
+                after a pass over the whole grid, not over a shard or a rung of successive halving, whose other points were not checked
         """
-        exp_root_folder = self._fill_template(exp_folder) # fill in the template
-        self.add_param(param_name_for_exp_root_folder, exp_root_folder) # add to the __dict__
-        return exp_root_folder
+        for point in points:
+            counts['total'] += 1
+            if GridSearcher._is_finished(point, ledger):
+                continue
+            counts['runnable'] += 1
+            yield point
+
+        if ledger is not None and full_grid: # all points were checked once, the state.finished files were imported
+            ledger.mark_import_complete()
+
+    @staticmethod
+    def _is_finished(point, ledger=None):
+        """
+            Checks whether the point was already run, using the ledger if given or the file `state.finished` in its root folder otherwise.
+        """
+        if ledger is not None:
+            return ledger.is_finished(point)
+        return os.path.isfile(os.path.join(point.root, 'state.finished'))
 
     def _fill_template(self, template):
         """
@@ -284,6 +664,8 @@ class GridSearcher:
 
         for k, v in self.__dict__.items(): # iterate through __dict__
             if k.startswith('_'): # process parameters with underscore prefix because these are the ones that we added to GridSearcher
+                if v is ABSENT: # the parameter belongs to a branch of a Choice that was not chosen
+                    continue
                 if isinstance(v, bool): # we have a boolean parameter without a value, but its presence or absence means True or False
                     if v:
                         params.append(f'{dash_or_not}{backward_key_replace(k)}') # replace
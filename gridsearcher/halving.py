@@ -0,0 +1,78 @@
+import os
+import csv
+import json
+import math
+import random
+
+def rung_budgets(cfg, s):
+    """
+        Returns the budgets of the s+1 rungs of a successive halving bracket: max_budget * eta^(i - s) for i = 0, ..., s.
+        The budgets are integers if both min_budget and max_budget are integers.
+    """
+    budgets = [cfg.max_budget * cfg.eta ** (i - s) for i in range(s + 1)]
+    if type(cfg.min_budget) is int and type(cfg.max_budget) is int:
+        budgets = [max(1, int(round(b))) for b in budgets]
+    return budgets
+
+def halving_brackets(cfg, n_configs):
+    """
+    Description:
+        Splits the configurations in brackets. Successive halving uses a single bracket with all configurations, starting at min_budget.
+        Hyperband uses s_max + 1 brackets (s = s_max, ..., 0), where bracket s starts with ceil((s_max + 1) / (s + 1) * eta^s)
+        configurations at budget max_budget * eta^(-s). The configurations are shuffled with `cfg.seed` and assigned to the brackets
+        in order, so the last brackets might get fewer configurations (or none) if the grid is small.
+
+    Args:
+        :param cfg: an object of type HalvingConfig
+        :param n_configs: the number of configurations
+        :return: a list of tuples (indices of the configurations, list of budgets of the rungs)
+    """
+    s_max = int(math.floor(math.log(cfg.max_budget / cfg.min_budget) / math.log(cfg.eta) + 1e-9))
+    if not cfg.hyperband:
+        return [(list(range(n_configs)), rung_budgets(cfg, s_max))]
+
+    indices = list(range(n_configs))
+    random.Random(cfg.seed).shuffle(indices)
+    brackets, start = [], 0
+    for s in range(s_max, -1, -1):
+        n = int(math.ceil((s_max + 1) / (s + 1) * cfg.eta ** s))
+        if start < n_configs:
+            brackets.append((indices[start:start + n], rung_budgets(cfg, s)))
+        start += n
+    return brackets
+
+def read_metric(root, cfg):
+    """
+        Reads the metric `cfg.metric` written by a run in its root folder. Returns None if the file or the metric does not exist.
+    """
+    path = os.path.join(root, cfg.metric_file)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path) as f:
+            if path.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+                value = rows[-1][cfg.metric]
+            else:
+                value = json.load(f)[cfg.metric]
+        value = float(value)
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    return None if math.isnan(value) else value
+
+def promote(indices, metrics, cfg):
+    """
+    Description:
+        Selects the configurations promoted to the next rung: the best floor(n / eta) of the n configurations (at least one).
+        Configurations without a metric (e.g. failed runs) are never promoted.
+
+    Args:
+        :param indices: the indices of the configurations that were run in the current rung
+        :param metrics: a list with the metric of each configuration in `indices` (None if missing)
+        :param cfg: an object of type HalvingConfig
+        :return: the list of promoted indices, best first
+    """
+    k = max(1, len(indices) // cfg.eta)
+    ranked = [(m, i) for i, m in zip(indices, metrics) if m is not None]
+    ranked.sort(key=lambda item: item[0], reverse=(cfg.mode == 'max'))
+    return [i for m, i in ranked[:k]]
@@ -0,0 +1,39 @@
+import os
+import shlex
+
+class Transport:
+    """
+    Description:
+        Base class for the ways of launching a command on a host of the pool. A transport receives the shell command built for the GPUs
+        of the host and returns the shell command to execute on the GridSearcher machine. The root folders are written by the GridSearcher process, so they must be on a filesystem shared with the hosts.
+    """
+    def wrap_cmd(self, host, cmd):
+        raise NotImplementedError
+
+class LocalTransport(Transport):
+    """
+    Description:
+        Runs the commands of the host on the local machine, e.g. to test a multi-host configuration without SSH.
+    """
+    def wrap_cmd(self, host, cmd):
+        return cmd
+
+class SSHTransport(Transport):
+    """
+    Description:
+        Runs the commands of the host through SSH, in the directory `cwd` of the host (the current directory of the GridSearcher
+        process by default, which assumes the same directory layout on all hosts). A signal sent to the run only reaches the local
+        ssh client, not the remote process, hence these hosts cannot be used together with a ShutdownConfig.
+    Attributes:
+        ssh (str): the SSH executable
+        options (List[str]): extra arguments for ssh, BatchMode makes ssh fail instead of asking for a password
+        cwd (str): the working directory on the remote host
+    """
+    def __init__(self, ssh='ssh', options=('-o', 'BatchMode=yes'), cwd=None):
+        self.ssh = ssh
+        self.options = list(options)
+        self.cwd = os.getcwd() if cwd is None else cwd
+
+    def wrap_cmd(self, host, cmd):
+        remote = f'cd {shlex.quote(self.cwd)} && {cmd}'
+        return ' '.join([self.ssh] + self.options + [host, shlex.quote(remote)])
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+from .tools import RunListener, GSFailure
+from .file_locker import FileLock
+
+def point_key(point):
+    """
+        Returns a canonical hash of the parameters of a point, which does not depend on the order of the parameters.
+    """
+    canonical = json.dumps({k: str(v) for k, v in point.cmd_dict.items()}, sort_keys=True)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+class RunLedger(RunListener):
+    """
+    Description:
+        Append-only journal (one JSON record per line) with the status of the runs of a grid, keyed by the canonical hash of the parameters
+        of each run. The journal is read once when the ledger is created and kept as an in-memory index, such that deciding whether a run
+        was already finished does not touch the results tree.
+
+        Each run gets a "running" record when it is launched and a "finished", "failed" or "interrupted" (stopped by a signal received by
+        the launcher, see ShutdownConfig) record when it exits, containing the exit code, the GPUs, the start/end time, the duration and
+        the parameters (used to estimate the duration of similar runs in later grids). The last record of a key wins.
+
+        Grids that were run before the ledger existed are imported once: until the first full pass over a grid is completed, the points
+        that are not in the ledger are also checked for the file `state.finished` in their root folder and recorded as finished. A pass
+        over a shard or over a rung of successive halving does not complete the import, since the other points were not checked.
+    Attributes:
+        path (str): absolute path of the journal file
+        records (Dict[str, dict]): the last record for each run key
+        import_complete (bool): whether the state.finished markers were already imported
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True) # e.g. a ledger in the experiment folder on the first launch
+        self.lock = FileLock(f'{self.path}.lock') # the journal might be shared by multiple GridSearcher processes
+        self.records = {}
+        self.import_complete = False
+        self.load()
+
+    def load(self):
+        """
+            Reads the whole journal and rebuilds the in-memory index.
+        """
+        self.records = {}
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError: # a partially written line, e.g. if the launcher was killed while writing
+                    continue
+                if record.get('event') == 'import':
+                    self.import_complete = True
+                else:
+                    self.records[record['key']] = record
+
+    def is_finished(self, point):
+        """
+            Checks whether the point was already run successfully, importing its state.finished marker if needed.
+        """
+        key = point_key(point)
+        record = self.records.get(key)
+        if record is not None:
+            return record['status'] == 'finished'
+        if not self.import_complete and os.path.isfile(os.path.join(point.root, 'state.finished')):
+            self.append(dict(key=key, status='finished', root=point.root, source='state.finished'))
+            return True
+        return False
+
+    def mark_import_complete(self):
+        """
+            Called after a full pass over the grid, from now on the state.finished files are not checked anymore.
+        """
+        if not self.import_complete:
+            self._write(dict(event='import', time=time.time()))
+            self.import_complete = True
+
+    def append(self, record):
+        self.records[record['key']] = record
+        self._write(record)
+
+    def on_launch(self, point, gpus):
+        record = dict(key=point_key(point), status='running', root=point.root, gpus=gpus, start=time.time())
+        if getattr(gpus, 'host', None) is not None:
+            record['host'] = gpus.host.name
+        self.append(record)
+
+    def on_exit(self, result):
+        self.append(dict(
+            key=point_key(result.point),
+            status='finished' if result.code == 0 else 'interrupted' if result.failure == GSFailure.INTERRUPTED else 'failed',
+            root=result.point.root,
+            code=result.code,
+            gpus=result.gpus,
+            start=result.start,
+            end=result.end,
+            duration=result.duration,
+            params={k[1:]: str(v) for k, v in result.point.cmd_dict.items()},
+            attempt=result.point.attempt,
+            failure=None if result.failure is None else result.failure.value))
+
+    def _write(self, record):
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
@@ -0,0 +1,125 @@
+import os
+import json
+from .ledger import point_key
+from .search_space import evaluate_expression
+
+def evaluate_cost(cost, params):
+    """
+        Returns the cost hint of a run: `cost` is either an expression of the parameters (e.g. "epochs * batch_size") or a function
+        receiving the parameters as a dictionary.
+    """
+    if callable(cost):
+        return float(cost(params))
+    return float(evaluate_expression(cost, params))
+
+class DurationHistory:
+    """
+    Description:
+        Durations of the finished runs of previous grids, read from ledger files. The duration of a run is estimated from the runs with
+        the same parameters or, if there are none, from the runs that differ in a single parameter (e.g. another learning rate with the
+        same model and number of epochs). Only the parameters in `keys` are compared, such that the parameters derived from the others
+        (templates, root folder) do not prevent a match.
+    Attributes:
+        keys (List[str]): the names of the compared parameters
+        by_key (Dict[str, float]): the duration of each run, by canonical hash of all its parameters (see point_key)
+        by_params (Dict[str, List[float]]): the durations of the runs with the same compared parameters
+        by_neighbour (Dict[Tuple[str, str], List[float]]): the durations of the runs with the same compared parameters, except one
+    """
+    def __init__(self, paths, keys):
+        self.keys = sorted(keys)
+        self.by_key = {}
+        self.by_params = {}
+        self.by_neighbour = {}
+        for path in paths:
+            self.load(path)
+
+    def load(self, path):
+        """
+            Adds the finished runs of a ledger file (the last record of each run wins, the runs without duration are ignored).
+        """
+        if not os.path.isfile(path):
+            return
+        records = {}
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError: # a partially written line
+                    continue
+                if 'key' in record:
+                    records[record['key']] = record
+
+        for key, record in records.items():
+            if record['status'] != 'finished' or record.get('duration') is None:
+                continue
+            duration = float(record['duration'])
+            self.by_key[key] = duration
+            if 'params' in record: # the records written before the parameters were stored only match the same run
+                params = {k: record['params'].get(k) for k in self.keys}
+                self.by_params.setdefault(self._canonical(params), []).append(duration)
+                for k in self.keys:
+                    self.by_neighbour.setdefault((k, self._canonical(params, without=k)), []).append(duration)
+
+    def estimate(self, point):
+        """
+            Returns the estimated duration of a point in seconds, None if there are no similar runs.
+        """
+        duration = self.by_key.get(point_key(point))
+        if duration is not None:
+            return duration
+
+        params = {k: self._value(point, k) for k in self.keys}
+        durations = self.by_params.get(self._canonical(params))
+        if durations is None:
+            durations = [d for k in self.keys for d in self.by_neighbour.get((k, self._canonical(params, without=k)), [])]
+        if len(durations) == 0:
+            return None
+        return sum(durations) / len(durations)
+
+    @staticmethod
+    def _value(point, key):
+        value = point.cmd_dict.get(f'_{key}')
+        return None if value is None else str(value)
+
+    @staticmethod
+    def _canonical(params, without=None):
+        return json.dumps({k: v for k, v in params.items() if k != without}, sort_keys=True)
+
+def order_points(points, cfg, history=None):
+    """
+    Description:
+        Sorts the points by decreasing priority. By default, the priority is the estimated duration (longest processing time first): the
+        estimate from the history if there is one, otherwise the cost hint multiplied by the average ratio between the duration and the
+        cost hint of the points having both (the cost hint is used as is if there are none). The points without estimate get the mean of
+        the estimates and the ties keep the order of the grid.
+
+    Args:
+        :param points: a list of GridPoint objects
+        :param cfg: an object of type OrderingConfig
+        :param history: an object of type DurationHistory or None
+        :return: a tuple (the sorted list of points, a dictionary with the number of points estimated from the history, from the cost
+                 hint and without estimate)
+    """
+    params = [{k[1:]: v for k, v in point.cmd_dict.items()} for point in points]
+    durations = [None] * len(points) if history is None else [history.estimate(point) for point in points]
+    counts = dict(history=sum(d is not None for d in durations), cost=0, unknown=0)
+
+    if cfg.cost is not None:
+        costs = [evaluate_cost(cfg.cost, p) for p in params]
+        known = [(d, c) for d, c in zip(durations, costs) if d is not None]
+        scale = 1.
+        if len(known) > 0 and sum(c for _, c in known) > 0:
+            scale = sum(d for d, _ in known) / sum(c for _, c in known) # seconds per unit of cost
+        counts['cost'] = sum(d is None for d in durations)
+        durations = [c * scale if d is None else d for d, c in zip(durations, costs)]
+    counts['unknown'] = sum(d is None for d in durations)
+
+    if cfg.priority is not None:
+        priorities = [cfg.priority(p, d) for p, d in zip(params, durations)]
+    else:
+        known = [d for d in durations if d is not None]
+        mean = sum(known) / len(known) if len(known) > 0 else 0.
+        priorities = [mean if d is None else d for d in durations]
+
+    order = sorted(range(len(points)), key=lambda i: -priorities[i]) # stable, ties keep the order of the grid
+    return [points[i] for i in order], counts
@@ -0,0 +1,66 @@
+import os
+import errno
+import socket
+import threading
+
+def is_port_free(addr, port):
+    """
+        Checks whether a TCP port can be bound on `addr`. If `addr` is not an address of this machine, all interfaces are checked instead.
+    """
+    for host in [addr, '']:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            try:
+                s.bind((host, port))
+                return True
+            except OSError as e:
+                if e.errno == errno.EADDRINUSE:
+                    return False
+    return False
+
+class PortAllocator:
+    """
+    Description:
+        Leases TCP ports to the concurrent torchrun runs of a GridSearcher process, such that two runs never use the same rendezvous
+        endpoint. A port is leased only if it is not leased to another run and it can be bound at the moment of the lease; it is given
+        back when the run exits.
+    Attributes:
+        addr (str): the address the ports are checked on (the master address of torchrun)
+        base_port (int): the first port of the pool
+        max_ports (int): the size of the pool, e.g. the ports in [base_port, base_port + max_ports) are used
+        leased (Set[int]): the ports currently leased
+    """
+    def __init__(self, addr, base_port, max_ports=1000):
+        self.addr = addr
+        self.base_port = base_port
+        self.max_ports = max_ports
+        self.leased = set()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+            Leases the first verified-free port of the pool. Raises RuntimeError if all ports are taken.
+        """
+        with self._lock:
+            for port in range(self.base_port, min(self.base_port + self.max_ports, 65536)):
+                if port not in self.leased and is_port_free(self.addr, port):
+                    self.leased.add(port)
+                    return port
+        raise RuntimeError(f'No free port in the range [{self.base_port}, {self.base_port + self.max_ports}) on {self.addr}')
+
+    def release(self, port):
+        with self._lock:
+            self.leased.discard(port)
+
+def create_port_allocator(cfg_torchrun):
+    """
+        Returns a PortAllocator if the runs are launched with torchrun and automatic ports are enabled, otherwise None.
+    """
+    if cfg_torchrun.torchrun and cfg_torchrun.auto_port:
+        return PortAllocator(cfg_torchrun.master_addr, cfg_torchrun.master_port)
+    return None
+
+def rdzv_id(port):
+    """
+        Returns a rendezvous id for the run using `port`, which is unique among the runs that are running at the same time.
+    """
+    return f'gs{os.getpid()}-{port}'
@@ -0,0 +1,197 @@
+from string import Template
+from .tools import forward_key_replace, backward_key_replace
+from .search_space import ABSENT
+
+def template_identifiers(template):
+    """
+        Returns the names of the variables used in `template`, e.g. ["lr", "wd"] for Template("lr=${lr}_wd=$wd")
+    """
+    names = []
+    for mo in template.pattern.finditer(template.template):
+        name = mo.group('named') or mo.group('braced')
+        if name is not None and name not in names:
+            names.append(name)
+    return names
+
+def compile_template(template):
+    """
+        Splits `template` into a list of literal strings and variable names (the even positions hold the literals and the odd positions
+        hold the names), such that it can be rendered with a single join instead of a regular expression substitution.
+        Example: Template("lr=${lr}_wd=$wd") -> ["lr=", "lr", "_wd=", "wd", ""]
+    """
+    parts, literal, last = [], [], 0
+    text = template.template
+    for mo in template.pattern.finditer(text):
+        literal.append(text[last:mo.start()])
+        last = mo.end()
+        if mo.group('escaped') is not None:
+            literal.append(template.delimiter)
+        elif mo.group('invalid') is not None:
+            raise ValueError(f'[TemplateError] invalid placeholder in template "{text}" at position {mo.start("invalid")}')
+        else:
+            parts.extend([''.join(literal), mo.group('named') or mo.group('braced')])
+            literal = []
+    literal.append(text[last:])
+    parts.append(''.join(literal))
+    return parts
+
+def normalize_value(value):
+    """
+        Converts a parameter value the same way GridSearcher.add_param stores it: lists are joined by spaces, everything else is kept.
+    """
+    if isinstance(value, list):
+        return ' '.join(map(str, value))
+    return value
+
+class CommandRenderer:
+    """
+    Description:
+        Compiled version of the per-point rendering done by GridSearcher: the templates are analysed once to build a dependency graph
+        (which parameters and templates feed which templates) and, for each point of the grid, only the templates whose inputs changed
+        since the previous point are rendered again. The command line is kept as a list of pre-rendered "--key value" tokens, so building
+        the command of a point costs one join instead of a scan of GridSearcher.__dict__.
+
+        The produced commands are identical to the ones of GridSearcher._build_command. The changed values are also written back to the
+        GridSearcher object, such that its attributes hold the values of the last rendered point, as before.
+    Attributes:
+        gs (GridSearcher): the object holding the parameters and the templates
+        grid_keys (List[str]): the internal keys (with underscore prefix) of the parameters in params_values, in the order of the product
+        root_key (str): the internal key of the experiment root folder parameter
+        order (List[str]): the internal keys in the order they appear in the command
+    """
+    def __init__(self, gs, grid_params, param_name_for_exp_root_folder, exp_folder):
+        self.gs = gs
+        self.dash = '--' if gs.use_dashes else '@'
+        self.sep = gs.key_value_separator
+        self.grid_keys = [f'_{forward_key_replace(k)}' for k in grid_params]
+        self.root_key = f'_{forward_key_replace(param_name_for_exp_root_folder)}'
+
+        # make sure all keys exist in __dict__, in the same order as add_param would have inserted them during the first point
+        for key in self.grid_keys + [self.root_key]:
+            if key not in gs.__dict__:
+                gs.__dict__[key] = None
+        self.order = [k for k in gs.__dict__.keys() if k.startswith('_')]
+        self.values = {k: gs.__dict__[k] for k in self.order}
+
+        # templates: internal key -> Template; the templates of GridSearcher take precedence over the grid values, as in add_param
+        self.templates = {f'_{k[len("template_"):]}': v for k, v in gs.__dict__.items() if k.startswith('template_')}
+        if isinstance(exp_folder, Template):
+            self.templates[self.root_key] = exp_folder
+        else:
+            self.values[self.root_key] = gs.__dict__[self.root_key] = exp_folder
+        self.inputs = {k: [f'_{name}' for name in template_identifiers(t)] for k, t in self.templates.items()}
+        # compiled templates, where the variable names are replaced by the internal keys
+        self.compiled = {}
+        for key, template in self.templates.items():
+            parts = compile_template(template)
+            parts[1::2] = [f'_{name}' for name in parts[1::2]]
+            self.compiled[key] = parts
+
+        for key, inputs in self.inputs.items():
+            missing = [k[1:] for k in inputs if k not in self.values]
+            if len(missing) > 0:
+                raise RuntimeError(f'[TemplateError] the template for {key[1:]} uses undefined parameters: {missing}. '
+                                   f'Please specify them in the scheduling["params_values"] dictionary')
+
+        self.topo_index = {k: i for i, k in enumerate(self._topological_order())}
+
+        # affected[k] = the templates that must be rendered again when the value of k changes, sorted topologically
+        self.affected = {}
+        for key in self.grid_keys:
+            affected, stack = set(), [key]
+            while len(stack) > 0:
+                k = stack.pop()
+                for t, inputs in self.inputs.items():
+                    if k in inputs and t not in affected:
+                        affected.add(t)
+                        stack.append(t)
+            self.affected[key] = sorted(affected, key=self.topo_index.get)
+
+        # the "--key " part of each token, which never changes
+        self.prefixes = {k: self._clean(f'{self.dash}{backward_key_replace(k)}') for k in self.order}
+        self.tokens = {k: self._token(k, v) for k, v in self.values.items()}
+        self.absent = set() # the parameters that are not part of the current point (see Choice)
+        self.previous = None
+
+    def render(self, grid_values):
+        """
+        Description:
+            Renders the point given by `grid_values` (one value for each key in `grid_keys`).
+
+        Args:
+            :param grid_values: a tuple produced by the cartesian product of the params_values
+            :return: a tuple (command, root folder, dictionary with the parameters of the point)
+        """
+        changed = {}
+        for i, (key, value) in enumerate(zip(self.grid_keys, grid_values)):
+            if value is None: # add_param ignores None values, the parameter keeps its previous value
+                continue
+            if self.previous is None or self.previous[i] != value:
+                if key not in self.templates:
+                    changed[key] = normalize_value(value)
+
+        if self.previous is None:
+            dirty = sorted(self.templates.keys(), key=self.topo_index.get)
+        else:
+            dirty = set()
+            for key in changed:
+                dirty.update(self.affected[key])
+            dirty = sorted(dirty, key=self.topo_index.get)
+        self.previous = grid_values
+
+        for key, value in changed.items():
+            self.values[key] = value
+            self.tokens[key] = self._token(key, value)
+            if value is ABSENT:
+                self.absent.add(key)
+            else:
+                self.absent.discard(key)
+
+        for key in dirty:
+            parts = self.compiled[key]
+            value = ''.join([part if i % 2 == 0 else str(self.values[part]) for i, part in enumerate(parts)])
+            changed[key] = value
+            self.values[key] = value
+            self.tokens[key] = self._token(key, value)
+
+        self.gs.__dict__.update(changed)
+        params = ' '.join([self.tokens[k] for k in self.order if self.tokens[k] is not None])
+        if len(self.absent) > 0:
+            return f'{self.gs.script} {params}', self.values[self.root_key], {k: v for k, v in self.values.items() if k not in self.absent}
+        return f'{self.gs.script} {params}', self.values[self.root_key], dict(self.values)
+
+    def _token(self, key, value):
+        """
+            Renders the "--key value" token of a parameter the same way GridSearcher._build_command does
+        """
+        if isinstance(value, bool): # we have a boolean parameter without a value, but its presence or absence means True or False
+            return self.prefixes[key] if value else None
+        if value is ABSENT:
+            return None
+        return f'{self.prefixes[key]}{self.sep}{self._clean(str(value))}'
+
+    def _clean(self, text):
+        """
+            Applies the replacements that GridSearcher._build_command performs on the whole command
+        """
+        return text.replace(f'{self.dash}_', self.dash).replace('@', '')
+
+    def _topological_order(self):
+        """
+            Orders the templates such that each template comes after the templates it depends on
+        """
+        order, state = [], {} # state: 1 = visiting, 2 = done
+        def visit(key):
+            if state.get(key) == 2:
+                return
+            if state.get(key) == 1:
+                raise RuntimeError(f'[TemplateError] circular dependency between templates involving {key[1:]}')
+            state[key] = 1
+            for k in self.inputs[key]:
+                if k in self.templates:
+                    visit(k)
+            state[key] = 2
+            order.append(key)
+        for key in self.templates:
+            visit(key)
+        return order
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from .tools import RunListener, forward_key_replace, backward_key_replace, mark_finished, prepare_root
+from .ledger import point_key
+
+def config_fingerprint(exe, script, point, ignored_keys):
+    """
+    Description:
+        Returns the canonical fingerprint of the configuration of a point: the hash of the executable, the script and the command line
+        arguments as rendered by GridSearcher._build_command (boolean flags are present or absent), without the ignored parameters.
+        It does not depend on the order of the arguments.
+
+    Args:
+        :param exe: the executable (e.g. "python")
+        :param script: the script run by GridSearcher
+        :param point: an object of type GridPoint
+        :param ignored_keys: the internal keys (with underscore prefix) of the parameters that are not part of the configuration
+    """
+    args = {}
+    for k, v in point.cmd_dict.items():
+        if k in ignored_keys or v is False:
+            continue
+        args[backward_key_replace(k[1:])] = True if v is True else str(v)
+    canonical = json.dumps(dict(exe=exe, script=script, args=args), sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+# the files written by GridSearcher for each root folder, they are not stored and are written again when a point is restored
+BOOKKEEPING_FILES = ['arguments.txt', 'attempts.jsonl', 'state.*']
+
+def link_or_copy(src, dst):
+    """
+        Creates a hard link to `src` at `dst`, or copies the file if linking is not possible (e.g. on another file system).
+    """
+    try:
+        if os.path.lexists(dst):
+            os.remove(dst)
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+class ResultCache(RunListener):
+    """
+    Description:
+        Content-addressed store of the outputs of the successful runs, shared by all grids using the same store folder. The outputs of a
+        run are stored in "<store>/<fingerprint>/outputs" and the arguments in "<store>/<fingerprint>/config.json". An entry is written
+        in a temporary folder and renamed, so a partial entry is never visible, and the first run of a configuration wins.
+
+        Before a point is started, `satisfy` looks up its fingerprint: if the configuration was already run by any grid, the stored
+        outputs are linked (or copied) to the root folder of the point and the point is counted as finished instead of being run.
+        In link mode, the files matching `cfg.copy_patterns` are copied anyway: they might be written again in place (e.g. the logs
+        appended by a resumed run), which would change the store and all root folders linked to it.
+
+        The outputs of a finished run are stored by a background thread, such that copying large outputs does not delay the release of
+        its GPU slots nor the other runs. `close` waits for the pending stores.
+    Attributes:
+        cfg (CacheConfig): the cache configuration
+        exe (str): the executable of the runs
+        script (str): the script of the runs
+        ignored_keys (Set[str]): the internal keys of the root folder parameter and of the volatile parameters
+        ledger (RunLedger): if set, the reused runs are recorded as finished in the ledger
+        create_state_finished (bool): whether the file "state.finished" is written in the root folder of the reused runs
+        n_reused (int): the number of points satisfied from the store
+        n_stored (int): the number of runs added to the store
+    """
+    def __init__(self, cfg, exe, script, param_name_for_exp_root_folder, ledger=None, create_state_finished=True):
+        self.cfg = cfg
+        self.exe = exe
+        self.script = script
+        self.ignored_keys = {f'_{forward_key_replace(p)}' for p in cfg.volatile_params + [param_name_for_exp_root_folder]}
+        self.ledger = ledger
+        self.create_state_finished = create_state_finished
+        self.n_reused = 0
+        self.n_stored = 0
+        self.executor = ThreadPoolExecutor(max_workers=1) # the copies are limited by the disk, not by the number of threads
+        os.makedirs(cfg.store, exist_ok=True)
+
+    def fingerprint(self, point):
+        return config_fingerprint(self.exe, self.script, point, self.ignored_keys)
+
+    def entry(self, point):
+        """
+            Returns the folder of the store entry of the point.
+        """
+        return os.path.join(self.cfg.store, self.fingerprint(point))
+
+    def satisfy(self, points, counts):
+        """
+            Generator that filters out the points whose configuration is in the store, after copying their outputs. The reused points
+            are counted as finished in `counts` (the dictionary updated by GridSearcher._skip_finished).
+        """
+        for point in points:
+            if self.restore(point):
+                counts['runnable'] -= 1
+                continue
+            yield point
+
+    def restore(self, point):
+        """
+            Links or copies the stored outputs of the configuration of the point to its root folder, returns False if there are none.
+        """
+        entry = self.entry(point)
+        if not os.path.isfile(os.path.join(entry, 'config.json')):
+            return False
+        self._copy_tree(os.path.join(entry, 'outputs'), point.root)
+        prepare_root(point) # arguments.txt shows the parameters of this point, not the ones of the stored run
+        if self.create_state_finished:
+            mark_finished(point.root)
+        if self.ledger is not None:
+            self.ledger.append(dict(key=point_key(point), status='finished', root=point.root, source='cache', entry=entry))
+        self.n_reused += 1
+        return True
+
+    def on_exit(self, result):
+        if result.code == 0:
+            self.executor.submit(self._store_logged, result.point)
+
+    def close(self):
+        """
+            Waits until the outputs of the finished runs are stored.
+        """
+        self.executor.shutdown(wait=True)
+
+    def _store_logged(self, point):
+        try:
+            self.store(point)
+        except OSError as e: # the run stays finished, its configuration is only not reusable
+            print(f'[GridSearcher] could not store {point.root} in the result cache: {e}')
+
+    def store(self, point):
+        """
+            Adds the outputs of a finished point to the store, unless its configuration is already there.
+        """
+        entry = self.entry(point)
+        if os.path.isdir(entry) or not os.path.isdir(point.root):
+            return
+        tmp = f'{entry}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        self._copy_tree(point.root, os.path.join(tmp, 'outputs'))
+        args = {backward_key_replace(k[1:]): str(v) for k, v in point.cmd_dict.items() if k not in self.ignored_keys}
+        with open(os.path.join(tmp, 'config.json'), 'w') as w:
+            json.dump(dict(exe=self.exe, script=self.script, args=args, source=point.root, time=time.time()), w, indent=4)
+        try:
+            os.rename(tmp, entry)
+            self.n_stored += 1
+        except OSError: # another launcher stored the same configuration in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _copy_tree(self, src, dst):
+        """
+            Links or copies the files of `src` to `dst`, without the bookkeeping files of the root folder.
+        """
+        def copy(s, d):
+            if self.cfg.mode == 'link' and not any([fnmatch(os.path.basename(s), p) for p in self.cfg.copy_patterns]):
+                link_or_copy(s, d)
+            else:
+                if os.path.lexists(d): # a new file, in case `d` is linked to the store
+                    os.remove(d)
+                shutil.copy2(s, d)
+        def ignore(folder, names): # only in the root folder, the outputs might contain files with the same names
+            return [n for n in names if folder == src and any([fnmatch(n, p) for p in BOOKKEEPING_FILES])]
+        shutil.copytree(src, dst, symlinks=True, ignore=ignore, copy_function=copy, dirs_exist_ok=True)
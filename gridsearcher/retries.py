@@ -0,0 +1,95 @@
+import os
+import re
+import json
+from dataclasses import replace
+from .tools import GSFailure
+
+def classify_failure(code, tail, cfg):
+    """
+    Description:
+        Returns the class of a failed run. The output is checked first, since a script running out of memory or timing out usually
+        exits with a generic code: OOM if it matches `cfg.oom_patterns`, TIMEOUT if it matches `cfg.timeout_patterns` (or the exit code is
+        124), then SIGNAL if the process was killed by a signal (negative code, or 128 + signal number when started by a shell) and
+        GENERIC otherwise.
+
+    Args:
+        :param code: the exit code of the run
+        :param tail: the last lines of the output of the run, None if the output was not captured
+        :param cfg: an object of type RetryConfig
+    """
+    text = '\n'.join(tail or [])
+    if any([re.search(p, text, re.IGNORECASE) for p in cfg.oom_patterns]):
+        return GSFailure.OOM
+    if code == 124 or any([re.search(p, text, re.IGNORECASE) for p in cfg.timeout_patterns]):
+        return GSFailure.TIMEOUT
+    if code < 0 or 128 < code <= 128 + 64:
+        return GSFailure.SIGNAL
+    return GSFailure.GENERIC
+
+class RetryPolicy:
+    """
+    Description:
+        Decides, in the GridSearcher process, whether a run that exited is started again (see RetryConfig). The execution engines call
+        `on_exit` before notifying the listeners and put the returned point back in their queue once its delay passed.
+    Attributes:
+        cfg (RetryConfig): the retry configuration
+        cfg_logs (LogConfig): the log configuration, used to keep the logs of the failed attempts (None if the output is not captured)
+        n_retried (int): the number of retries scheduled so far
+    """
+    def __init__(self, cfg, cfg_logs=None):
+        self.cfg = cfg
+        self.cfg_logs = cfg_logs
+        self.n_retried = 0
+
+    def on_exit(self, result):
+        """
+        Description:
+            Classifies the failure of a run (setting `result.failure`), records the attempt in its root folder and decides the retry.
+
+        Args:
+            :param result: an object of type RunResult
+            :return: a tuple (point to run again, delay in seconds) or None if the run is not retried
+        """
+        retry = None
+        point = result.point
+        if result.code != 0:
+            if result.failure is None: # launch failures are already classified by the engines
+                result.failure = classify_failure(result.code, result.tail, self.cfg)
+            if result.failure in self.cfg.retry_on and point.attempt <= self.cfg.max_retries:
+                delay = min(self.cfg.max_backoff, self.cfg.backoff * self.cfg.backoff_factor ** (point.attempt - 1))
+                exclusive = point.exclusive or (result.failure == GSFailure.OOM and self.cfg.oom_exclusive)
+                retry = (replace(point, attempt=point.attempt + 1, exclusive=exclusive), delay)
+
+        self.record(result, None if retry is None else retry[1])
+        if retry is not None:
+            self.keep_logs(point)
+            self.n_retried += 1
+            print(f'[GridSearcher] {result.failure.value} failure (code {result.code}), attempt {point.attempt + 1} in {retry[1]:g}s'
+                  f'{" with exclusive GPUs" if retry[0].exclusive else ""}: {point.root}')
+        return retry
+
+    def record(self, result, delay=None):
+        """
+            Appends the attempt to the file attempts.jsonl in the root folder of the run.
+        """
+        point = result.point
+        record = dict(attempt=point.attempt, code=result.code, failure=None if result.failure is None else result.failure.value,
+                      gpus=list(result.gpus), exclusive=point.exclusive, start=result.start, end=result.end, duration=result.duration,
+                      retry_in=delay)
+        try:
+            os.makedirs(point.root, exist_ok=True)
+            with open(os.path.join(point.root, 'attempts.jsonl'), 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e: # e.g. the root folder cannot be created, which made the run fail in the first place
+            print(f'[GridSearcher] could not record the attempt in {point.root}: {e}')
+
+    def keep_logs(self, point):
+        """
+            Renames the log files of a failed attempt, which would be overwritten by the next attempt.
+        """
+        if self.cfg_logs is None:
+            return
+        for name in [self.cfg_logs.stdout_file, self.cfg_logs.stderr_file]:
+            path = os.path.join(point.root, name)
+            if os.path.isfile(path):
+                os.replace(path, f'{path}.attempt{point.attempt}')
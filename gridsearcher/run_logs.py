@@ -0,0 +1,152 @@
+import os
+import sys
+import time
+import shutil
+import threading
+from collections import deque
+from .tools import RunListener
+
+class RotatingFile:
+    """
+    Description:
+        Binary log file that is rotated when it reaches `max_bytes`: the current file is renamed to "<path>.1", the previous "<path>.1" to
+        "<path>.2" and so on, keeping at most `backups` old files. Without `max_bytes`, the file grows without limit.
+    """
+    def __init__(self, path, max_bytes=None, backups=1):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.size = 0
+        self.file = open(path, 'wb')
+
+    def write(self, data):
+        if self.max_bytes is not None and self.size + len(data) > self.max_bytes and self.size > 0:
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def close(self):
+        self.file.close()
+
+    def _rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.isfile(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        self.file = open(self.path, 'wb')
+        self.size = 0
+
+class TailBuffer:
+    """
+    Description:
+        Keeps the last `n_lines` lines of the output of a run in memory (stdout and stderr in the order they were received).
+    """
+    def __init__(self, n_lines):
+        self.lines = deque(maxlen=n_lines)
+        self.partial = b''
+
+    def feed(self, data):
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        self.lines.extend(lines)
+
+    def get(self):
+        lines = list(self.lines) + ([self.partial] if len(self.partial) > 0 else [])
+        return [line.decode(errors='replace').rstrip('\r') for line in lines[-self.lines.maxlen:]]
+
+class RunOutput:
+    """
+    Description:
+        Receives the output of a run and writes it to the log files in the root folder of the run, keeping the last lines in memory.
+        The pipes of the run are always drained (by threads or by the event loop), so a run never blocks on its output, whatever the
+        speed of the launcher console.
+    Attributes:
+        files (Dict[str, RotatingFile]): the log file of each stream ("stdout" and "stderr")
+        tail (TailBuffer): the last lines of both streams
+    """
+    def __init__(self, root, cfg_logs):
+        self.files = {
+            'stdout': RotatingFile(os.path.join(root, cfg_logs.stdout_file), cfg_logs.max_bytes, cfg_logs.backups),
+            'stderr': RotatingFile(os.path.join(root, cfg_logs.stderr_file), cfg_logs.max_bytes, cfg_logs.backups),
+        }
+        self.tail = TailBuffer(cfg_logs.tail_lines)
+        self._lock = threading.Lock()
+
+    def write(self, stream, data):
+        with self._lock:
+            self.files[stream].write(data)
+            self.tail.feed(data)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def drain(self, stream, pipe):
+        """
+            Copies a pipe (a binary file object) to the stream until the process closes it.
+        """
+        for data in iter(lambda: pipe.read1(2**16), b''):
+            self.write(stream, data)
+
+    def pump(self, proc):
+        """
+            Drains stdout and stderr of a subprocess.Popen object with one thread each and returns the threads.
+        """
+        threads = [threading.Thread(target=self.drain, args=(name, getattr(proc, name)), daemon=True) for name in ['stdout', 'stderr']]
+        for t in threads:
+            t.start()
+        return threads
+
+    async def pump_async(self, stream, reader):
+        """
+            Drains an asyncio StreamReader to the stream.
+        """
+        while True:
+            data = await reader.read(2**16)
+            if len(data) == 0:
+                break
+            self.write(stream, data)
+
+class ConsoleStatus(RunListener):
+    """
+    Description:
+        Prints a single status line with the number of running, finished and failed runs when the output of the runs is captured.
+        On a terminal, the line is updated in place. When a run fails, the last lines of its output are printed.
+    """
+    def __init__(self):
+        self.running = 0
+        self.finished = 0
+        self.failed = 0
+        self.start = time.time()
+        self.interactive = sys.stdout.isatty()
+
+    def on_launch(self, point, gpus):
+        self.running += 1
+        self._print(f'started {point.root}')
+
+    def on_exit(self, result):
+        self.running -= 1
+        if result.code == 0:
+            self.finished += 1
+            self._print(f'finished {result.point.root}')
+        else:
+            self.failed += 1
+            if self.interactive:
+                print()
+            print(f'[GridSearcher] run failed with code {result.code}: {result.point.root}')
+            for line in result.tail or []:
+                print(f'    | {line}')
+            self._print(f'failed {result.point.root}')
+
+    def _print(self, event):
+        elapsed = int(time.time() - self.start)
+        line = f'[GridSearcher] {elapsed // 3600:02d}:{elapsed // 60 % 60:02d}:{elapsed % 60:02d} ' \
+               f'running: {self.running} finished: {self.finished} failed: {self.failed} | {event}'
+        if self.interactive:
+            width = shutil.get_terminal_size().columns - 1
+            print('\r' + line[:width].ljust(width), end='', flush=True)
+        else:
+            print(line, flush=True)
@@ -0,0 +1,106 @@
+import math
+from dataclasses import dataclass
+
+@dataclass
+class Uniform:
+    """
+    Description:
+        Continuous range for a parameter in params_values, sampled uniformly in [low, high] when a sampling mode is used.
+    Attributes:
+        low (float): lower bound of the range
+        high (float): upper bound of the range
+        digits (int): if set, the sampled values are rounded to this number of significant digits
+    """
+    low: float
+    high: float
+    digits: int = None
+
+    def __post_init__(self):
+        assert type(self.low) in [int, float] and type(self.high) in [int, float] and self.low < self.high
+        assert self.digits is None or (type(self.digits) is int and self.digits > 0)
+
+    def transform(self, u):
+        """
+            Maps the numpy array `u` with values in [0, 1) to the range
+        """
+        return self.low + u * (self.high - self.low)
+
+@dataclass
+class LogUniform(Uniform):
+    """
+    Description:
+        Continuous range for a parameter in params_values, sampled uniformly in log-space, e.g. LogUniform(1e-5, 1e-1) for learning rates.
+    """
+    def __post_init__(self):
+        super().__post_init__()
+        assert self.low > 0, 'LogUniform requires positive bounds'
+
+    def transform(self, u):
+        import numpy as np
+        return np.exp(math.log(self.low) + u * (math.log(self.high) - math.log(self.low)))
+
+def unit_samples(method, budget, dims, seed):
+    """
+    Description:
+        Draws `budget` points in the unit hypercube [0, 1)^dims in a single vectorized batch.
+
+    Args:
+        :param method: an instance of GSSampling
+        :param budget: number of points
+        :param dims: number of dimensions (parameters)
+        :param seed: seed for the random generator, the same seed produces the same points
+        :return: a numpy array of shape (budget, dims)
+    """
+    import numpy as np
+    method = method.value
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        return rng.random((budget, dims))
+    if method == 'lhs':
+        # one random permutation of the strata per dimension, then a random position inside each stratum
+        strata = np.argsort(rng.random((budget, dims)), axis=0)
+        return (strata + rng.random((budget, dims))) / budget
+    if method == 'sobol':
+        try:
+            from scipy.stats import qmc
+        except ImportError:
+            raise ImportError('Sobol sampling requires scipy, please install it using "pip install scipy"')
+        return qmc.Sobol(d=dims, scramble=True, seed=seed).random(budget)
+    raise ValueError(f'Unknown sampling method: {method}')
+
+def sample_points(params_values, sampling):
+    """
+    Description:
+        Samples points from the search space given by `params_values`, which replace the cartesian product when a sampling mode is used.
+        The values of the lists are picked by index (each value has the same probability), while Uniform and LogUniform ranges
+        are sampled continuously. Identical points (possible when all parameters are lists) are only kept once.
+
+    Args:
+        :param params_values: dictionary with lists or ranges (Uniform, LogUniform) as values
+        :param sampling: an object of type SamplingConfig
+        :return: a list of tuples, each one containing one value for each parameter, in the order of params_values
+    """
+    import numpy as np
+    spaces = list(params_values.values())
+    u = unit_samples(sampling.method, sampling.budget, len(spaces), sampling.seed)
+
+    columns = []
+    for j, space in enumerate(spaces):
+        if isinstance(space, Uniform):
+            col = space.transform(u[:, j])
+            if space.digits is not None:
+                col = [float(f'{x:.{space.digits}g}') for x in col]
+            else:
+                col = col.tolist()
+        else:
+            indices = np.minimum((u[:, j] * len(space)).astype(int), len(space) - 1)
+            col = [space[i] for i in indices]
+        columns.append(col)
+
+    points, seen = [], set()
+    for point in zip(*columns):
+        key = tuple(map(str, point))
+        if key not in seen:
+            seen.add(key)
+            points.append(point)
+    return points
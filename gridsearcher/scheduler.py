@@ -0,0 +1,426 @@
+import time
+import heapq
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+def gpus_for_point(point, cfg_sched):
+    """
+    Description:
+        Returns the number of GPUs requested by a point. It is given by `cfg_sched.gpus_per_run` (an integer or a function of the
+        parameters of the point) or, if that is not set, by `cfg_sched.distributed_training` (all GPUs or a single GPU).
+        Points that already know their number of GPUs (GridPoint.n_gpus) keep it.
+    """
+    if point is not None and point.n_gpus is not None:
+        return point.n_gpus
+    if cfg_sched.gpus_per_run is None:
+        if not cfg_sched.distributed_training:
+            return 1
+        return len(cfg_sched.gpus) if cfg_sched.hosts is None else min(len(h.gpus) for h in cfg_sched.hosts)
+    if callable(cfg_sched.gpus_per_run):
+        return int(cfg_sched.gpus_per_run({k[1:]: v for k, v in point.cmd_dict.items()}))
+    return cfg_sched.gpus_per_run
+
+def memory_for_point(point, cfg_sched):
+    """
+        Returns the GPU memory (in MiB, on each of its GPUs) a point is expected to use, given by `cfg_sched.memory_per_run` (0 if not set).
+    """
+    if cfg_sched.memory_per_run is None:
+        return 0
+    if callable(cfg_sched.memory_per_run):
+        return int(cfg_sched.memory_per_run({k[1:]: v for k, v in point.cmd_dict.items()}))
+    return cfg_sched.memory_per_run
+
+def create_scheduler(cfg_sched):
+    """
+        Returns the scheduler for the GPU slots of `cfg_sched`: a HostPoolScheduler if hosts are set, otherwise a GPUSlotScheduler.
+    """
+    if cfg_sched.hosts is None:
+        return GPUSlotScheduler(cfg_sched.gpus, cfg_sched.max_jobs_per_gpu, probe=cfg_sched.gpu_probe,
+                                max_utilization=cfg_sched.max_utilization, reservation_seconds=cfg_sched.reservation_seconds)
+    return HostPoolScheduler(cfg_sched.hosts, cfg_sched.max_jobs_per_gpu)
+
+@dataclass
+class Reservation:
+    """
+    Description:
+        GPU memory reserved for a run that was started but might not have allocated its memory yet.
+    Attributes:
+        gpu (int): the GPU id
+        memory (int): the reserved memory in MiB
+        baseline (int): the used memory of the GPU when the reservation was made
+        start (float): the time (time.monotonic()) when the reservation was made
+    """
+    gpu: int
+    memory: int
+    baseline: int
+    start: float
+
+class Placement(list):
+    """
+    Description:
+        The list of GPU ids taken for a run, together with the host they belong to (None for the local machine) and whether the run
+        has exclusive access to its GPUs.
+    """
+    def __init__(self, gpus, host=None, exclusive=False):
+        super().__init__(gpus)
+        self.host = host
+        self.exclusive = exclusive
+
+class GPUSlotScheduler:
+    """
+    Description:
+        Keeps the GPU slots of a GridSearcher run as tokens: each GPU id has `max_jobs_per_gpu` tokens and a run takes one token from
+        each of the GPUs it uses. The scheduler lives in the GridSearcher process, which hands the slots to the pending runs and gets them
+        back as soon as a run exits, so a freed GPU is reused immediately instead of being discovered by polling.
+
+        Runs using multiple GPUs are packed on aligned blocks of consecutive GPUs (e.g. {0,1}, {2,3} for 2 GPUs or {0,1,2,3}, {4,5,6,7}
+        for 4 GPUs), which are the NVLink-friendly subsets on most multi-GPU machines, choosing the fullest block that fits (best fit) to
+        keep large blocks available. If no aligned block fits, any window of consecutive GPUs and finally any GPUs with free slots are used.
+
+        If a probe is given, a GPU also needs enough free memory for the run, as reported by the probe. The memory of a started run is
+        reserved until the used memory of its GPU grew by that amount (the allocation showed up), the run exits or `reservation_seconds`
+        passed, such that runs started in a short time do not all see the same free memory. Since memory can also be freed by other
+        processes, the pending runs are checked again every `poll_interval` seconds.
+
+        An exclusive run needs GPUs without running runs. It takes one slot on each of them and its GPUs are kept in `exclusive` until it
+        exits, such that no other run is placed on them, whatever the number of slots per GPU becomes in the meantime.
+    Attributes:
+        gpus (List[int]): the GPU ids managed by the scheduler, in the order of their physical position
+        max_jobs_per_gpu (int): number of slots (tokens) of each GPU
+        free (Dict[int, int]): number of free slots for each GPU id
+        exclusive (Set[int]): the GPU ids used by exclusive runs, which do not get other runs
+        host (Host): the host the GPUs belong to (None for the local machine)
+        probe (GPUProbe): reports the free memory and the utilization of the GPUs, None to only use the slots
+        max_utilization (int): GPUs with a higher utilization (in percent) do not get new runs, None means no limit
+        reservation_seconds (float): maximum lifetime of a memory reservation
+        reservations (Dict[int, List[Reservation]]): the memory reservations of each GPU id
+        poll_interval (float): how often the waiting runs are checked again when a probe is used, None without a probe
+    """
+    def __init__(self, gpus, max_jobs_per_gpu, host=None, probe=None, max_utilization=None, reservation_seconds=300, poll_interval=2.):
+        self.gpus = list(gpus)
+        self.host = host
+        self.max_jobs_per_gpu = max_jobs_per_gpu
+        self.free = {gpu: max_jobs_per_gpu for gpu in self.gpus}
+        self.exclusive = set()
+        self.probe = probe
+        self.max_utilization = max_utilization
+        self.reservation_seconds = reservation_seconds
+        self.reservations = {gpu: [] for gpu in self.gpus}
+        self.poll_interval = None if probe is None else poll_interval
+        self._cond = threading.Condition() # uses an RLock, so try_acquire can be called from the predicate of wait_for
+
+    def try_acquire(self, n_gpus=1, memory=0, exclusive=False):
+        """
+        Description:
+            Takes one slot on each of `n_gpus` GPUs, without blocking.
+
+        Args:
+            :param n_gpus: number of distinct GPUs the run needs
+            :param memory: the memory (in MiB) the run needs on each GPU, only checked if the scheduler has a probe
+            :param exclusive: if True, only GPUs without running runs are used and they do not get other runs until this one exits
+            :return: the list of GPU ids (a Placement) or None if there are not enough GPUs with a free slot
+        """
+        assert 1 <= n_gpus <= len(self.gpus), f'A run cannot use {n_gpus} GPUs when only {len(self.gpus)} GPUs are available'
+        with self._cond:
+            return self._take(n_gpus, memory, exclusive)
+
+    def acquire(self, n_gpus=1, timeout=None):
+        """
+        Description:
+            Blocks until `n_gpus` distinct GPUs have a free slot and takes them.
+
+        Args:
+            :param n_gpus: number of distinct GPUs the run needs
+            :param timeout: maximum number of seconds to wait, None means wait forever
+            :return: the list of GPU ids or None if the timeout expired
+        """
+        return self.wait_for(lambda: self.try_acquire(n_gpus), timeout=timeout)
+
+    def wait_for(self, predicate, timeout=None):
+        """
+        Description:
+            Blocks until `predicate` returns a value that is not None/False, evaluating it again each time slots are released
+            (and every `poll_interval` seconds if a probe is used).
+
+        Args:
+            :param predicate: a function without arguments, usually one that tries to acquire slots
+            :param timeout: maximum number of seconds to wait, None means wait forever
+            :return: the last value returned by predicate
+        """
+        with self._cond:
+            if self.poll_interval is None:
+                return self._cond.wait_for(predicate, timeout=timeout)
+            end = None if timeout is None else time.monotonic() + timeout
+            result = predicate()
+            while not result:
+                wait = self.poll_interval if end is None else min(self.poll_interval, end - time.monotonic())
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+                result = predicate()
+            return result
+
+    def release(self, gpus):
+        """
+        Description:
+            Gives back the slots taken by `acquire` and wakes up the waiting runs.
+        """
+        with self._cond:
+            for gpu in gpus:
+                self.free[gpu] += 1
+                if getattr(gpus, 'exclusive', False):
+                    self.exclusive.discard(gpu)
+            for r in getattr(gpus, 'reservations', []):
+                if r in self.reservations[r.gpu]:
+                    self.reservations[r.gpu].remove(r)
+            self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """
+        Description:
+            Blocks until all slots are free again, e.g. all runs have finished.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self.busy() == 0, timeout=timeout)
+
+    def busy(self):
+        """
+            Returns the number of slots currently in use.
+        """
+        return sum(self.max_jobs_per_gpu - n for n in self.free.values())
+
+    def total_slots(self):
+        return len(self.gpus) * self.max_jobs_per_gpu
+
+    def set_max_jobs_per_gpu(self, max_jobs_per_gpu):
+        """
+        Description:
+            Changes the number of slots of each GPU while runs are running (e.g. by the ConcurrencyTuner). When the number decreases,
+            the running runs are not stopped: the GPUs get new runs once they are below the new number.
+        """
+        with self._cond:
+            for gpu in self.gpus:
+                self.free[gpu] += max_jobs_per_gpu - self.max_jobs_per_gpu
+            self.max_jobs_per_gpu = max_jobs_per_gpu
+            self._cond.notify_all()
+
+    def _take(self, n_gpus, memory=0, exclusive=False):
+        """
+            Chooses `n_gpus` GPUs with a free slot (idle GPUs if `exclusive`) and takes one slot on each of them. Must be called with the
+            lock held.
+        """
+        needed = self.max_jobs_per_gpu if exclusive else 1 # an idle GPU has all its slots free
+        # positions of the GPUs that can take the run
+        available = [i for i, gpu in enumerate(self.gpus) if self.free[gpu] >= needed and gpu not in self.exclusive]
+        if len(available) < n_gpus:
+            return None
+
+        stats = None
+        if self.probe is not None:
+            stats = self.probe.query()
+            available = [i for i in available if self._admits(self.gpus[i], memory, stats)]
+            if len(available) < n_gpus:
+                return None
+
+        if n_gpus == 1:
+            # the least busy GPU (ties are broken by the order in `gpus`)
+            chosen = [max(available, key=lambda i: (self.free[self.gpus[i]], -i))]
+        else:
+            chosen = self._aligned_block(n_gpus, available) or self._window(n_gpus, available)
+            if chosen is None:
+                chosen = sorted(self._least_busy(available, n_gpus))
+
+        gpus = Placement([self.gpus[i] for i in chosen], self.host, exclusive)
+        for gpu in gpus:
+            self.free[gpu] -= 1
+        if exclusive:
+            self.exclusive.update(gpus)
+        if stats is not None and memory > 0:
+            gpus.reservations = [Reservation(gpu, memory, stats[gpu].memory_used, time.monotonic()) for gpu in gpus]
+            for r in gpus.reservations:
+                self.reservations[r.gpu].append(r)
+        return gpus
+
+    def _admits(self, gpu, memory, stats):
+        """
+            Checks whether the probed state of a GPU allows starting a run that needs `memory` MiB on it.
+        """
+        if gpu not in stats:
+            return False
+        if self.max_utilization is not None and stats[gpu].utilization > self.max_utilization:
+            return False
+        return stats[gpu].memory_free - self._pending(gpu, stats[gpu]) >= memory
+
+    def _pending(self, gpu, stats):
+        """
+            Returns the memory reserved on a GPU that was not allocated yet. The reservations are dropped when they expire or when the
+            used memory of the GPU grew by the reserved amount since the oldest reservation was made.
+        """
+        now = time.monotonic()
+        reservations = [r for r in self.reservations[gpu] if now - r.start < self.reservation_seconds]
+        pending = 0
+        if len(reservations) > 0:
+            grown = stats.memory_used - min(r.baseline for r in reservations)
+            pending = max(0, sum(r.memory for r in reservations) - grown)
+            if pending == 0: # the allocations showed up, the probed memory is accurate again
+                reservations = []
+        self.reservations[gpu] = reservations
+        return pending
+
+    def _least_busy(self, positions, n_gpus):
+        """
+            Returns the `n_gpus` positions with the most free slots (ties are broken by the order in `gpus`)
+        """
+        return sorted(positions, key=lambda i: -self.free[self.gpus[i]])[:n_gpus]
+
+    def _aligned_block(self, n_gpus, available):
+        """
+            Returns the positions of `n_gpus` GPUs inside the best fitting aligned block, or None if no block fits.
+            A block has the size of the smallest power of two >= n_gpus and starts at a multiple of its size.
+        """
+        size = 1
+        while size < n_gpus:
+            size *= 2
+        available = set(available)
+        best, best_score = None, None
+        for start in range(0, len(self.gpus) - size + 1, size):
+            block = [i for i in range(start, start + size) if i in available]
+            if len(block) < n_gpus:
+                continue
+            chosen = sorted(self._least_busy(block, n_gpus))
+            # prefer the blocks with the fewest GPUs left after the placement (best fit), then the least busy GPUs
+            score = (len(block) - n_gpus, -min(self.free[self.gpus[i]] for i in chosen))
+            if best_score is None or score < best_score:
+                best, best_score = chosen, score
+        return best
+
+    def _window(self, n_gpus, available):
+        """
+            Returns the positions of the first `n_gpus` consecutive GPUs that are all available, or None.
+        """
+        available = set(available)
+        for start in range(len(self.gpus) - n_gpus + 1):
+            if all(i in available for i in range(start, start + n_gpus)):
+                return list(range(start, start + n_gpus))
+        return None
+
+class HostPoolScheduler(GPUSlotScheduler):
+    """
+    Description:
+        Keeps the GPU slots of several hosts as a single pool. Each host has its own GPUSlotScheduler, such that all GPUs of a run are
+        taken from the same host, and a run is placed on the least busy host that fits it (ties are broken by the order of the hosts).
+        The returned Placement knows its host, which is used to start the run through the transport of the host.
+    Attributes:
+        hosts (List[Host]): the hosts of the pool
+        schedulers (Dict[str, GPUSlotScheduler]): the scheduler of each host, by host name
+    """
+    def __init__(self, hosts, max_jobs_per_gpu):
+        self.hosts = list(hosts)
+        self.max_jobs_per_gpu = max_jobs_per_gpu
+        self.schedulers = {h.name: GPUSlotScheduler(h.gpus, max_jobs_per_gpu, host=h) for h in self.hosts}
+        self.poll_interval = None
+        self._cond = threading.Condition()
+
+    def try_acquire(self, n_gpus=1, memory=0, exclusive=False):
+        largest = max(len(h.gpus) for h in self.hosts)
+        assert 1 <= n_gpus <= largest, f'A run cannot use {n_gpus} GPUs when the largest host has only {largest} GPUs'
+        with self._cond:
+            candidates = [s for s in self.schedulers.values() if len(s.gpus) >= n_gpus]
+            for sched in sorted(candidates, key=lambda s: s.busy() / s.total_slots()): # sorted is stable
+                gpus = sched.try_acquire(n_gpus, memory, exclusive)
+                if gpus is not None:
+                    return gpus
+            return None
+
+    def release(self, gpus):
+        with self._cond:
+            self.schedulers[gpus.host.name].release(gpus)
+            self._cond.notify_all()
+
+    def busy(self):
+        return sum(s.busy() for s in self.schedulers.values())
+
+    def total_slots(self):
+        return sum(s.total_slots() for s in self.schedulers.values())
+
+    def set_max_jobs_per_gpu(self, max_jobs_per_gpu):
+        with self._cond:
+            for sched in self.schedulers.values():
+                sched.set_max_jobs_per_gpu(max_jobs_per_gpu)
+            self.max_jobs_per_gpu = max_jobs_per_gpu
+            self._cond.notify_all()
+
+class PointQueue:
+    """
+    Description:
+        Queue of the points waiting for GPU slots. It looks at most `lookahead` points ahead of the iterator, such that a point that
+        requests fewer GPUs can be started (backfilled) while the first pending point waits for enough GPUs to become free.
+        With lookahead=1 the points are started strictly in order.
+    Attributes:
+        lookahead (int): the maximum number of pending points considered for placement
+        gpus_for_point (Callable): function returning the number of GPUs requested by a point
+        memory_for_point (Callable): function returning the GPU memory expected for a point (None if the memory is not checked)
+        delayed (List[Tuple[float, int, GridPoint]]): heap of the points to run again once their time (time.monotonic()) has come
+    """
+    def __init__(self, points, gpus_for_point, lookahead=1, memory_for_point=None):
+        self._points = iter(points)
+        self._exhausted = False
+        self.buffer = deque()
+        self.lookahead = lookahead
+        self.gpus_for_point = gpus_for_point
+        self.memory_for_point = memory_for_point
+        self.delayed = []
+        self._n_delayed = 0
+        self._lock = threading.Lock() # points can be delayed from other threads, e.g. the result handler of the pool
+
+    def empty(self):
+        self._fill()
+        return len(self.buffer) == 0 and len(self.delayed) == 0
+
+    def pop_placeable(self, scheduler):
+        """
+        Description:
+            Returns the first pending point that fits on the free GPU slots, together with the GPUs taken for it.
+
+        Args:
+            :param scheduler: an object of type GPUSlotScheduler
+            :return: a tuple (point, gpus) or None if no pending point fits
+        """
+        self._fill()
+        for i, point in enumerate(self.buffer):
+            memory = 0 if self.memory_for_point is None else self.memory_for_point(point)
+            gpus = scheduler.try_acquire(self.gpus_for_point(point), memory, point.exclusive)
+            if gpus is not None:
+                del self.buffer[i]
+                return point, gpus
+        return None
+
+    def push_front(self, point):
+        """
+            Puts a point back at the front of the queue, e.g. to run it again
+        """
+        self.buffer.appendleft(point)
+
+    def push_later(self, point, delay):
+        """
+            Puts a point back in the queue after `delay` seconds, at the front of the pending points (e.g. to retry it)
+        """
+        with self._lock:
+            heapq.heappush(self.delayed, (time.monotonic() + delay, self._n_delayed, point))
+            self._n_delayed += 1
+
+    def _fill(self):
+        with self._lock:
+            while len(self.delayed) > 0 and self.delayed[0][0] <= time.monotonic():
+                point = heapq.heappop(self.delayed)[2]
+                point.queued = time.time()
+                self.push_front(point)
+        while not self._exhausted and len(self.buffer) < self.lookahead:
+            try:
+                point = next(self._points)
+            except StopIteration:
+                self._exhausted = True
+            else:
+                point.queued = time.time()
+                self.buffer.append(point)
@@ -0,0 +1,158 @@
+import math
+from itertools import product
+from dataclasses import dataclass
+from typing import Any, Dict
+
+class _Absent:
+    """
+        Value of the parameters that are not part of a point, e.g. the parameters of the other branches of a Choice. The parameter is
+        not given to the script and is rendered as an empty string in the templates.
+    """
+    def __str__(self):
+        return ''
+
+    def __repr__(self):
+        return 'ABSENT'
+
+ABSENT = _Absent()
+
+@dataclass
+class Choice:
+    """
+    Description:
+        Conditional parameter in params_values: the parameter takes the keys of `branches` as values and each value comes with its own
+        sub-grid, which is only expanded for the points having this value. The sub-grids can contain other Choice parameters.
+        Example: params_values=dict(lr=[1e-3, 1e-4], optimizer=Choice({
+                     'adamw': dict(beta1=[0.9], beta2=[0.99, 0.999]),
+                     'sgd': dict(momentum=[0, 0.9]),
+                 }))
+        expands to 2 * (2 + 2) = 8 points instead of 2 * 2 * 2 * 2 * 2 = 32, and the runs with sgd do not get --beta1 and --beta2.
+    Attributes:
+        branches (Dict[Any, Dict[str, Union[List, Choice]]]): the sub-grid of each value of the parameter (an empty dict if the value
+                                                             has no sub-grid)
+    """
+    branches: Dict[Any, Dict]
+
+    def __post_init__(self):
+        assert type(self.branches) is dict and len(self.branches) > 0
+        for value, space in self.branches.items():
+            if space is None:
+                self.branches[value] = space = {}
+            assert type(space) is dict, f'The sub-grid of the value {value} must be a dictionary'
+            assert all([type(k) is str and (type(v) is list or isinstance(v, Choice)) for k, v in space.items()])
+            for k, v in space.items(): # remove duplicates, as for params_values
+                if type(v) is list:
+                    space[k] = list(dict.fromkeys(v))
+
+def is_conditional(params_values):
+    """
+        Checks whether params_values contains Choice parameters.
+    """
+    return any([isinstance(v, Choice) for v in params_values.values()])
+
+def grid_params(params_values):
+    """
+        Returns the names of all parameters of the search space: the keys of params_values followed by the parameters of the sub-grids
+        (each name once, in the order of their first appearance).
+    """
+    names = []
+    def visit(space):
+        for k, v in space.items():
+            if k not in names:
+                names.append(k)
+        for v in space.values():
+            if isinstance(v, Choice):
+                for sub in v.branches.values():
+                    assert not any([k in space for k in sub]), f'The parameters of the branches of a Choice must not be in the parent grid'
+                    visit(sub)
+    visit(params_values)
+    return names
+
+def expand_space(params_values):
+    """
+    Description:
+        Generator that expands the search space one point at a time. Without Choice parameters, it is the cartesian product of the
+        values. Otherwise, each value of a Choice is combined with the cartesian product of its own sub-grid.
+
+    Args:
+        :param params_values: dictionary with lists or Choice parameters as values
+        :return: yields tuples with one value for each parameter in grid_params(params_values), ABSENT for the parameters of the
+                 branches that were not chosen
+    """
+    if not is_conditional(params_values):
+        yield from product(*list(params_values.values()))
+        return
+
+    names = grid_params(params_values)
+
+    def expand(space, keys, i, point):
+        if i == len(keys):
+            yield point
+            return
+        key, values = keys[i], space[keys[i]]
+        if isinstance(values, Choice):
+            for value, sub in values.branches.items():
+                for sub_point in expand(sub, list(sub.keys()), 0, {}):
+                    yield from expand(space, keys, i + 1, {**point, key: value, **sub_point})
+        else:
+            for value in values:
+                yield from expand(space, keys, i + 1, {**point, key: value})
+
+    for point in expand(params_values, list(params_values.keys()), 0, {}):
+        yield tuple([point.get(name, ABSENT) for name in names])
+
+def evaluate_expression(expression, params):
+    """
+        Evaluates a Python expression (e.g. "lr * batch_size < 1") using the parameters as variables. Only a few functions are
+        available: the module math, min, max and abs.
+    """
+    return eval(expression, {'__builtins__': {}, 'math': math, 'min': min, 'max': max, 'abs': abs}, dict(params))
+
+class ConstraintFilter:
+    """
+    Description:
+        Removes the points of the search space that violate a constraint, before they are rendered. A constraint is either an expression
+        of the parameters (e.g. "lr * batch_size < 0.5") or a function that receives the parameters of the point as a dictionary and
+        returns a boolean. The parameters are the values of the point and the fixed parameters of GridSearcher (except the templates).
+        A constraint using a parameter that is not part of a point (e.g. "momentum > 0" for the points of another branch of a Choice)
+        is satisfied.
+    Attributes:
+        constraints (List[Union[str, Callable]]): the constraints
+        names (List[str]): the names of the parameters of the points
+        fixed (Dict[str, Any]): the fixed parameters
+        n_pruned (int): the number of points removed so far
+    """
+    def __init__(self, constraints, names, fixed):
+        self.constraints = constraints
+        self.names = names
+        self.fixed = fixed
+        self.n_pruned = 0
+        self.compiled = {c: compile(c, f'<constraint "{c}">', 'eval') for c in constraints if type(c) is str}
+
+    def __call__(self, grid):
+        """
+            Generator that yields the points of `grid` (tuples with one value for each name) satisfying all constraints.
+        """
+        for values in grid:
+            if self.satisfied(values):
+                yield values
+            else:
+                self.n_pruned += 1
+
+    def satisfied(self, values):
+        params = dict(self.fixed)
+        params.update(zip(self.names, values))
+        for constraint in self.constraints:
+            if type(constraint) is str:
+                code = self.compiled[constraint]
+                if any([params.get(name) is ABSENT for name in code.co_names]):
+                    continue
+                try:
+                    ok = evaluate_expression(code, params)
+                except NameError as e:
+                    raise RuntimeError(f'[ConstraintError] the constraint "{constraint}" uses an undefined parameter: {e}')
+            else:
+                ok = constraint({k: v for k, v in params.items() if v is not ABSENT})
+            if not ok:
+                return False
+        return True
@@ -0,0 +1,127 @@
+import os
+import json
+import heapq
+import hashlib
+from .tools import forward_key_replace
+
+def grid_key(point, keys):
+    """
+        Returns a canonical hash of the values of the grid parameters `keys` of a point (the names of the parameters in params_values and
+        in the sub-grids of the Choice parameters). The fixed parameters, the templates and the root folder are not used, since they might
+        differ between the launchers of the same grid (e.g. a template with the date and time of the launch).
+    """
+    values = {}
+    for key in keys:
+        internal = f'_{forward_key_replace(key)}'
+        if internal in point.cmd_dict: # the parameters of the branches of a Choice that were not chosen are not in the point
+            values[key] = str(point.cmd_dict[internal])
+    return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+def shard_of(point, num_shards, keys):
+    """
+        Returns the shard of a point, given by the canonical hash of the values of its grid parameters (see grid_key). It depends neither
+        on the order of the grid nor on the values of the templates, so all launchers assign the point to the same shard.
+    """
+    return int(grid_key(point, keys), 16) % num_shards
+
+def assign_shards(points, cfg, keys):
+    """
+    Description:
+        Assigns each point to a shard. Without a cost function, the shard is given by the hash of the parameters (see shard_of). With a
+        cost function, the points are sorted by decreasing cost (ties broken by hash) and each one is given to the shard with the lowest
+        total cost so far (longest processing time first), which balances the estimated cost of the shards.
+
+    Args:
+        :param points: a list of GridPoint objects
+        :param cfg: an object of type ShardConfig
+        :param keys: the names of the grid parameters, used to hash the points (see grid_key)
+        :return: a list with the shard index of each point
+    """
+    if cfg.cost is None:
+        return [shard_of(point, cfg.num_shards, keys) for point in points]
+
+    costs = [float(cfg.cost({k[1:]: v for k, v in point.cmd_dict.items()})) for point in points]
+    hashes = [grid_key(point, keys) for point in points]
+    order = sorted(range(len(points)), key=lambda i: (-costs[i], hashes[i]))
+    loads = [(0., shard) for shard in range(cfg.num_shards)] # (total cost, shard index), ties are broken by the shard index
+    shards = [None] * len(points)
+    for i in order:
+        load, shard = heapq.heappop(loads)
+        shards[i] = shard
+        heapq.heappush(loads, (load + costs[i], shard))
+    return shards
+
+def claim(point, shard_index):
+    """
+    Description:
+        Atomically creates the file `state.claimed` in the root folder of the point, containing the index of the claiming shard.
+
+    Args:
+        :param point: an object of type GridPoint
+        :param shard_index: the index of the shard of the launcher that wants to run the point
+        :return: True if the point was claimed now or was already claimed by the same shard (e.g. when a launcher is restarted),
+                 False if another launcher claimed it
+    """
+    os.makedirs(point.root, exist_ok=True)
+    path = os.path.join(point.root, 'state.claimed')
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    except FileExistsError:
+        with open(path) as f:
+            return f.read().strip() == str(shard_index)
+    with os.fdopen(fd, 'w') as f:
+        f.write(f'{shard_index}\n')
+    return True
+
+class GridShard:
+    """
+    Description:
+        Selects the slice of the grid run by one of several independent launchers, which all expand the same grid. The partition is
+        deterministic, so no coordinator is needed.
+
+        With work stealing, each launcher claims its points right before running them and, once its own slice is done, claims and runs
+        the unclaimed points of the other slices, starting from their end. The claims are files in the root folders of the points, so
+        the experiment folder must be shared by the launchers. Delete the file `state.claimed` of an unfinished run to let another
+        launcher run it again.
+    Attributes:
+        cfg (ShardConfig): the shard specification
+        keys (List[str]): the names of the grid parameters, whose values decide the shard of a point
+        others (List[GridPoint]): the points of the other shards, in the order of the grid (only kept for work stealing)
+        n_stolen (int): the number of points claimed from other shards
+    """
+    def __init__(self, cfg, keys):
+        self.cfg = cfg
+        self.keys = keys
+        self.others = []
+        self.n_stolen = 0
+
+    def split(self, points):
+        """
+            Returns the points of this shard. The grid is only materialized if a cost function or work stealing is used.
+        """
+        if self.cfg.cost is None and not self.cfg.work_stealing:
+            return (point for point in points if shard_of(point, self.cfg.num_shards, self.keys) == self.cfg.shard_index)
+
+        points = list(points)
+        shards = assign_shards(points, self.cfg, self.keys)
+        self.others = [point for point, shard in zip(points, shards) if shard != self.cfg.shard_index]
+        return [point for point, shard in zip(points, shards) if shard == self.cfg.shard_index]
+
+    def claimed(self, points, is_finished):
+        """
+        Description:
+            Generator used for work stealing: yields the points of this shard that are not claimed by another launcher and then the
+            unfinished points of the other shards that this launcher manages to claim.
+
+        Args:
+            :param points: the runnable points of this shard
+            :param is_finished: a function that checks whether a point was already run
+        """
+        for point in points:
+            if claim(point, self.cfg.shard_index):
+                yield point
+
+        for point in reversed(self.others): # the owners run their points in order, so the end of their slices is stolen first
+            if not is_finished(point) and claim(point, self.cfg.shard_index):
+                self.n_stolen += 1
+                yield point
@@ -0,0 +1,190 @@
+import os
+import signal
+import threading
+import multiprocessing as mp
+from dataclasses import replace
+from .tools import GSFailure, on_windows
+from .ledger import point_key
+
+INTERRUPTED_FILE = 'state.interrupted'
+
+def is_interrupted(point, ledger=None):
+    """
+        Checks whether the point was interrupted by a previous launch, using the ledger if given or the file `state.interrupted` in its
+        root folder otherwise.
+    """
+    if ledger is not None:
+        record = ledger.records.get(point_key(point))
+        return record is not None and record['status'] == 'interrupted'
+    return os.path.isfile(os.path.join(point.root, INTERRUPTED_FILE))
+
+def flag_interrupted(points, cfg, counts, ledger=None):
+    """
+    Description:
+        Generator that marks the interrupted points as resumed and appends `cfg.resume_flag` to their command.
+
+    Args:
+        :param points: an iterable of GridPoint objects that are not finished
+        :param cfg: an object of type ShutdownConfig
+        :param counts: a dictionary whose key "resumed" is updated while the points are consumed
+        :param ledger: an object of type RunLedger or None
+    """
+    counts.setdefault('resumed', 0)
+    for point in points:
+        if is_interrupted(point, ledger):
+            cmd = point.cmd if cfg.resume_flag is None else f'{point.cmd} {cfg.resume_flag}'
+            point = replace(point, cmd=cmd, resumed=True)
+            counts['resumed'] += 1
+        yield point
+
+def resumed_first(points):
+    """
+        Moves the resumed points to the front of the list, keeping the order of the other points.
+    """
+    return [p for p in points if p.resumed] + [p for p in points if not p.resumed]
+
+class ShutdownHandler:
+    """
+    Description:
+        Handles SIGINT and SIGTERM in the GridSearcher process while the runs are executed (see ShutdownConfig). The execution engines
+        start the runs in their own process group, such that the signals sent to the terminal do not reach them directly, register the
+        pid of each run (the pool workers send it through `pid_queue`) and stop starting runs once `requested` is set. When the first
+        signal arrives, it is forwarded to the process groups of the running runs and a timer kills the ones still running after the grace
+        period. A second signal kills them immediately.
+
+        The handler is only installed by the main thread on POSIX systems, otherwise the signals keep their default behavior.
+    Attributes:
+        cfg (ShutdownConfig): the shutdown configuration
+        signum (int): the first signal received, None while the grid runs normally
+        running (Dict[Tuple, int]): the process group of each running run, by (index, root folder, attempt)
+        signalled (Set[Tuple]): the runs that received the forwarded signal
+        n_interrupted (int): the number of runs marked as interrupted
+        pid_queue (multiprocessing.SimpleQueue): the queue the pool workers send the pids of the runs to
+    """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.signum = None
+        self.running = {}
+        self.signalled = set()
+        self.n_interrupted = 0
+        self.pid_queue = mp.SimpleQueue()
+        self._lock = threading.RLock()
+        self._previous = {}
+        self._timer = None
+
+    @property
+    def requested(self):
+        return self.signum is not None
+
+    def install(self):
+        """
+            Installs the signal handlers and returns True, or returns False if the signals cannot be handled (not in the main thread or
+            on Windows).
+        """
+        if on_windows() or threading.current_thread() is not threading.main_thread():
+            return False
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            self._previous[signum] = signal.signal(signum, self._handle)
+        return True
+
+    def uninstall(self):
+        for signum, handler in self._previous.items():
+            signal.signal(signum, handler)
+        self._previous = {}
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def register(self, point, pid):
+        """
+            Records the process group of a run that was just started. If the signal was already forwarded, the run gets it right away.
+        """
+        key = (point.index, point.root, point.attempt)
+        with self._lock:
+            self._add(key, pid)
+
+    def drain(self):
+        """
+            Registers the pids sent by the pool workers.
+        """
+        with self._lock:
+            while not self.pid_queue.empty():
+                index, root, attempt, pid = self.pid_queue.get()
+                self._add((index, root, attempt), pid)
+
+    def on_exit(self, result):
+        """
+        Description:
+            Called by the engines in the GridSearcher process when a run exits, before the retry policy and the listeners. A run that
+            received the forwarded signal and exited with a non-zero code is marked as interrupted (`result.failure` is set and the file
+            `state.interrupted` is written to its root folder), the marker of a run that succeeded is removed.
+
+        Args:
+            :param result: an object of type RunResult
+            :return: True if the run was interrupted
+        """
+        point = result.point
+        key = (point.index, point.root, point.attempt)
+        with self._lock:
+            self.drain() # the pool worker sent the pid before the result
+            self.running.pop(key, None)
+            interrupted = key in self.signalled and result.code != 0
+
+        path = os.path.join(point.root, INTERRUPTED_FILE)
+        if interrupted:
+            result.failure = GSFailure.INTERRUPTED
+            self.n_interrupted += 1
+            with open(path, 'w') as w:
+                w.write(f'{signal.Signals(self.signum).name}\n')
+        elif result.code == 0 and os.path.isfile(path):
+            os.remove(path)
+        return interrupted
+
+    def exit(self):
+        """
+            Ends the GridSearcher process like the signal would have: KeyboardInterrupt for SIGINT, exit code 128 + signal otherwise.
+        """
+        if self.signum == signal.SIGINT:
+            raise KeyboardInterrupt
+        raise SystemExit(128 + self.signum)
+
+    def _handle(self, signum, frame):
+        if self.signum is not None: # second signal, the runs are not waited for anymore
+            print(f'[GridSearcher] received {signal.Signals(signum).name} again, killing the runs')
+            self.kill_all(drain=False) # the first handler might be draining the queue
+            return
+        print(f'[GridSearcher] received {signal.Signals(signum).name}, no new run is started. Forwarding it to the running runs, which '
+              f'are killed in {self.cfg.grace_period:g} seconds')
+        with self._lock:
+            self.drain()
+            self.signum = signum
+            for key, pid in self.running.items():
+                self._send(key, pid, signum)
+        self._timer = threading.Timer(self.cfg.grace_period, self.kill_all)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _add(self, key, pid):
+        """
+            Must be called with the lock held.
+        """
+        self.running[key] = pid
+        if self.signum is not None and key not in self.signalled: # started right before the signal arrived
+            self._send(key, pid, self.signum)
+
+    def _send(self, key, pid, signum):
+        self.signalled.add(key)
+        try:
+            os.killpg(pid, signum) # the pid of the first process of a session is also the id of its process group
+        except (ProcessLookupError, PermissionError): # the run already exited
+            pass
+
+    def kill_all(self, drain=True):
+        """
+            Kills the process groups of the running runs.
+        """
+        if drain:
+            self.drain()
+        with self._lock:
+            for key, pid in list(self.running.items()):
+                self._send(key, pid, signal.SIGKILL)
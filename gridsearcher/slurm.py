@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import subprocess
+from itertools import islice
+from dataclasses import asdict, replace
+from .tools import GridPoint, RunListener, build_launch_prefix, prepare_root, mark_finished
+from .configs import SchedulingConfig, TorchRunConfig
+from .scheduler import gpus_for_point
+from .async_engine import AsyncLauncher
+from .ports import PortAllocator
+from .sbatch import SBATCH
+
+def write_manifest(path, points, exe, cfg_sched, cfg_torchrun, create_state_finished, pack=None):
+    """
+    Description:
+        Writes the grid to a manifest file read by the SLURM array tasks (JSON Lines). The first line is a header with the settings
+        shared by all runs and line i + 1 describes the run with array index i: its root folder, its command, the number of GPUs it
+        uses and the parameters written to arguments.txt.
+
+    Args:
+        :param path: path of the manifest file
+        :param points: a list of GridPoint objects
+        :param exe: the executable used when torchrun is disabled
+        :param cfg_sched: an object of type SchedulingConfig
+        :param cfg_torchrun: an object of type TorchRunConfig
+        :param create_state_finished: whether the tasks create the file "state.finished" for the runs that exit with code 0
+        :param pack: the settings of the packing workers (walltime, batch_size and reserve_seconds), None if packing is not used
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as w:
+        header = dict(exe=exe, torchrun=asdict(cfg_torchrun), create_state_finished=create_state_finished, size=len(points),
+                      max_jobs_per_gpu=cfg_sched.max_jobs_per_gpu, pack=pack)
+        w.write(json.dumps(header) + '\n')
+        for point in points:
+            arguments = {k: str(v) for k, v in point.cmd_dict.items() if k.startswith('_')}
+            entry = dict(root=point.root, cmd=point.cmd, n_gpus=gpus_for_point(point, cfg_sched), arguments=arguments)
+            w.write(json.dumps(entry) + '\n')
+
+def read_manifest(path, index=None):
+    """
+        Returns the header of the manifest and the entry with array index `index` (None if index is None or out of range).
+    """
+    with open(path) as f:
+        header = json.loads(next(f))
+        if index is None:
+            return header, None
+        line = next(islice(f, index, None), None)
+    return header, None if line is None else json.loads(line)
+
+def array_spec(indices, max_concurrent=None):
+    """
+        Compresses the sorted array indices to the format of `sbatch --array`, e.g. [0, 1, 2, 5, 7, 8] -> "0-2,5,7-8",
+        followed by "%max_concurrent" to limit the number of tasks running at the same time.
+    """
+    ranges, start = [], None
+    for i, index in enumerate(indices):
+        if start is None:
+            start = index
+        if i + 1 == len(indices) or indices[i + 1] != index + 1:
+            ranges.append(str(start) if start == index else f'{start}-{index}')
+            start = None
+    spec = ','.join(ranges)
+    if max_concurrent is not None:
+        spec += f'%{max_concurrent}'
+    return spec
+
+def parse_walltime(value):
+    """
+        Converts a SLURM time limit ("minutes", "minutes:seconds", "hours:minutes:seconds", "days-hours", "days-hours:minutes" or
+        "days-hours:minutes:seconds") to seconds.
+    """
+    days, value = value.split('-') if '-' in value else (0, value)
+    parts = [int(x) for x in value.split(':')]
+    if days:
+        hours, minutes, seconds = (parts + [0, 0])[:3]
+    elif len(parts) == 3:
+        hours, minutes, seconds = parts
+    else:
+        hours, (minutes, seconds) = 0, (parts + [0])[:2]
+    return ((int(days) * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def write_batch_script(manifest, entry_point='run_array_task'):
+    """
+        Writes the shell script submitted to sbatch next to the manifest, which calls the function `entry_point` of this module
+        with the path of the manifest.
+    """
+    path = os.path.splitext(os.path.abspath(manifest))[0] + '.sh'
+    with open(path, 'w') as w:
+        w.write('#!/bin/bash\n')
+        code = f'import sys; from gridsearcher.slurm import {entry_point}; sys.exit({entry_point}(sys.argv[1]))'
+        w.write(f'exec {shlex.quote(sys.executable)} -c {shlex.quote(code)} {shlex.quote(os.path.abspath(manifest))}\n')
+    os.chmod(path, 0o755)
+    return path
+
+def submit_array(manifest, indices, cfg_slurm, verbose=True):
+    """
+        Submits a single job array running the tasks with the given indices of the manifest, using the SBATCH wrapper.
+    """
+    sbatch_args = dict(cfg_slurm.sbatch_args)
+    sbatch_args['array'] = array_spec(indices, cfg_slurm.max_concurrent)
+    SBATCH(script=shlex.quote(write_batch_script(manifest)), env_vars=dict(cfg_slurm.env_vars), sbatch_args=sbatch_args).run(verbose=verbose)
+
+def submit_pack_workers(manifest, cfg_slurm, verbose=True):
+    """
+        Submits `cfg_slurm.pack_workers` allocations (as one job array), each one running a packing worker on the manifest. The claims of
+        a previous submission of the same manifest are kept, such that the workers that are still running do not run their points twice,
+        unless `cfg_slurm.reset_claims` is set.
+    """
+    if cfg_slurm.reset_claims:
+        shutil.rmtree(claims_folder(manifest), ignore_errors=True)
+    os.makedirs(claims_folder(manifest), exist_ok=True)
+    sbatch_args = dict(cfg_slurm.sbatch_args)
+    sbatch_args['array'] = array_spec(list(range(cfg_slurm.pack_workers)), cfg_slurm.max_concurrent)
+    script = write_batch_script(manifest, entry_point='run_pack_worker')
+    SBATCH(script=shlex.quote(script), env_vars=dict(cfg_slurm.env_vars), sbatch_args=sbatch_args).run(verbose=verbose)
+
+def run_manifest_entry(header, entry, index):
+    """
+    Description:
+        Runs one entry of the manifest on the current node and returns its exit code. The GPUs are the ones allocated by SLURM
+        (CUDA_VISIBLE_DEVICES is kept if SLURM set it) and torchrun gets a free port of the node, since several tasks can share a node.
+        Entries that are already finished are skipped, e.g. when the array is submitted again.
+    """
+    if os.path.isfile(os.path.join(entry['root'], 'state.finished')):
+        print(f'[GridSearcher] task {index} is already finished: {entry["root"]}')
+        return 0
+
+    cfg_torchrun = TorchRunConfig(**header['torchrun'])
+    port = None
+    if cfg_torchrun.torchrun: # the tasks sharing a node start their search at different ports to avoid racing for the same one
+        port = PortAllocator(cfg_torchrun.master_addr, cfg_torchrun.master_port + index % 1000).acquire()
+
+    point = GridPoint(index=index, cmd=entry['cmd'], root=entry['root'], cmd_dict=entry['arguments'])
+    prepare_root(point)
+    env, prefix = build_launch_prefix(header['exe'], list(range(entry['n_gpus'])), cfg_torchrun, port)
+    if 'CUDA_VISIBLE_DEVICES' in os.environ:
+        del env['CUDA_VISIBLE_DEVICES']
+
+    args = prefix + [entry['cmd']]
+    print(' '.join([f'{k}={v}' for k, v in env.items()] + args), flush=True)
+    code = subprocess.run(' '.join(args), shell=True, env={**os.environ, **env}).returncode
+    if code == 0 and header['create_state_finished']:
+        mark_finished(point.root)
+    return code
+
+def run_array_task(manifest, index=None):
+    """
+        Entry point of an array task: runs the manifest entry given by `index` or, by default, by the variable SLURM_ARRAY_TASK_ID.
+    """
+    if index is None:
+        index = int(os.environ['SLURM_ARRAY_TASK_ID'])
+    header, entry = read_manifest(manifest, index)
+    if entry is None:
+        print(f'[GridSearcher] task {index} is not in the manifest {manifest} ({header["size"]} entries)')
+        return 1
+    start = time.time()
+    code = run_manifest_entry(header, entry, index)
+    print(f'[GridSearcher] task {index} exited with code {code} after {time.time() - start:.1f} seconds')
+    return code
+
+def claims_folder(manifest):
+    return os.path.splitext(os.path.abspath(manifest))[0] + '.claims'
+
+def claimed_indices(manifest):
+    """
+        Returns the set of the indices of the manifest claimed by the packing workers.
+    """
+    folder = claims_folder(manifest)
+    return set(int(name) for name in os.listdir(folder) if name.isdigit()) if os.path.isdir(folder) else set()
+
+def claim_index(manifest, index, worker):
+    """
+        Atomically claims the entry `index` of the manifest for the packing worker `worker`. Returns False if it was already claimed.
+    """
+    try:
+        fd = os.open(os.path.join(claims_folder(manifest), str(index)), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as f:
+        f.write(f'{worker}\n')
+    return True
+
+def unclaim_index(manifest, index):
+    try:
+        os.remove(os.path.join(claims_folder(manifest), str(index)))
+    except FileNotFoundError:
+        pass
+
+def node_gpus():
+    """
+        Returns the GPU ids allocated to the job on the current node: CUDA_VISIBLE_DEVICES if set, otherwise the first SLURM_GPUS_ON_NODE ids.
+    """
+    visible = os.environ.get('CUDA_VISIBLE_DEVICES', '')
+    if len(visible) > 0:
+        return [int(gpu) for gpu in visible.split(',')]
+    return list(range(int(os.environ.get('SLURM_GPUS_ON_NODE', 1))))
+
+class PackWorker(RunListener):
+    """
+    Description:
+        Runs many points of a manifest inside one SLURM allocation. The worker claims batches of pending points from the manifest (which is
+        shared by all workers) and runs them on the GPUs of the node with the asyncio engine, until the time left in the allocation gets
+        too short: a new point is only started if the time left is larger than both `reserve` and the longest run seen so far (twice the
+        longest run if all GPU slots are busy, since the point first waits for a slot). The points that are claimed but not started are
+        given back, then the worker waits for its running points and exits.
+    Attributes:
+        manifest (str): path of the manifest file
+        header (dict): the header of the manifest
+        worker (str): the id of the worker, written to the claim files
+        deadline (float): the time (time.time()) when the allocation ends
+        batch_size (int): number of points claimed at once
+        reserve (float): minimum number of seconds left in the allocation to start a new point
+        longest (float): the duration of the longest run of this worker
+        n_started (int): the number of points started by this worker
+        scheduler (GPUSlotScheduler): the scheduler of the engine running the points, set by run_pack_worker
+    """
+    def __init__(self, manifest, header, worker, deadline, batch_size, reserve):
+        self.manifest = manifest
+        self.header = header
+        self.worker = worker
+        self.deadline = deadline
+        self.batch_size = batch_size
+        self.reserve = reserve
+        self.longest = 0.
+        self.n_started = 0
+        self.scheduler = None
+
+    def on_exit(self, result):
+        self.longest = max(self.longest, result.duration)
+
+    def has_time(self):
+        needed = max(self.reserve, self.longest)
+        if self.scheduler is not None and self.scheduler.busy() == self.scheduler.total_slots():
+            needed += self.longest
+        return self.deadline - time.time() > needed
+
+    def points(self):
+        """
+            Generator of the points run by this worker, consumed by the engine when GPU slots become free.
+        """
+        batch = []
+        with open(self.manifest) as f:
+            next(f) # header
+            for index, line in enumerate(f):
+                if not self.has_time():
+                    break
+                entry = json.loads(line)
+                if os.path.isfile(os.path.join(entry['root'], 'state.finished')) or not claim_index(self.manifest, index, self.worker):
+                    continue
+                batch.append(GridPoint(index=index, cmd=entry['cmd'], root=entry['root'], cmd_dict=entry['arguments'], n_gpus=entry['n_gpus']))
+                if len(batch) < self.batch_size:
+                    continue
+                yield from self._run_batch(batch)
+                batch = []
+        yield from self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        for i, point in enumerate(batch):
+            if not self.has_time(): # give back the rest of the batch to the other workers
+                for rest in batch[i:]:
+                    unclaim_index(self.manifest, rest.index)
+                return
+            self.n_started += 1
+            yield point
+
+def run_pack_worker(manifest):
+    """
+        Entry point of an allocation in packing mode: runs points of the manifest on the GPUs of the node until the walltime is nearly
+        exhausted or no pending point is left.
+    """
+    start = time.time()
+    header, _ = read_manifest(manifest)
+    pack = header['pack']
+    worker = os.environ.get('SLURM_JOB_ID', str(os.getpid()))
+    packer = PackWorker(manifest, header, worker, start + pack['walltime'], pack['batch_size'], pack['reserve_seconds'])
+
+    cfg_torchrun = TorchRunConfig(**header['torchrun'])
+    if cfg_torchrun.torchrun: # several runs share the node, each one needs its own rendezvous port
+        cfg_torchrun = replace(cfg_torchrun, auto_port=True)
+    gpus = node_gpus()
+    cfg_sched = SchedulingConfig(distributed_training=False, max_jobs_per_gpu=header['max_jobs_per_gpu'], gpus=gpus, params_values={})
+    print(f'[GridSearcher] packing worker {worker} on GPUs {gpus}, walltime {pack["walltime"]} seconds')
+
+    launcher = AsyncLauncher(header['exe'], cfg_sched, cfg_torchrun, header['create_state_finished'], listeners=[packer])
+    packer.scheduler = launcher.scheduler
+    results = launcher.run(packer.points())
+    n_failed = sum([result.code != 0 for result in results])
+    print(f'[GridSearcher] packing worker {worker} ran {packer.n_started} points ({n_failed} failed) in {time.time() - start:.1f} seconds')
+    return 0
@@ -0,0 +1,194 @@
+import os
+import json
+import math
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .tools import RunListener, GSFailure
+
+def percentile(values, q):
+    """
+        Returns the q-th percentile (0 <= q <= 100) of the values using the nearest-rank method, None if there are no values.
+    """
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+class Telemetry(RunListener):
+    """
+    Description:
+        Tracks the progress of a GridSearcher run from the launch and exit events of the runs and publishes it as Prometheus metrics on
+        a local HTTP port (path /metrics) and as a JSON status file that is rewritten periodically.
+
+        The queue wait of a run is the time between the moment it could be placed (see GridPoint.queued) and its launch, e.g. the time
+        it waited for free GPU slots. The runs that could not be started (GSFailure.LAUNCH) are counted as failed, but their duration
+        is not used. The number of queued runs and the ETA are only known when the grid is not streamed (the ETA uses the completion
+        rate so far).
+    Attributes:
+        cfg (TelemetryConfig): the telemetry configuration
+        slots (Dict[str, int]): the number of slots of each GPU ("<gpu>" or "<host>:<gpu>" for multi-host pools)
+        used (Dict[str, int]): the number of slots of each GPU used by the running runs
+        counts (dict): the dictionary with the keys "total" and "runnable" filled by GridSearcher while the points are consumed
+        streaming (bool): whether the grid is streamed, e.g. the number of runnable points is only known at the end
+    """
+    def __init__(self, cfg, cfg_sched, counts=None, streaming=False):
+        self.cfg = cfg
+        self.counts = counts
+        self.streaming = streaming
+        if cfg_sched.hosts is None:
+            self.slots = {str(gpu): cfg_sched.max_jobs_per_gpu for gpu in cfg_sched.gpus}
+        else:
+            self.slots = {f'{h.name}:{gpu}': cfg_sched.max_jobs_per_gpu for h in cfg_sched.hosts for gpu in h.gpus}
+        self.used = {gpu: 0 for gpu in self.slots}
+        self.launched = 0
+        self.finished = 0
+        self.failed = 0
+        self.durations = []
+        self.waits = []
+        self.start = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._writer = None
+
+    def on_launch(self, point, gpus):
+        with self._lock:
+            self.launched += 1
+            self.waits.append(time.time() - (self.start if point.queued is None else point.queued))
+            for gpu in self._keys(gpus):
+                self.used[gpu] += 1
+
+    def on_exit(self, result):
+        with self._lock:
+            if result.code == 0:
+                self.finished += 1
+            else:
+                self.failed += 1
+            if result.failure != GSFailure.LAUNCH:
+                self.durations.append(result.duration)
+            for gpu in self._keys(result.gpus):
+                self.used[gpu] -= 1
+
+    def snapshot(self):
+        """
+            Returns the current state as a dictionary (the content of the status file).
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = now - self.start
+            running = self.launched - self.finished - self.failed
+            done = self.finished + self.failed
+            queued = None
+            if self.counts is not None and not self.streaming:
+                queued = max(0, self.counts['runnable'] - self.launched) # stolen points (sharding) are launched but not counted
+            eta = None
+            if queued is not None and done > 0:
+                eta = (queued + running) * elapsed / done
+            return dict(
+                time=now,
+                elapsed=elapsed,
+                queued=queued,
+                running=running,
+                finished=self.finished,
+                failed=self.failed,
+                runs_per_hour=3600 * done / elapsed if elapsed > 0 else 0.,
+                duration_mean=sum(self.durations) / len(self.durations) if len(self.durations) > 0 else None,
+                duration_p95=percentile(self.durations, 95),
+                queue_wait_mean=sum(self.waits) / len(self.waits) if len(self.waits) > 0 else None,
+                eta_seconds=eta,
+                gpu_slots={gpu: dict(used=self.used[gpu], total=self.slots[gpu]) for gpu in self.slots})
+
+    def prometheus(self):
+        """
+            Returns the current state in the Prometheus text exposition format.
+        """
+        s = self.snapshot()
+        lines = [
+            '# HELP gridsearcher_runs Number of runs in each state.',
+            '# TYPE gridsearcher_runs gauge',
+        ]
+        for state in ['queued', 'running', 'finished', 'failed']:
+            if s[state] is not None:
+                lines.append(f'gridsearcher_runs{{state="{state}"}} {s[state]}')
+        lines += [
+            '# HELP gridsearcher_gpu_slots_used Number of slots of each GPU used by running runs.',
+            '# TYPE gridsearcher_gpu_slots_used gauge',
+        ] + [f'gridsearcher_gpu_slots_used{{gpu="{gpu}"}} {v["used"]}' for gpu, v in s['gpu_slots'].items()] + [
+            '# HELP gridsearcher_gpu_slots_total Number of slots of each GPU.',
+            '# TYPE gridsearcher_gpu_slots_total gauge',
+        ] + [f'gridsearcher_gpu_slots_total{{gpu="{gpu}"}} {v["total"]}' for gpu, v in s['gpu_slots'].items()]
+        gauges = [
+            ('runs_per_hour', 'runs_per_hour', 'Completed runs per hour since the start of the grid.'),
+            ('run_duration_mean_seconds', 'duration_mean', 'Mean duration of the completed runs.'),
+            ('run_duration_p95_seconds', 'duration_p95', '95th percentile of the duration of the completed runs.'),
+            ('queue_wait_mean_seconds', 'queue_wait_mean', 'Mean time the runs waited for GPU slots before their launch.'),
+            ('eta_seconds', 'eta_seconds', 'Estimated time until all runs are completed.'),
+            ('elapsed_seconds', 'elapsed', 'Time since the start of the grid.'),
+        ]
+        for name, key, description in gauges:
+            if s[key] is not None:
+                lines += [f'# HELP gridsearcher_{name} {description}', f'# TYPE gridsearcher_{name} gauge', f'gridsearcher_{name} {s[key]}']
+        return '\n'.join(lines) + '\n'
+
+    def write_status(self):
+        """
+            Rewrites the JSON status file atomically, such that readers never see a partial file.
+        """
+        tmp = f'{self.cfg.status_file}.tmp'
+        with open(tmp, 'w') as w:
+            json.dump(self.snapshot(), w, indent=4)
+        os.replace(tmp, self.cfg.status_file)
+
+    def start_publishing(self):
+        """
+            Starts the HTTP endpoint and the thread that rewrites the status file, depending on the configuration.
+        """
+        if self.cfg.port is not None:
+            telemetry = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] not in ['/', '/metrics']:
+                        self.send_error(404)
+                        return
+                    body = telemetry.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args): # do not print the requests to the console
+                    pass
+
+            self._server = ThreadingHTTPServer((self.cfg.addr, self.cfg.port), Handler)
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+            print(f'[GridSearcher] metrics at http://{self.cfg.addr}:{self._server.server_address[1]}/metrics')
+
+        if self.cfg.status_file is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cfg.status_file)), exist_ok=True)
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+
+    def stop_publishing(self):
+        """
+            Stops the HTTP endpoint and writes the final status file.
+        """
+        self._stop.set()
+        if self._writer is not None:
+            self._writer.join()
+            self.write_status()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _write_loop(self):
+        while True:
+            self.write_status()
+            if self._stop.wait(self.cfg.interval):
+                break
+
+    def _keys(self, gpus):
+        host = getattr(gpus, 'host', None)
+        return [str(gpu) if host is None else f'{host.name}:{gpu}' for gpu in gpus]
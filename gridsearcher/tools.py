@@ -1,11 +1,14 @@
 import os
-import random
 import time
+import signal
+import subprocess
 import yaml
 import platform
 from tqdm import tqdm
 from enum import Enum, auto
-from .file_locker import lock_acquire, lock_release
+from dataclasses import dataclass
+from typing import Any, Dict, List
+from .ports import rdzv_id
 
 class GSExe(Enum):
     PYTHON = 'python3'
@@ -15,6 +18,23 @@ class GSKeyValSep(Enum):
     SPACE = ' '
     EQUAL = '='
 
+class GSSampling(Enum):
+    RANDOM = 'random' # uniform random draws
+    LATIN_HYPERCUBE = 'lhs' # each parameter range is split in `budget` strata and each stratum is sampled once
+    SOBOL = 'sobol' # scrambled Sobol low-discrepancy sequence (requires scipy)
+
+class GSEngine(Enum):
+    POOL = 'pool' # one multiprocessing worker per running command
+    ASYNCIO = 'asyncio' # all commands are supervised by a single asyncio event loop
+
+class GSFailure(Enum):
+    OOM = 'oom' # the GPU ran out of memory (found in the output of the run)
+    SIGNAL = 'signal' # the process was killed by a signal
+    TIMEOUT = 'timeout' # a time limit or a collective operation (e.g. NCCL) timed out
+    GENERIC = 'generic' # any other non-zero exit code
+    INTERRUPTED = 'interrupted' # the launcher was stopped by a signal, which was forwarded to the run (resumed by the next launch)
+    LAUNCH = 'launch' # the run could not be started, e.g. its root folder could not be prepared or the process could not be forked
+
 FW_DICT = {'.': 'DOT', '-': 'DASH'}
 BW_DICT = {v: k for k, v in FW_DICT.items()} # will contain { 'DOT': '.', 'DASH': '-' }
 
@@ -47,6 +67,82 @@ def key_replace(d, key):
     return key
 
 
+@dataclass
+class GridPoint:
+    """
+    Description:
+        Represents one element of the cartesian product, rendered and ready to be run.
+    Attributes:
+        index (int): position of the point in the cartesian product (zero based)
+        cmd (str): the command built by GridSearcher for this point (script followed by the arguments)
+        root (str): the experiment root folder for this point
+        cmd_dict (Dict[str, Any]): the parameters of this point, with keys prefixed by underscore (as stored in GridSearcher.__dict__)
+        n_gpus (int): if set, the number of GPUs of the point, which was already computed (e.g. when the point is read from a manifest)
+        attempt (int): the number of the attempt to run the point (1 for the first run, increased by each retry)
+        exclusive (bool): whether the point needs its GPUs for itself, without other runs on them (e.g. after running out of memory)
+        resumed (bool): whether the point was interrupted by a previous launch and is started again to resume from its checkpoint
+        queued (float): the time (time.time()) at which the point could be placed on the GPUs for the first time, i.e. it entered the
+                        pending points considered by the PointQueue or the delay of its retry passed. Used to measure its queue wait
+    """
+    index: int
+    cmd: str
+    root: str
+    cmd_dict: Dict[str, Any]
+    n_gpus: int = None
+    attempt: int = 1
+    exclusive: bool = False
+    resumed: bool = False
+    queued: float = None
+
+@dataclass
+class RunResult:
+    """
+    Description:
+        Represents the outcome of running a GridPoint.
+    Attributes:
+        point (GridPoint): the point that was run
+        gpus (List[int]): the GPU ids the point was run on
+        code (int): the exit code of the process (negative values mean the process was killed by a signal)
+        start (float): timestamp (time.time()) when the process was started
+        end (float): timestamp (time.time()) when the process exited
+        tail (List[str]): the last lines of the output of the process, if the output was captured
+        setup (float): timestamp (time.time()) when the preparation of the root folder started, before the process was started
+        failure (GSFailure): the class of the failure when retries are enabled, None if the run succeeded or was not classified
+    """
+    point: GridPoint
+    gpus: List[int]
+    code: int
+    start: float
+    end: float
+    tail: List[str] = None
+    setup: float = None
+    failure: GSFailure = None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+def launch_failure(point, gpus, error, setup=None):
+    """
+        Returns the result of a point whose process could not be started (exit code 127, as for a command the shell cannot execute), such
+        that the engines report it to the retry policy and the listeners like any other failed run. The error is used as its output.
+    """
+    now = time.time()
+    return RunResult(point=point, gpus=gpus, code=127, start=now, end=now, tail=[f'{type(error).__name__}: {error}'], setup=setup,
+                     failure=GSFailure.LAUNCH)
+
+class RunListener:
+    """
+    Description:
+        Base class for objects that want to be notified by the execution engines about the runs: `on_launch` is called in the GridSearcher
+        process right before a point is started on its GPUs and `on_exit` is called with the RunResult once the process exited.
+    """
+    def on_launch(self, point, gpus):
+        pass
+
+    def on_exit(self, result):
+        pass
+
 def validate_constructor_params(
         script: str,
         exe: GSExe = GSExe.PYTHON,
@@ -84,91 +180,130 @@ def read_yaml(file):
         data = yaml.load(f, Loader=yaml.loader.SafeLoader)
         return data
 
-def waiting_worker(params):
+def build_launch_prefix(exe, gpus, cfg_torchrun, port=None):
     """
-        This method will run an experiment with a single element of the cartesian product, on a single process.
+        Returns the environment variables and the launcher arguments that precede the command of a point running on the GPU ids in `gpus`:
+        CUDA_VISIBLE_DEVICES and CUDA_LAUNCH_BLOCKING, followed by either torchrun or the executable `exe`.
+        If `port` is given (leased by a PortAllocator), it replaces `cfg_torchrun.master_port` for the rendezvous endpoint.
     """
-    exe, index, cmd, root, cmd_dict, gpu_processes_count, cfg_sched, cfg_torchrun, create_state_finished = params
-    n_gpus = len(cfg_sched.gpus)
-    """
-        Each process sleeps index+5 seconds, where index is the command index.
-        This is necessary because the scripts do not allocate GPU memory immediately.
-    """
-    time.sleep(index + 5)
-
-    if not cfg_sched.distributed_training:
-        n_gpus = 1
-        while True:
-            """
-                The shared dictionary gpu_processes_count has key=gpu id and value=number of processes on that GPU
-                We sort this dictionary based on values (item[1]) to get least busy GPUs at the first index
-            """
-            sorted_items = sorted(gpu_processes_count.items(), key=lambda item: item[1]) # this will be a list
-            gpu, count = sorted_items[0] # sort ASC by processes count, this is the least busy GPU (count = current number of jobs on GPU)
-
-            # if there are multiple GPUs with minimal number of processes, then pick a random GPU from them
-            i = 1
-            while i < n_gpus and sorted_items[i][0] == count: # advance i to the first GPU that has a different number of jobs (!= count)
-                i += 1
-            if count < cfg_sched.max_jobs_per_gpu: # if we can fit another job there
-                gpu = random.choice([g for g, c in sorted_items[:i]]) # randomly generate a GPU id among the least busy ones)
-                lock_acquire() # acquire the lock to change the shared dictionary gpu_processes_count
-                gpu_processes_count[gpu] += 1 # increase number of jobs for the GPU
-                lock_release()
-                break
-
-            print(f'All GPUs in have {cfg_sched.max_jobs_per_gpu} jobs, waiting 60 seconds...')
-            time.sleep(60)
-
-    # create the root folder, e.g. param_name_for_exp_root_folder
-    os.makedirs(root, exist_ok=True)
-
-    # write all parameters to the arguments file
-    with open(os.path.join(root, 'arguments.txt'), 'w') as w:
-        for k, v in cmd_dict.items():
-            if k.startswith('_'):
-                w.write(f'{k[1:]}={v}\n')
+    env = {}
+    # set CUDA_LAUNCH_BLOCKING variable
+    if cfg_torchrun.launch_blocking:
+        env['CUDA_LAUNCH_BLOCKING'] = '1'
 
     # set CUDA_VISIBLE_DEVICES variable
-    if cfg_sched.distributed_training:
-        gpus = ",".join(map(str, cfg_sched.gpus))
-        cvd = f'CUDA_VISIBLE_DEVICES={gpus}'
-    else:
-        cvd = f'CUDA_VISIBLE_DEVICES={gpus}' # the randomly chosen GPU
-
-    # set CUDA_LAUNCH_BLOCKING variable
-    clb = 'CUDA_LAUNCH_BLOCKING=1' if cfg_torchrun.launch_blocking else ''
+    env['CUDA_VISIBLE_DEVICES'] = ",".join(map(str, gpus))
 
     # master_addr_port = f'NCCL_SOCKET_IFNAME=lo MASTER_ADDR=127.0.0.1 MASTER_PORT=29500'
 
     if cfg_torchrun.torchrun:
         addr = cfg_torchrun.master_addr
-        port = cfg_torchrun.master_port
-        final_cmd = ' '.join([
-            clb,
-            cvd,
+        prefix = [
             'torchrun',
             f'--rdzv_backend={cfg_torchrun.rdzv_backend}',
-            f'--rdzv_endpoint={addr}:{port}',
+            f'--rdzv_endpoint={addr}:{cfg_torchrun.master_port if port is None else port}',
             f'--nnodes=1',
-            f'--nproc-per-node={n_gpus}',
-            cmd
-        ]).strip()
+            f'--nproc-per-node={len(gpus)}',
+        ]
+        if port is not None and cfg_torchrun.unique_rdzv_id:
+            prefix.insert(2, f'--rdzv_id={rdzv_id(port)}')
     else:
-        final_cmd = ' '.join([clb, cvd, exe, cmd ]).strip()
+        prefix = [exe]
+    return env, prefix
+
+def build_final_cmd(exe, cmd, gpus, cfg_torchrun, port=None):
+    """
+        Builds the final shell command for the command `cmd` (script and arguments) that will run on the GPU ids in `gpus`.
+        If `gpus` is a Placement on a host of a multi-host pool, the command is wrapped by the transport of the host.
+    """
+    env, prefix = build_launch_prefix(exe, gpus, cfg_torchrun, port)
+    final_cmd = ' '.join([f'{k}={v}' for k, v in env.items()] + prefix + [cmd]).strip()
+    host = getattr(gpus, 'host', None)
+    if host is not None:
+        final_cmd = host.transport.wrap_cmd(host.name, final_cmd)
+    return final_cmd
+
+def prepare_root(point):
+    """
+        Creates the root folder of the point and writes all its parameters to the file arguments.txt
+    """
+    # create the root folder, e.g. param_name_for_exp_root_folder
+    os.makedirs(point.root, exist_ok=True)
+
+    # write all parameters to the arguments file
+    with open(os.path.join(point.root, 'arguments.txt'), 'w') as w:
+        for k, v in point.cmd_dict.items():
+            if k.startswith('_'):
+                w.write(f'{k[1:]}={v}\n')
+
+def mark_finished(root):
+    """
+        Writes the file state.finished to mark that the experiment in `root` was finished
+    """
+    with open(os.path.join(root, 'state.finished'), 'w'):
+        pass
+
+_run_pids = None # set in the pool workers when the launcher handles the signals (see ShutdownHandler)
+_worker_busy = False
+
+def init_worker(pid_queue):
+    """
+        Initializer of the pool workers when the launcher handles the signals. The runs are started in their own process group and
+        their pids are sent to the launcher through `pid_queue`, such that the launcher alone decides when they are signalled: the
+        workers ignore SIGINT (sent by the terminal to the whole foreground group) and SIGTERM while a run is running.
+    """
+    global _run_pids
+    _run_pids = pid_queue
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, _on_worker_sigterm)
+
+def _on_worker_sigterm(signum, frame):
+    if not _worker_busy: # an idle worker, e.g. terminated by the pool
+        signal.signal(signum, signal.SIG_DFL)
+        os.kill(os.getpid(), signum)
+
+def waiting_worker(params):
+    """
+        This method will run an experiment with a single element of the cartesian product, on a single process.
+        The GPUs were already assigned by the GPUSlotScheduler of the GridSearcher process, which takes them back when this method returns.
+    """
+    global _worker_busy
+    exe, point, gpus, port, cfg_torchrun, create_state_finished, cfg_logs = params
+
+    setup = time.time()
+    prepare_root(point)
+    final_cmd = build_final_cmd(exe, point.cmd, gpus, cfg_torchrun, port)
+    new_session = _run_pids is not None # the launcher forwards the signals to the process group of the run
 
-    print(final_cmd)
-    code = os.system(final_cmd)
+    tail = None
+    start = time.time()
+    _worker_busy = True
+    try:
+        if cfg_logs is None:
+            print(final_cmd)
+            proc = subprocess.Popen(final_cmd, shell=True, start_new_session=new_session)
+            if new_session:
+                _run_pids.put((point.index, point.root, point.attempt, proc.pid))
+            code = proc.wait()
+        else: # the output goes to the log files in the root folder, the pipes are drained by threads
+            from .run_logs import RunOutput
+            output = RunOutput(point.root, cfg_logs)
+            output.write('stdout', f'{final_cmd}\n'.encode())
+            proc = subprocess.Popen(final_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                                    start_new_session=new_session)
+            if new_session:
+                _run_pids.put((point.index, point.root, point.attempt, proc.pid))
+            for t in output.pump(proc):
+                t.join()
+            code = proc.wait()
+            output.close()
+            tail = output.tail.get()
+    finally:
+        _worker_busy = False
 
     if code == 0 and create_state_finished:
-        # write state.finished file to mark that the experiment was finished
-        with open(os.path.join(root, 'state.finished'), 'w'):
-            pass
-
-    if not cfg_sched.distributed_training: # if we are not in distributed settings, decrease the number of processes for the GPU that finished the run
-        lock_acquire()
-        gpu_processes_count[gpu] -= 1
-        lock_release()
+        mark_finished(point.root)
+    return RunResult(point=point, gpus=gpus, code=code, start=start, end=time.time(), tail=tail, setup=setup)
 
 # def wait_for_gpus_of_user(gpus, max_jobs=None, timeout_seconds=60):
 #     """
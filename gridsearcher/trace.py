@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import threading
+from .tools import RunListener
+
+class Tracer(RunListener):
+    """
+    Description:
+        Records the phases of a GridSearcher run and exports them in the Chrome trace event format, which can be opened with
+        chrome://tracing or https://ui.perfetto.dev.
+
+        The launcher phases (grid expansion and check of the finished runs, pause before the start, execution) are on the "GridSearcher"
+        track. Each GPU slot has its own track with the phases of the runs placed on it:
+            - dispatch: from the moment the slots were acquired until the run is picked up (e.g. by a worker of the pool)
+            - setup: creation of the root folder and arguments.txt (and port lease for the asyncio engine)
+            - run: the process itself
+            - teardown: from the exit of the process until its slots are given back to the scheduler
+        The queue wait of each run (from the moment it could be placed, see GridPoint.queued, until its slots were acquired) is exported
+        as an async event.
+        A run using multiple GPUs appears on one slot track of each of its GPUs, and gaps on a slot track are idle slot time.
+    Attributes:
+        path (str): the path of the trace file
+        lanes (Dict[str, List[bool]]): for each GPU, which of its slots are busy
+        events (List[dict]): the recorded trace events
+    """
+    def __init__(self, path, cfg_sched):
+        self.path = path
+        if cfg_sched.hosts is None:
+            gpus = [str(gpu) for gpu in cfg_sched.gpus]
+        else:
+            gpus = [f'{h.name}:{gpu}' for h in cfg_sched.hosts for gpu in h.gpus]
+        self.lanes = {gpu: [False] * cfg_sched.max_jobs_per_gpu for gpu in gpus}
+        self.tids = {}
+        self.active = {}
+        self.events = []
+        self.origin = time.time()
+        self.queue_start = self.origin
+        self._lock = threading.Lock()
+        self._track('GridSearcher')
+        for gpu, lanes in self.lanes.items(): # creates the slot tracks in the order of the GPUs
+            for lane in range(len(lanes)):
+                self._track(f'GPU {gpu} slot {lane}')
+
+    def span(self, name, start, end, track='GridSearcher', args=None):
+        """
+            Records a complete event between the timestamps (time.time()) `start` and `end` on a track.
+        """
+        with self._lock:
+            event = dict(name=name, ph='X', pid=1, tid=self._track(track), ts=self._us(start), dur=max(0., (end - start) * 1e6))
+            if args is not None:
+                event['args'] = args
+            self.events.append(event)
+
+    def on_launch(self, point, gpus):
+        now = time.time()
+        with self._lock:
+            keys = self._keys(gpus)
+            lanes = []
+            for gpu in keys:
+                lane = self.lanes[gpu].index(False)
+                self.lanes[gpu][lane] = True
+                lanes.append((gpu, lane))
+            self.active[(point.index, point.root)] = (now, lanes)
+            wait = dict(name=f'queue wait {point.index}', cat='queue', id=point.index, pid=1, tid=self._track('GridSearcher'))
+            queued = min(self.queue_start, now) if point.queued is None else point.queued
+            self.events.append(dict(wait, ph='b', ts=self._us(queued)))
+            self.events.append(dict(wait, ph='e', ts=self._us(now)))
+
+    def on_exit(self, result):
+        now = time.time()
+        with self._lock:
+            launch, lanes = self.active.pop((result.point.index, result.point.root))
+            for gpu, lane in lanes:
+                self.lanes[gpu][lane] = False
+        setup = launch if result.setup is None else result.setup
+        args = dict(root=result.point.root, code=result.code, gpus=list(result.gpus))
+        for gpu, lane in lanes:
+            track = f'GPU {gpu} slot {lane}'
+            self.span('dispatch', launch, setup, track)
+            self.span('setup', setup, result.start, track)
+            self.span('run', result.start, result.end, track, args)
+            self.span('teardown', result.end, now, track)
+
+    def export(self):
+        """
+            Writes the trace file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._lock:
+            metadata = [dict(name='process_name', ph='M', pid=1, args=dict(name='GridSearcher'))]
+            metadata += [dict(name='thread_name', ph='M', pid=1, tid=tid, args=dict(name=track)) for track, tid in self.tids.items()]
+            metadata += [dict(name='thread_sort_index', ph='M', pid=1, tid=tid, args=dict(sort_index=tid)) for tid in self.tids.values()]
+            trace = dict(traceEvents=metadata + self.events, displayTimeUnit='ms')
+        with open(self.path, 'w') as w:
+            json.dump(trace, w)
+        print(f'[GridSearcher] trace written to {self.path}')
+
+    def _track(self, track):
+        if track not in self.tids:
+            self.tids[track] = len(self.tids)
+        return self.tids[track]
+
+    def _us(self, t):
+        return (t - self.origin) * 1e6
+
+    def _keys(self, gpus):
+        host = getattr(gpus, 'host', None)
+        return [str(gpu) if host is None else f'{host.name}:{gpu}' for gpu in gpus]
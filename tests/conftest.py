@@ -0,0 +1,21 @@
+import pytest
+import gridsearcher.gridsearcher
+
+@pytest.fixture(autouse=True)
+def no_pause(monkeypatch):
+    """
+        Skips the 5 seconds pause of GridSearcher before the runs are started.
+    """
+    monkeypatch.setattr(gridsearcher.gridsearcher, 'pause_process', lambda *args, **kwargs: None)
+
+@pytest.fixture
+def write_script(tmp_path):
+    """
+        Returns a function writing a python script to the temporary folder of the test, which returns the path of the script.
+        The scripts get their arguments as "--key value" pairs.
+    """
+    def write(name, code):
+        path = tmp_path / name
+        path.write_text(code)
+        return str(path)
+    return write
@@ -0,0 +1,54 @@
+import os
+import json
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, AutoTuneConfig, GSEngine
+from gridsearcher.autotune import ConcurrencyTuner
+from gridsearcher.scheduler import GPUSlotScheduler
+
+TRAIN = """
+import os, sys, json, time
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+start = time.time()
+time.sleep(0.3)
+with open(os.path.join(args['root'], 'run.json'), 'w') as w:
+    json.dump(dict(start=start, end=time.time()), w)
+"""
+
+def test_tuner_steps_down_when_the_throughput_per_slot_degrades():
+    scheduler = GPUSlotScheduler([0, 1], max_jobs_per_gpu=4)
+    tuner = ConcurrencyTuner(AutoTuneConfig(min_jobs_per_gpu=1, min_gain=0.1), scheduler, upper=4)
+    tuner._set_level(tuner.level)
+    for throughput in [10, 18, 19]: # 2 runs/GPU is the best level, 3 runs/GPU does not improve enough
+        tuner.evaluate(throughput)
+    assert tuner.converged and tuner.level == scheduler.max_jobs_per_gpu == 2 and tuner.reference == 9
+
+    tuner.evaluate(14) # the slots are not all busy, e.g. at the end of the grid
+    assert tuner.level == 2
+    while scheduler.try_acquire(1) is not None:
+        pass
+    tuner.evaluate(17) # within min_gain of the reference
+    assert tuner.level == 2
+    tuner.evaluate(14) # e.g. another job started on the GPUs
+    assert tuner.level == scheduler.max_jobs_per_gpu == 1 and tuner.converged
+
+    tuner.evaluate(12) # the other job is gone, the tuner climbs again
+    assert not tuner.converged and tuner.level == 2
+    tuner.evaluate(26)
+    tuner.evaluate(27)
+    assert tuner.converged and tuner.level == 2 and tuner.reference == 13
+    assert [h['level'] for h in tuner.history] == [1, 2, 3, 2, 2, 2, 1, 2, 3]
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_tuner_adds_runs_per_gpu(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=3, gpus=[0], params_values=dict(i=list(range(16))),
+                                      autotune=AutoTuneConfig(min_jobs_per_gpu=1, interval=0.5, settle=0)),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = [json.loads((tmp_path / 'runs' / name / 'run.json').read_text()) for name in os.listdir(tmp_path / 'runs')]
+    assert len(runs) == 16
+    starts = sorted(run['start'] for run in runs)
+    assert starts[1] - starts[0] > 0.25 # one run at a time at the start
+    assert max(sum(run['start'] <= t < run['end'] for run in runs) for t in starts) > 1 # then more runs per GPU
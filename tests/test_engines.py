@@ -0,0 +1,45 @@
+import os
+import json
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine
+
+# records the GPU it was started on and when it was running, then exits with the code given as parameter
+TRAIN = """
+import os, sys, json, time
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+start = time.time()
+time.sleep(0.3)
+with open(os.path.join(args['root'], 'run.json'), 'w') as w:
+    json.dump(dict(gpu=os.environ['CUDA_VISIBLE_DEVICES'], start=start, end=time.time()), w)
+sys.exit(int(args['code']))
+"""
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_engine(tmp_path, write_script, engine, capsys):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}_code=${code}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[3, 5],
+                                      params_values=dict(i=list(range(5)), code=[0, 2])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = {name: json.loads((tmp_path / 'runs' / name / 'run.json').read_text()) for name in os.listdir(tmp_path / 'runs')}
+    assert len(runs) == 10
+    for name, run in runs.items(): # only the successful runs are marked as finished
+        assert (tmp_path / 'runs' / name / 'state.finished').is_file() == name.endswith('code=0')
+    assert 'Failed: 5' in capsys.readouterr().out
+
+    for gpu in ['3', '5']: # at most max_jobs_per_gpu runs at the same time on each GPU, and both GPUs are used
+        on_gpu = [run for run in runs.values() if run['gpu'] == gpu]
+        assert len(on_gpu) > 0
+        assert max(sum(other['start'] < run['end'] and run['start'] < other['end'] for other in on_gpu) for run in on_gpu) <= 2
+    starts = sorted(run['start'] for run in runs.values())
+    assert starts[3] - starts[0] < 0.25 # the first 4 runs start together on the 4 slots
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_launch_without_state_finished(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0], params_values=dict(i=[0, 1], code=[0])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, create_state_finished=False)
+    assert sorted(os.listdir(tmp_path / 'runs' / 'i=0')) == ['arguments.txt', 'run.json']
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import types
+import importlib.util
+import multiprocessing as mp
+import pytest
+import gridsearcher.file_locker as file_locker
+from gridsearcher.file_locker import FileLock, LockTimeoutError
+
+def increment(lock, path, n):
+    for _ in range(n):
+        with lock:
+            with open(path) as f:
+                value = int(f.read())
+            time.sleep(0.001) # makes lost updates likely without the lock
+            with open(path, 'w') as f:
+                f.write(str(value + 1))
+
+def test_mutual_exclusion_across_processes(tmp_path):
+    counter = tmp_path / 'counter.txt'
+    counter.write_text('0')
+    lock = FileLock(str(tmp_path / 'counter.lock')) # sent to the children, each one opens its own file descriptor
+    processes = [mp.Process(target=increment, args=(lock, str(counter), 25)) for _ in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+    assert int(counter.read_text()) == 100
+
+def test_timeout(tmp_path):
+    holder = FileLock(str(tmp_path / 'grid.lock'))
+    waiter = FileLock(str(tmp_path / 'grid.lock'), timeout=0.2)
+    with holder:
+        start = time.monotonic()
+        with pytest.raises(LockTimeoutError):
+            waiter.acquire()
+        assert time.monotonic() - start >= 0.2
+        assert waiter._fd is None # the file descriptor of the failed attempt is closed
+    with waiter: # free again once the holder released it
+        pass
+
+class FakeMsvcrt(types.ModuleType):
+    """
+        Mimics msvcrt.locking: a byte range of a file can only be locked through one file descriptor at a time.
+    """
+    LK_UNLCK, LK_NBLCK = 0, 2
+
+    def __init__(self):
+        super().__init__('msvcrt')
+        self.owners = {}
+
+    def locking(self, fd, mode, nbytes):
+        key = (os.fstat(fd).st_ino, os.lseek(fd, 0, os.SEEK_CUR))
+        if mode == self.LK_UNLCK:
+            assert self.owners.pop(key) == fd
+        elif self.owners.setdefault(key, fd) != fd:
+            raise OSError('locked')
+
+def test_windows_import_path(monkeypatch, tmp_path):
+    msvcrt = FakeMsvcrt()
+    monkeypatch.setitem(sys.modules, 'fcntl', None) # import fcntl raises ImportError, as on Windows
+    monkeypatch.setitem(sys.modules, 'msvcrt', msvcrt)
+    spec = importlib.util.spec_from_file_location('file_locker_windows', file_locker.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.fcntl is None and module.msvcrt is msvcrt
+
+    holder = module.FileLock(str(tmp_path / 'grid.lock'))
+    with holder: # without a timeout, the lock is polled as well since msvcrt has no blocking wait in the kernel
+        assert len(msvcrt.owners) == 1
+        with pytest.raises(module.LockTimeoutError):
+            module.FileLock(str(tmp_path / 'grid.lock')).acquire(timeout=0.1)
+    assert len(msvcrt.owners) == 0
+    with module.FileLock(str(tmp_path / 'grid.lock'), timeout=0.1):
+        pass
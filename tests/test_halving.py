@@ -0,0 +1,70 @@
+import os
+import json
+from collections import Counter
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, HalvingConfig, GSEngine
+from gridsearcher.halving import halving_brackets
+
+# the loss only depends on the distance to the best learning rate, the budget shifts all runs of a rung by the same amount
+TRAIN = """
+import os, sys, json
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+loss = abs(float(args['lr']) - 0.31) + 1 / int(args['epochs'])
+with open(os.path.join(args['root'], 'metrics.json'), 'w') as w:
+    json.dump(dict(loss=loss, epochs=int(args['epochs'])), w)
+"""
+
+def run_halving(tmp_path, write_script, engine, halving, lrs):
+    """
+        Runs the dummy training script with halving and returns the list of (lr, budget) of the runs that were started, read from the
+        root folders.
+    """
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'lr=${lr}', 'E=${epochs}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0, 1], params_values=dict(lr=lrs)),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, halving=halving)
+
+    runs = []
+    for lr_folder in os.listdir(tmp_path / 'runs'):
+        for budget_folder in os.listdir(tmp_path / 'runs' / lr_folder):
+            root = tmp_path / 'runs' / lr_folder / budget_folder
+            budget = int(budget_folder.split('=')[1])
+            assert json.loads((root / 'metrics.json').read_text())['epochs'] == budget # the budget of the rung reached the script
+            assert (root / 'state.finished').is_file()
+            runs.append((float(lr_folder.split('=')[1]), budget))
+    return runs
+
+def expected_runs(halving, lrs):
+    """
+        The (lr, budget) of the runs of each bracket, promoting the best floor(n / eta) configurations of each rung.
+    """
+    runs = []
+    for indices, budgets in halving_brackets(halving, len(lrs)):
+        for budget in budgets:
+            runs.extend((lrs[i], budget) for i in indices)
+            indices = sorted(indices, key=lambda i: abs(lrs[i] - 0.31))[:max(1, len(indices) // halving.eta)]
+    return runs
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_successive_halving(tmp_path, write_script, engine):
+    lrs = [i / 10 for i in range(9)]
+    halving = HalvingConfig(budget_param='epochs', min_budget=1, max_budget=9, metric='loss', eta=3)
+    runs = run_halving(tmp_path, write_script, engine, halving, lrs)
+
+    assert Counter(budget for lr, budget in runs) == {1: 9, 3: 3, 9: 1} # rung budgets 1, 3, 9 with 1/eta of the runs promoted
+    assert sorted(lr for lr, budget in runs if budget == 3) == [0.2, 0.3, 0.4]
+    assert [lr for lr, budget in runs if budget == 9] == [0.3]
+    assert sorted(runs) == sorted(expected_runs(halving, lrs))
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_hyperband(tmp_path, write_script, engine):
+    lrs = [i / 20 for i in range(15)]
+    halving = HalvingConfig(budget_param='epochs', min_budget=1, max_budget=9, metric='loss', eta=3, hyperband=True)
+    runs = run_halving(tmp_path, write_script, engine, halving, lrs)
+
+    # brackets: 9 configurations at budgets 1, 3, 9, then 5 configurations at 3, 9 and the last configuration at 9
+    assert [len(indices) for indices, budgets in halving_brackets(halving, len(lrs))] == [9, 5, 1]
+    assert Counter(budget for lr, budget in runs) == {1: 9, 3: 3 + 5, 9: 1 + 1 + 1}
+    assert len(set(lr for lr, budget in runs)) == len(lrs) # each configuration belongs to a single bracket
+    assert sorted(runs) == sorted(expected_runs(halving, lrs))
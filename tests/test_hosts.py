@@ -0,0 +1,45 @@
+import os
+import json
+import shlex
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine, Host, LocalTransport, SSHTransport
+
+TRAIN = """
+import os, sys, json, time
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+start = time.time()
+time.sleep(0.3)
+with open(os.path.join(args['root'], 'run.json'), 'w') as w:
+    json.dump(dict(host=os.environ['HOST_NAME'], gpu=os.environ['CUDA_VISIBLE_DEVICES'], start=start, end=time.time()), w)
+"""
+
+class TaggingTransport(LocalTransport):
+    """
+        Runs the commands locally and tells them the name of their host.
+    """
+    def wrap_cmd(self, host, cmd):
+        return f'HOST_NAME={host} {super().wrap_cmd(host, cmd)}'
+
+def test_ssh_transport_quotes_the_remote_command():
+    transport = SSHTransport(options=['-p', '2222'], cwd='/home/me/my project')
+    cmd = transport.wrap_cmd('user@node01', "CUDA_VISIBLE_DEVICES=0 python3 train.py --name 'a b'")
+    ssh = shlex.split(cmd)
+    assert ssh[:4] == ['ssh', '-p', '2222', 'user@node01'] and len(ssh) == 5
+    assert shlex.split(ssh[4]) == ['cd', '/home/me/my project', '&&', 'CUDA_VISIBLE_DEVICES=0', 'python3', 'train.py', '--name', 'a b']
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_host_pool(tmp_path, write_script, engine):
+    hosts = [Host('node01', [0, 1], TaggingTransport()), Host('node02', [3], TaggingTransport())]
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0], hosts=hosts,
+                                      params_values=dict(i=list(range(6)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = [json.loads((tmp_path / 'runs' / f'i={i}' / 'run.json').read_text()) for i in range(6)]
+    slots = {(run['host'], run['gpu']) for run in runs}
+    assert slots == {('node01', '0'), ('node01', '1'), ('node02', '3')} # the GPUs of both hosts are used as one pool
+    for slot in slots: # and each GPU has at most one run at a time
+        spans = sorted((run['start'], run['end']) for run in runs if (run['host'], run['gpu']) == slot)
+        assert all(prev[1] <= span[0] for prev, span in zip(spans, spans[1:]))
@@ -0,0 +1,38 @@
+import os
+import json
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, TelemetryConfig, LogConfig, GSEngine
+
+TRAIN = """
+import os, sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+open(os.path.join(args['root'], 'done.txt'), 'w').close()
+"""
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_runs_that_cannot_start_are_reported_as_failed(tmp_path, write_script, engine):
+    (tmp_path / 'blocked').write_text('') # a regular file, the root folders below it cannot be created
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), '${place}', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0, 1],
+                                      params_values=dict(place=['blocked', 'runs'], i=list(range(3)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, ledger=str(tmp_path / 'ledger.jsonl'),
+           trace=str(tmp_path / 'trace.json'), telemetry=TelemetryConfig(status_file=str(tmp_path / 'status.json')), logs=LogConfig())
+
+    # 6 failures would have exhausted the 4 slots if the failed launches were not given back to the scheduler and the listeners
+    assert sorted(os.listdir(tmp_path / 'runs')) == ['i=0', 'i=1', 'i=2']
+    status = json.loads((tmp_path / 'status.json').read_text())
+    assert (status['running'], status['finished'], status['failed']) == (0, 3, 3)
+    assert all(slots['used'] == 0 for slots in status['gpu_slots'].values())
+
+    records = {}
+    for line in (tmp_path / 'ledger.jsonl').read_text().splitlines():
+        record = json.loads(line)
+        if 'key' in record: # the last record of each run
+            records[record['root']] = record
+    failed = [record for root, record in records.items() if '/blocked/' in root]
+    assert len(failed) == 3 and all(record['status'] == 'failed' and record['failure'] == 'launch' for record in failed)
+
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert sum(event['name'] == 'run' for event in events) == 6
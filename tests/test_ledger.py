@@ -0,0 +1,39 @@
+import os
+import json
+from string import Template
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, ShardConfig
+from gridsearcher.ledger import RunLedger
+
+TRAIN = """
+import os, sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(os.path.dirname(os.path.dirname(args['root'])), 'ran.txt'), 'a') as w:
+    w.write(args['i'] + '\\n')
+"""
+
+def run(tmp_path, write_script, n_points, shard=None):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0], params_values=dict(i=list(range(n_points)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), ledger=str(tmp_path / 'ledger.jsonl'), shard=shard)
+
+def ran(tmp_path):
+    path = tmp_path / 'ran.txt'
+    return sorted(path.read_text().splitlines(), key=int) if path.is_file() else []
+
+def test_import_of_finished_runs_needs_the_full_grid(tmp_path, write_script):
+    for i in range(6): # finished before the ledger existed
+        os.makedirs(tmp_path / 'runs' / f'i={i}')
+        (tmp_path / 'runs' / f'i={i}' / 'state.finished').touch()
+
+    run(tmp_path, write_script, 6, ShardConfig(shard_index=0, num_shards=2))
+    assert not RunLedger(str(tmp_path / 'ledger.jsonl')).import_complete # the points of the other shard were not checked
+    run(tmp_path, write_script, 6, ShardConfig(shard_index=1, num_shards=2))
+    assert ran(tmp_path) == []
+
+    run(tmp_path, write_script, 8) # the two new points run, the full pass completes the import
+    assert ran(tmp_path) == ['6', '7']
+    ledger = RunLedger(str(tmp_path / 'ledger.jsonl'))
+    assert ledger.import_complete
+    statuses = [json.loads(line).get('status') for line in (tmp_path / 'ledger.jsonl').read_text().splitlines()]
+    assert statuses.count('finished') == 8 and len(ledger.records) == 8
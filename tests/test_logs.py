@@ -0,0 +1,49 @@
+import os
+import sys
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, LogConfig, GSEngine
+from gridsearcher.run_logs import RotatingFile, TailBuffer
+
+# writes much more than the pipe buffer on both streams, which blocks the run if the pipes are not drained
+TRAIN = """
+import sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+for i in range(20000):
+    print(f'step {i}')
+    print(f'warning {i}', file=sys.stderr)
+sys.exit(int(args['code']))
+"""
+
+def test_rotating_file(tmp_path):
+    f = RotatingFile(str(tmp_path / 'stdout.log'), max_bytes=10, backups=2)
+    for data in [b'aaaaaa\n', b'bbbbbb\n', b'cccccc\n', b'dddddd\n']:
+        f.write(data)
+    f.close()
+    assert [(tmp_path / name).read_bytes() for name in ['stdout.log', 'stdout.log.1', 'stdout.log.2']] == [b'dddddd\n', b'cccccc\n', b'bbbbbb\n']
+    assert not (tmp_path / 'stdout.log.3').exists()
+
+def test_tail_buffer():
+    tail = TailBuffer(2)
+    for data in [b'one\ntw', b'o\r\nthree\nfou']:
+        tail.feed(data)
+    assert tail.get() == ['three', 'fou']
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_output_goes_to_the_log_files(tmp_path, write_script, engine, capfd):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'code=${code}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0], params_values=dict(code=[0, 3])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, logs=LogConfig(tail_lines=3))
+
+    for code in [0, 3]:
+        root = tmp_path / 'runs' / f'code={code}'
+        stdout = (root / 'stdout.log').read_text().splitlines()
+        assert stdout[0].endswith(f'--code {code} --root {root}') # the command comes first
+        assert stdout[1:] == [f'step {i}' for i in range(20000)]
+        assert (root / 'stderr.log').read_text().splitlines() == [f'warning {i}' for i in range(20000)]
+
+    out = capfd.readouterr().out
+    assert '\nstep 100\n' not in out and 'run failed with code 3' in out # the console only shows the status and the end of the failed run
+    failed = out[out.index('run failed with code 3'):].splitlines()[1:4]
+    assert len(failed) == 3 and all(line.startswith('    | ') for line in failed)
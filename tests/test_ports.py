@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import socket
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine
+from gridsearcher.ports import PortAllocator
+
+# binds the port of the rendezvous endpoint while it runs, like the rendezvous server of torchrun, and records its arguments
+FAKE_TORCHRUN = f"""#!{sys.executable}
+import sys, json, time, socket
+args = dict(arg[2:].split('=', 1) for arg in sys.argv[1:] if arg.startswith('--') and '=' in arg)
+addr, port = args['rdzv_endpoint'].rsplit(':', 1)
+root = sys.argv[sys.argv.index('--root') + 1]
+with socket.socket() as s:
+    s.bind((addr, int(port))) # fails if another run uses the same port
+    s.listen()
+    with open(root + '/torchrun.json', 'w') as w:
+        json.dump(dict(port=int(port), rdzv_id=args.get('rdzv_id'), start=time.time()), w)
+    time.sleep(0.3)
+"""
+
+def free_base_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def test_port_allocator():
+    base = free_base_port()
+    allocator = PortAllocator('127.0.0.1', base, max_ports=20)
+    first = allocator.acquire()
+    with socket.socket() as other: # a port used by another process is skipped
+        other.bind(('127.0.0.1', first + 1))
+        other.listen()
+        assert allocator.acquire() > first + 1
+    allocator.release(first)
+    assert allocator.acquire() == first
+
+    allocator = PortAllocator('127.0.0.1', base, max_ports=1)
+    allocator.acquire()
+    with pytest.raises(RuntimeError):
+        allocator.acquire()
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_concurrent_torchrun_runs_get_distinct_ports(tmp_path, write_script, engine, monkeypatch):
+    bin_folder = tmp_path / 'bin'
+    bin_folder.mkdir()
+    (bin_folder / 'torchrun').write_text(FAKE_TORCHRUN)
+    os.chmod(bin_folder / 'torchrun', 0o755)
+    monkeypatch.setenv('PATH', f'{bin_folder}{os.pathsep}{os.environ["PATH"]}')
+
+    gs = GridSearcher(script=write_script('train.py', ''))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=3, gpus=[0, 1], params_values=dict(i=list(range(9)))),
+           cfg_torchrun=TorchRunConfig(torchrun=True, master_addr='127.0.0.1', master_port=free_base_port(), auto_port=True,
+                                       unique_rdzv_id=True), engine=engine)
+
+    runs = [json.loads((tmp_path / 'runs' / f'i={i}' / 'torchrun.json').read_text()) for i in range(9)]
+    first = sorted(runs, key=lambda run: run['start'])[:6] # started together on the 6 slots
+    assert len(set(run['port'] for run in first)) == 6
+    assert len(set(run['rdzv_id'] for run in first)) == 6 and all(run['rdzv_id'].startswith('gs') for run in first)
+    assert all((tmp_path / 'runs' / f'i={i}' / 'state.finished').is_file() for i in range(9))
@@ -0,0 +1,38 @@
+import os
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig
+from gridsearcher.renderer import compile_template
+
+def commands(gs, params_values, exp_folder=Template('/runs/${name}')):
+    cmds = gs.run(param_name_for_exp_root_folder='root', exp_folder=exp_folder, debug=True,
+                  cfg_sched=SchedulingConfig(distributed_training=True, max_jobs_per_gpu=1, gpus=[0], params_values=params_values),
+                  cfg_torchrun=TorchRunConfig(torchrun=False))
+    return [cmd.split(' ', 3)[-1] for cmd in cmds] # without "CUDA_VISIBLE_DEVICES=0 python3 train.py"
+
+def test_compile_template():
+    assert compile_template(Template('lr=${lr}_wd=$wd')) == ['lr=', 'lr', '_wd=', 'wd', '']
+    assert compile_template(Template('$$${x}')) == ['$', 'x', '']
+    with pytest.raises(ValueError):
+        compile_template(Template('lr=$'))
+
+def test_templates_are_rendered_after_their_inputs():
+    gs = GridSearcher(script='train.py', defaults=dict(epochs=3, bf16=True, fp32=False, trainDOTsteps=10))
+    gs.add_param('name', Template('${group}_seed=${seed}')) # uses a template which is added later
+    gs.add_param('group', Template('lr=${lr}_E=${epochs}'))
+    assert commands(gs, dict(lr=[0.1, 0.01], seed=[1, 2])) == [
+        f'--epochs 3 --bf16 --train.steps 10 --name lr={lr}_E=3_seed={seed} --group lr={lr}_E=3 --lr {lr} --seed {seed} '
+        f'--root /runs/lr={lr}_E=3_seed={seed}' for lr in [0.1, 0.01] for seed in [1, 2]]
+
+def test_undefined_template_parameter():
+    gs = GridSearcher(script='train.py')
+    gs.add_param('name', Template('lr=${lr}_wd=${wd}'))
+    with pytest.raises(RuntimeError, match=r"\[TemplateError\] the template for name uses undefined parameters: \['wd'\]"):
+        commands(gs, dict(lr=[0.1]))
+
+def test_circular_templates():
+    gs = GridSearcher(script='train.py')
+    gs.add_param('a', Template('${b}_${lr}'))
+    gs.add_param('b', Template('${a}'))
+    with pytest.raises(RuntimeError, match='circular dependency'):
+        commands(gs, dict(lr=[0.1]), exp_folder='/runs')
@@ -0,0 +1,41 @@
+import os
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, CacheConfig, GSEngine
+
+TRAIN = """
+import os, sys, json
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(os.path.dirname(os.path.dirname(args['root'])), 'ran.txt'), 'a') as w:
+    w.write(f"{args['lr']}\\n")
+if args['lr'] == '0.3':
+    sys.exit(1)
+with open(os.path.join(args['root'], 'ckpt.bin'), 'wb') as w:
+    w.write(os.urandom(64))
+with open(os.path.join(args['root'], 'metrics.json'), 'w') as w:
+    json.dump(dict(lr=args['lr'], name=args['name']), w)
+"""
+
+def run(tmp_path, write_script, engine, grid, launch, lrs, capsys):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.add_param('name', Template('lr=${lr}_' + launch)) # differs between the launches, e.g. the date in a wandb run name
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), grid, 'runs', 'lr=${lr}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0], params_values=dict(lr=lrs)),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, cache=CacheConfig(store=str(tmp_path / 'store'), volatile_params=['name']))
+    ran = tmp_path / grid / 'ran.txt'
+    return sorted(ran.read_text().split()) if ran.is_file() else [], capsys.readouterr().out
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_result_cache(tmp_path, write_script, engine, capsys):
+    ran, out = run(tmp_path, write_script, engine, 'first', 'monday', ['0.1', '0.2', '0.3'], capsys)
+    assert ran == ['0.1', '0.2', '0.3'] and 'Reused: 0' in out
+    assert len(os.listdir(tmp_path / 'store')) == 2 # the failed run is not stored
+
+    ran, out = run(tmp_path, write_script, engine, 'second', 'tuesday', ['0.1', '0.2', '0.3', '0.4'], capsys)
+    assert ran == ['0.3', '0.4'] and 'Reused: 2' in out
+    first, second = tmp_path / 'first' / 'runs' / 'lr=0.1', tmp_path / 'second' / 'runs' / 'lr=0.1'
+    assert (second / 'state.finished').is_file()
+    assert (second / 'ckpt.bin').read_bytes() == (first / 'ckpt.bin').read_bytes()
+    assert os.stat(second / 'ckpt.bin').st_nlink == 3 # linked to the store and to the first root folder
+    assert os.stat(second / 'metrics.json').st_nlink == 1 # the small files are copied
+    assert str(second) in (second / 'arguments.txt').read_text() and 'tuesday' in (second / 'arguments.txt').read_text()
@@ -0,0 +1,94 @@
+import os
+import json
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine, FakeProbe, GPUStats
+from gridsearcher.scheduler import GPUSlotScheduler
+
+# records the GPU it was started on and when it was running
+TRAIN = """
+import os, sys, json, time
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+start = time.time()
+time.sleep(0.3)
+with open(os.path.join(args['root'], 'run.json'), 'w') as w:
+    json.dump(dict(gpu=os.environ['CUDA_VISIBLE_DEVICES'], start=start, end=time.time()), w)
+"""
+
+def test_memory_reservations():
+    probe = FakeProbe({0: GPUStats(memory_total=40000, memory_used=30000), 1: GPUStats(memory_total=40000, memory_used=0)})
+    scheduler = GPUSlotScheduler([0, 1], max_jobs_per_gpu=4, probe=probe)
+
+    first = scheduler.try_acquire(1, memory=20000)
+    assert first == [1] # GPU 0 has only 10000 MiB free
+    assert scheduler.try_acquire(1, memory=20000) == [1] # 40000 free minus the reservation of the first run
+    assert scheduler.try_acquire(1, memory=20000) is None # the probe does not show the two runs yet, but they are reserved
+    assert scheduler.try_acquire(1, memory=5000) == [0]
+
+    probe.stats[1] = GPUStats(memory_total=40000, memory_used=40000) # the runs allocated their memory
+    assert scheduler.try_acquire(1, memory=20000) is None
+    scheduler.release(first)
+    probe.stats[1] = GPUStats(memory_total=40000, memory_used=20000) # and the first one freed it when it exited
+    assert scheduler.try_acquire(1, memory=20000) == [1]
+
+def test_max_utilization():
+    probe = FakeProbe({0: GPUStats(40000, 0, utilization=95), 1: GPUStats(40000, 0, utilization=10)})
+    scheduler = GPUSlotScheduler([0, 1], max_jobs_per_gpu=2, probe=probe, max_utilization=90)
+    assert [scheduler.try_acquire(1) for _ in range(3)] == [[1], [1], None]
+
+def test_exclusive_gpus_stay_exclusive():
+    scheduler = GPUSlotScheduler([0, 1], max_jobs_per_gpu=2)
+    exclusive = scheduler.try_acquire(1, exclusive=True)
+    assert exclusive == [0]
+    scheduler.set_max_jobs_per_gpu(4) # e.g. by the ConcurrencyTuner
+    assert [scheduler.try_acquire(1) for _ in range(5)] == [[1], [1], [1], [1], None]
+    assert scheduler.try_acquire(1, exclusive=True) is None # GPU 1 is busy
+    scheduler.release(exclusive)
+    assert scheduler.try_acquire(1) == [0]
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_memory_aware_placement(tmp_path, write_script, engine):
+    probe = FakeProbe({0: GPUStats(memory_total=40000, memory_used=20000), 1: GPUStats(memory_total=40000, memory_used=0)})
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', '${model}_${seed}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=4, gpus=[0, 1], gpu_probe=probe, lookahead=4,
+                                      memory_per_run=lambda params: 30000 if params['model'] == 'large' else 5000,
+                                      params_values=dict(model=['large', 'small'], seed=[0, 1, 2])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = {name: json.loads((tmp_path / 'runs' / name / 'run.json').read_text()) for name in os.listdir(tmp_path / 'runs')}
+    assert len(runs) == 6 and probe.n_queries > 0
+    large = sorted([run for name, run in runs.items() if name.startswith('large')], key=lambda run: run['start'])
+    assert all(run['gpu'] == '1' for run in large) # only GPU 1 has 30000 MiB free
+    assert all(prev['end'] <= run['start'] for prev, run in zip(large, large[1:])) # and only for one of them at a time
+
+def test_multi_gpu_runs_use_aligned_blocks():
+    scheduler = GPUSlotScheduler(list(range(8)), max_jobs_per_gpu=1)
+    assert scheduler.try_acquire(1) == [0]
+    assert scheduler.try_acquire(2) == [2, 3] # {0, 1} is not free anymore
+    assert scheduler.try_acquire(4) == [4, 5, 6, 7]
+    assert scheduler.try_acquire(1) == [1]
+    assert scheduler.try_acquire(1) is None
+
+    scheduler = GPUSlotScheduler(list(range(4)), max_jobs_per_gpu=1)
+    single = [scheduler.try_acquire(1) for _ in range(4)]
+    scheduler.release(single[1])
+    scheduler.release(single[2])
+    assert scheduler.try_acquire(2) == [1, 2] # no aligned block is free, but two consecutive GPUs are
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_gpus_per_run(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', '${model}_${seed}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0, 1, 2, 3], lookahead=4,
+                                      gpus_per_run=lambda params: 4 if params['model'] == 'large' else 1,
+                                      params_values=dict(model=['small', 'large'], seed=[0, 1, 2])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = {name: json.loads((tmp_path / 'runs' / name / 'run.json').read_text()) for name in os.listdir(tmp_path / 'runs')}
+    assert len(runs) == 6
+    for name, run in runs.items():
+        assert run['gpu'] == '0,1,2,3' if name.startswith('large') else len(run['gpu'].split(',')) == 1
+    for gpu in '0123': # a GPU never has two runs at the same time
+        spans = sorted((run['start'], run['end']) for run in runs.values() if gpu in run['gpu'].split(','))
+        assert all(prev[1] <= span[0] for prev, span in zip(spans, spans[1:]))
@@ -0,0 +1,77 @@
+import os
+import json
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine, Choice
+from gridsearcher.search_space import ABSENT, grid_params, expand_space, ConstraintFilter
+
+# records the parameters it received
+TRAIN = """
+import os, sys, json
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(args['root'], 'args.json'), 'w') as w:
+    json.dump(args, w)
+"""
+
+def optimizer_space():
+    return dict(lr=[1e-3, 1e-4], optimizer=Choice({
+        'adamw': dict(beta1=[0.9], beta2=[0.99, 0.999]),
+        'sgd': dict(momentum=[0, 0.9], nesterov=Choice({'yes': None, 'no': None})),
+        'adagrad': {},
+    }))
+
+def test_choice_expansion():
+    space = optimizer_space()
+    names = grid_params(space)
+    assert names == ['lr', 'optimizer', 'beta1', 'beta2', 'momentum', 'nesterov']
+
+    points = [dict(zip(names, values)) for values in expand_space(space)]
+    assert len(points) == 2 * (2 + 2 * 2 + 1) # instead of 2 * 3 * 2 * 2 * 2 * 2 for the cartesian product
+    assert len({tuple(p.values()) for p in points}) == len(points)
+    for p in points: # each point only has the parameters of its branches
+        present = {k for k, v in p.items() if v is not ABSENT}
+        assert present == {'lr', 'optimizer'} | {'adamw': {'beta1', 'beta2'}, 'sgd': {'momentum', 'nesterov'}, 'adagrad': set()}[p['optimizer']]
+
+    # without Choice parameters, the expansion is the cartesian product
+    assert list(expand_space(dict(a=[1, 2], b=[3]))) == [(1, 3), (2, 3)]
+
+def test_constraints_prune_lazily():
+    names = ['lr', 'optimizer', 'beta1', 'beta2', 'momentum', 'nesterov']
+    constraints = ['lr * scale < 0.005', 'momentum > 0', lambda p: p.get('beta2', 0) != 0.999]
+    constraint_filter = ConstraintFilter(constraints, names, fixed=dict(scale=10))
+
+    consumed = []
+    def grid():
+        for values in expand_space(optimizer_space()):
+            consumed.append(values)
+            yield values
+
+    kept = constraint_filter(grid())
+    first = next(kept) # the 7 points with lr=1e-3 are pruned, then the grid is not consumed further than the first kept point
+    assert len(consumed) == 8 and first[:3] == (1e-4, 'adamw', 0.9)
+    kept = [first] + list(kept)
+
+    # lr=1e-3 is removed by the fixed parameter; momentum=0 and beta2=0.999 are removed, while adagrad has neither parameter
+    assert [tuple(v for v in values[1:] if v is not ABSENT) for values in kept] == [
+        ('adamw', 0.9, 0.99), ('sgd', 0.9, 'yes'), ('sgd', 0.9, 'no'), ('adagrad',)]
+    assert constraint_filter.n_pruned == len(consumed) - len(kept) == 10
+
+    with pytest.raises(RuntimeError, match='ConstraintError'):
+        list(ConstraintFilter(['unknown > 0'], names, {})(expand_space(optimizer_space())))
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_choice_and_constraints_in_grid(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.add_param('epochs', 2)
+    gs.run(param_name_for_exp_root_folder='root',
+           exp_folder=Template(os.path.join(str(tmp_path), 'runs', '${optimizer}_lr=${lr}_b2=${beta2}_m=${momentum}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0, 1], params_values=dict(
+               lr=[0.1, 0.01], optimizer=Choice({'adamw': dict(beta2=[0.99, 0.999]), 'sgd': dict(momentum=[0, 0.9])})),
+               constraints=['lr * epochs < 0.1', 'momentum > 0']),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine)
+
+    runs = {name: json.loads((tmp_path / 'runs' / name / 'args.json').read_text()) for name in os.listdir(tmp_path / 'runs')}
+    assert sorted(runs) == ['adamw_lr=0.01_b2=0.999_m=', 'adamw_lr=0.01_b2=0.99_m=', 'sgd_lr=0.01_b2=_m=0.9']
+    for args in runs.values(): # the parameters of the other branch are not given to the script
+        expected = {'root', 'epochs', 'lr', 'optimizer'} | ({'beta2'} if args['optimizer'] == 'adamw' else {'momentum'})
+        assert set(args) == expected
@@ -0,0 +1,47 @@
+import os
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, ShardConfig, GSEngine
+from gridsearcher.sharding import assign_shards
+from gridsearcher.tools import GridPoint
+
+TRAIN = """
+import os, sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(os.path.dirname(os.path.dirname(args['root'])), 'ran.txt'), 'a') as w:
+    w.write(f"{args['i']} {args['name']}\\n")
+"""
+
+def run_shard(tmp_path, write_script, shard, launch_name, engine=GSEngine.POOL, n_points=12):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.add_param('name', Template('i=${i}_' + launch_name)) # e.g. a run name with the date of the launch, which differs between machines
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0], params_values=dict(i=list(range(n_points)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, shard=shard)
+
+def ran(tmp_path):
+    return [line.split() for line in (tmp_path / 'ran.txt').read_text().splitlines()]
+
+def test_partition_ignores_the_templates(tmp_path, write_script):
+    for index, launch_name in enumerate(['machine0_2024-01-01', 'machine1_2024-01-02', 'machine2_2024-01-03']):
+        run_shard(tmp_path, write_script, ShardConfig(shard_index=index, num_shards=3), launch_name)
+    runs = ran(tmp_path)
+    assert sorted(int(i) for i, name in runs) == list(range(12)) # each point ran exactly once
+    assert len(set(name.split('_')[1] for i, name in runs)) == 3 # and all shards got some points
+
+def test_cost_balanced_shards():
+    points = [GridPoint(index=i, cmd='', root=f'/tmp/{i}', cmd_dict={'_epochs': epochs, '_root': f'/tmp/{i}'})
+              for i, epochs in enumerate([8, 1, 1, 4, 2, 2, 1, 1])]
+    shards = assign_shards(points, ShardConfig(shard_index=0, num_shards=2, cost=lambda p: p['epochs']), ['epochs'])
+    assert [sum(p.cmd_dict['_epochs'] for p, s in zip(points, shards) if s == shard) for shard in [0, 1]] == [10, 10]
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_work_stealing(tmp_path, write_script, engine):
+    # the launcher of shard 1 (points 1, 8 and 10) claimed its last point, the first one a thief would steal, then stopped
+    os.makedirs(tmp_path / 'runs' / 'i=10')
+    (tmp_path / 'runs' / 'i=10' / 'state.claimed').write_text('1\n')
+
+    run_shard(tmp_path, write_script, ShardConfig(shard_index=0, num_shards=2, work_stealing=True), 'machine0', engine)
+    assert sorted(int(i) for i, name in ran(tmp_path)) == [i for i in range(12) if i != 10] # its own points and the unclaimed ones
+    claims = {i: (tmp_path / 'runs' / f'i={i}' / 'state.claimed').read_text().strip() for i in range(12)}
+    assert claims == {i: '1' if i == 10 else '0' for i in range(12)}
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import signal
+import threading
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, ShutdownConfig, GSEngine
+
+# the odd runs block while the file given by --block exists and save a checkpoint when they receive SIGTERM (they give up after
+# 30 seconds, such that the test fails instead of hanging if the signal is not forwarded)
+TRAIN = """
+import os, sys, json, time, signal
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(args['log'], 'a') as w:
+    w.write(json.dumps(dict(i=int(args['i']), resume='resume' in args)) + '\\n')
+
+def checkpoint(signum, frame):
+    open(os.path.join(args['root'], 'checkpoint'), 'w').close()
+    sys.exit(3)
+
+if int(args['i']) % 2 == 1 and 'resume' not in args and os.path.isfile(args['block']):
+    signal.signal(signal.SIGTERM, checkpoint)
+    open(os.path.join(args['root'], 'started'), 'w').close()
+    time.sleep(30)
+"""
+
+def send_when_started(paths, signum):
+    """
+        Sends `signum` to the GridSearcher process once all files in `paths` exist.
+    """
+    def wait_and_send():
+        deadline = time.time() + 30
+        while not all(os.path.isfile(path) for path in paths) and time.time() < deadline:
+            time.sleep(0.05)
+        os.kill(os.getpid(), signum)
+    thread = threading.Thread(target=wait_and_send, daemon=True)
+    thread.start()
+    return thread
+
+@pytest.mark.parametrize('use_ledger', [False, True])
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_interrupted_runs_are_resumed_first(tmp_path, write_script, engine, use_ledger, capsys):
+    log, block, runs = tmp_path / 'log.jsonl', tmp_path / 'block', tmp_path / 'runs'
+    block.write_text('')
+    ledger = str(tmp_path / 'ledger.jsonl') if use_ledger else None
+
+    def launch(values, max_jobs_per_gpu):
+        gs = GridSearcher(script=write_script('train.py', TRAIN))
+        gs.add_param('log', str(log))
+        gs.add_param('block', str(block))
+        gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(runs), 'i=${i}')),
+               cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=max_jobs_per_gpu, gpus=[0],
+                                          params_values=dict(i=values)),
+               cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, ledger=ledger,
+               shutdown=ShutdownConfig(grace_period=10, resume_flag='--resume 1'))
+
+    # the even runs exit right away, so both slots end up blocked by the runs 1 and 3 while 4 and 5 are still pending
+    thread = send_when_started([runs / 'i=1' / 'started', runs / 'i=3' / 'started'], signal.SIGTERM)
+    with pytest.raises(SystemExit) as stopped:
+        launch(list(range(6)), max_jobs_per_gpu=2)
+    thread.join()
+    assert stopped.value.code == 128 + signal.SIGTERM
+    assert 'Interrupted: 2' in capsys.readouterr().out
+    assert signal.getsignal(signal.SIGTERM) is signal.SIG_DFL # the previous handler is restored
+
+    assert sorted(os.listdir(runs)) == ['i=0', 'i=1', 'i=2', 'i=3']
+    for i in [1, 3]: # the runs got the signal and saved their checkpoint within the grace period
+        assert (runs / f'i={i}' / 'checkpoint').is_file()
+        assert (runs / f'i={i}' / 'state.interrupted').read_text() == 'SIGTERM\n'
+        assert not (runs / f'i={i}' / 'state.finished').exists()
+    if use_ledger:
+        status = {}
+        for line in open(ledger):
+            record = json.loads(line)
+            if 'root' in record:
+                status[os.path.basename(record['root'])] = record['status']
+        assert status == {'i=0': 'finished', 'i=1': 'interrupted', 'i=2': 'finished', 'i=3': 'interrupted'}
+
+    # the next launch adds values in front of the grid, but the interrupted runs are started first, with the resume flag
+    block.unlink()
+    log.write_text('')
+    launch(list(range(-2, 6)), max_jobs_per_gpu=1)
+    assert 'Resuming:\t2 runs interrupted by a previous launch, with --resume 1' in capsys.readouterr().out
+    started = [json.loads(line) for line in log.read_text().splitlines()]
+    assert started == [dict(i=1, resume=True), dict(i=3, resume=True)] + [dict(i=i, resume=False) for i in [-2, -1, 4, 5]]
+    for i in range(-2, 6):
+        assert (runs / f'i={i}' / 'state.finished').is_file()
+        assert not (runs / f'i={i}' / 'state.interrupted').exists()
@@ -0,0 +1,112 @@
+import os
+import sys
+from dataclasses import replace
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, SlurmConfig
+from gridsearcher.slurm import array_spec, claims_folder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# records its arguments and runs the tasks of the array right away, all at the same time (the % throttle is only checked in the log)
+FAKE_SBATCH = f"""#!{sys.executable}
+import os, sys, subprocess
+with open(os.environ['FAKE_SBATCH_LOG'], 'a') as w:
+    w.write(' '.join(sys.argv[1:]) + '\\n')
+args = dict(arg[2:].split('=', 1) for arg in sys.argv[1:-1])
+indices = []
+for part in args['array'].split('%')[0].split(','):
+    start, _, end = part.partition('-')
+    indices.extend(range(int(start), int(end or start) + 1))
+env = dict(os.environ, SLURM_GPUS_ON_NODE='1')
+env.pop('CUDA_VISIBLE_DEVICES', None)
+tasks = [subprocess.Popen([sys.argv[-1]], env=dict(env, SLURM_ARRAY_TASK_ID=str(i), SLURM_JOB_ID=f'100_{{i}}')) for i in indices]
+sys.exit(max([task.wait() for task in tasks]))
+"""
+
+TRAIN = """
+import os, sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(os.path.dirname(os.path.dirname(args['root'])), 'ran.txt'), 'a') as w:
+    w.write(args['i'] + '\\n')
+"""
+
+@pytest.fixture
+def sbatch_log(tmp_path, monkeypatch):
+    """
+        Puts the fake sbatch first in PATH and returns the path of the file with the arguments of its calls.
+    """
+    bin_folder = tmp_path / 'bin'
+    bin_folder.mkdir()
+    (bin_folder / 'sbatch').write_text(FAKE_SBATCH)
+    os.chmod(bin_folder / 'sbatch', 0o755)
+    monkeypatch.setenv('PATH', f'{bin_folder}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('PYTHONPATH', ROOT) # the batch script imports gridsearcher on the "compute node"
+    monkeypatch.setenv('FAKE_SBATCH_LOG', str(tmp_path / 'sbatch.log'))
+    return tmp_path / 'sbatch.log'
+
+def submit(tmp_path, write_script, n_points, slurm):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0],
+                                      params_values=dict(i=list(range(n_points)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), slurm=slurm)
+
+def read_lines(path):
+    return path.read_text().splitlines() if path.is_file() else []
+
+def test_array_spec():
+    assert array_spec([0, 1, 2, 5, 7, 8]) == '0-2,5,7-8'
+    assert array_spec([3]) == '3'
+    assert array_spec([0, 1, 2, 3], max_concurrent=2) == '0-3%2'
+
+def test_array_skips_finished_points(tmp_path, write_script, sbatch_log):
+    for i in [2, 3]: # finished by a previous submission
+        os.makedirs(tmp_path / 'runs' / f'i={i}')
+        (tmp_path / 'runs' / f'i={i}' / 'state.finished').touch()
+
+    slurm = SlurmConfig(manifest=str(tmp_path / 'grid.jsonl'), sbatch_args={'job-name': 'grid'}, max_concurrent=2)
+    submit(tmp_path, write_script, 6, slurm)
+    calls = read_lines(sbatch_log)
+    assert len(calls) == 1
+    assert '--job-name=grid' in calls[0].split() and '--array=0-1,4-5%2' in calls[0].split()
+    assert sorted(read_lines(tmp_path / 'ran.txt')) == ['0', '1', '4', '5']
+    assert all((tmp_path / 'runs' / f'i={i}' / 'state.finished').is_file() for i in range(6))
+
+    submit(tmp_path, write_script, 6, slurm) # all points are finished, nothing is submitted
+    assert len(read_lines(sbatch_log)) == 1
+
+def test_pack_workers_claim_each_point_once(tmp_path, write_script, sbatch_log):
+    slurm = SlurmConfig(manifest=str(tmp_path / 'grid.jsonl'), sbatch_args={'time': '10:00'}, max_concurrent=3, pack_workers=3,
+                        pack_batch_size=2)
+    submit(tmp_path, write_script, 7, slurm)
+    calls = read_lines(sbatch_log)
+    assert len(calls) == 1 and '--array=0-2%3' in calls[0].split()
+    assert calls[0].split()[-1].endswith('grid.sh')
+
+    assert sorted(read_lines(tmp_path / 'ran.txt'), key=int) == [str(i) for i in range(7)] # each point ran exactly once
+    claims = {int(name): (tmp_path / 'grid.claims' / name).read_text().strip() for name in os.listdir(claims_folder(slurm.manifest))}
+    assert sorted(claims) == list(range(7))
+    assert set(claims.values()) <= {'100_0', '100_1', '100_2'}
+    assert all((tmp_path / 'runs' / f'i={i}' / 'state.finished').is_file() for i in range(7))
+
+def test_pack_workers_keep_the_claims_of_previous_submissions(tmp_path, write_script, sbatch_log):
+    slurm = SlurmConfig(manifest=str(tmp_path / 'grid.jsonl'), sbatch_args={'time': '10:00'}, pack_workers=2)
+    os.makedirs(claims_folder(slurm.manifest))
+    for i in [1, 3]: # claimed by a worker of a previous submission which is still running
+        (tmp_path / 'grid.claims' / str(i)).write_text('99\n')
+    submit(tmp_path, write_script, 4, slurm)
+    assert sorted(read_lines(tmp_path / 'ran.txt')) == ['0', '2']
+    assert (tmp_path / 'grid.claims' / '1').read_text() == '99\n'
+
+    submit(tmp_path, write_script, 4, slurm) # the unfinished points are all claimed, nothing is submitted
+    assert len(read_lines(sbatch_log)) == 1
+
+    submit(tmp_path, write_script, 4, replace(slurm, reset_claims=True)) # the previous worker is gone
+    assert sorted(read_lines(tmp_path / 'ran.txt')) == ['0', '1', '2', '3']
+    assert len(read_lines(sbatch_log)) == 2
+
+def test_paths_with_spaces(tmp_path, write_script, sbatch_log):
+    slurm = SlurmConfig(manifest=str(tmp_path / 'my grids' / 'grid.jsonl'), sbatch_args={})
+    submit(tmp_path, write_script, 2, slurm)
+    assert sorted(read_lines(tmp_path / 'ran.txt')) == ['0', '1']
@@ -0,0 +1,61 @@
+import os
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine
+from gridsearcher import async_engine
+
+TRAIN = """
+import os, sys
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+with open(os.path.join(args['root'], 'cmd.txt'), 'w') as w:
+    w.write(' '.join(sys.argv[1:]))
+"""
+
+def run(tmp_path, script, engine, streaming, folder):
+    gs = GridSearcher(script=script, defaults=dict(epochs=3))
+    gs.add_param('name', Template('lr=${lr}_wd=${wd}'))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), folder, '${name}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0, 1],
+                                      params_values=dict(lr=[0.1, 0.01, 0.001], wd=[0, 1e-4])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, streaming=streaming)
+    runs = {}
+    for name in os.listdir(tmp_path / folder):
+        root = tmp_path / folder / name
+        if (root / 'cmd.txt').is_file():
+            runs[name] = (root / 'cmd.txt').read_text().replace(str(tmp_path / folder), '')
+    return runs
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_streaming_runs_the_same_commands(tmp_path, write_script, engine):
+    script = write_script('train.py', TRAIN)
+    for folder in ['list', 'stream']: # a run finished by a previous launch is skipped in both modes
+        os.makedirs(tmp_path / folder / 'lr=0.01_wd=0')
+        (tmp_path / folder / 'lr=0.01_wd=0' / 'state.finished').touch()
+
+    listed = run(tmp_path, script, engine, False, 'list')
+    streamed = run(tmp_path, script, engine, True, 'stream')
+    assert len(listed) == 5 and listed == streamed
+    assert listed['lr=0.1_wd=0.0001'] == '--epochs 3 --name lr=0.1_wd=0.0001 --lr 0.1 --wd 0.0001 --root /lr=0.1_wd=0.0001'
+    assert all((tmp_path / 'stream' / name / 'state.finished').is_file() for name in streamed)
+
+def test_streaming_expands_the_grid_lazily(tmp_path, write_script, monkeypatch):
+    events = []
+    render_points = GridSearcher._render_points
+    def rendering(renderer, grid):
+        for point in render_points(renderer, grid):
+            events.append(('render', point.index))
+            yield point
+    prepare_root = async_engine.prepare_root
+    def starting(point):
+        events.append(('start', point.index))
+        prepare_root(point)
+    monkeypatch.setattr(GridSearcher, '_render_points', staticmethod(rendering))
+    monkeypatch.setattr(async_engine, 'prepare_root', starting)
+
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'lr=${lr}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0], params_values=dict(lr=list(range(20)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=GSEngine.ASYNCIO, streaming=True)
+    assert sorted(events) == sorted([('render', i) for i in range(20)] + [('start', i) for i in range(20)])
+    # at most one point is rendered ahead of the running one, instead of rendering the whole grid first
+    assert all(events.index(('start', i)) < events.index(('render', i + 2)) for i in range(18))
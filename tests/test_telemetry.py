@@ -0,0 +1,65 @@
+import os
+import json
+import time
+import urllib.request
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, TelemetryConfig, GSEngine
+from gridsearcher.tools import GridPoint
+from gridsearcher.telemetry import Telemetry
+from gridsearcher.scheduler import PointQueue
+
+TRAIN = """
+import sys, time
+args = {k[2:]: v for k, v in zip(sys.argv[1::2], sys.argv[2::2])}
+time.sleep(0.5)
+sys.exit(int(args['code']))
+"""
+
+def point(index):
+    return GridPoint(index=index, cmd='', root=f'/tmp/{index}', cmd_dict={'_i': index})
+
+def test_queue_wait_starts_when_the_point_can_be_placed():
+    telemetry = Telemetry(TelemetryConfig(status_file='status.json'), SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0], params_values=dict(i=[0])))
+    telemetry.start -= 100 # the grid started long ago
+
+    queue = PointQueue([point(0)], lambda point: 1)
+    queue.push_later(point(1), 0.2) # e.g. a retry
+    assert not queue.empty() and queue.buffer[0].index == 0
+    time.sleep(0.3)
+    queue.empty()
+    retried = queue.buffer[0]
+    assert retried.index == 1 and time.time() - 0.2 < retried.queued # queued when its delay passed, not when it was delayed
+
+    retried.queued -= 2
+    telemetry.on_launch(retried, [0])
+    assert 2 <= telemetry.snapshot()['queue_wait_mean'] < 3
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_telemetry(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}_code=${code}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=1, gpus=[0, 1],
+                                      params_values=dict(i=[0, 1, 2], code=[0, 1])),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine,
+           telemetry=TelemetryConfig(port=0, status_file=str(tmp_path / 'status.json'), interval=0.1))
+
+    status = json.loads((tmp_path / 'status.json').read_text())
+    assert (status['queued'], status['running'], status['finished'], status['failed']) == (0, 0, 3, 3)
+    assert status['gpu_slots'] == {'0': dict(used=0, total=1), '1': dict(used=0, total=1)}
+    assert 0.5 <= status['duration_mean'] < 1.5 and status['eta_seconds'] == 0
+    # 6 runs of 0.5 seconds on 2 slots, one pending point at a time: the 3rd and the 5th runs wait about 0.5 seconds for a free slot,
+    # while measuring from the start of the grid would give waits of 0, 0, 0.5, 0.5, 1 and 1 second
+    assert 0.1 < status['queue_wait_mean'] < 0.35
+
+def test_prometheus_endpoint():
+    telemetry = Telemetry(TelemetryConfig(port=0), SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0, 1], params_values=dict(i=[0])),
+                          counts=dict(total=4, runnable=3))
+    telemetry.start_publishing()
+    try:
+        telemetry.on_launch(point(0), [1])
+        body = urllib.request.urlopen(f'http://127.0.0.1:{telemetry._server.server_address[1]}/metrics').read().decode()
+    finally:
+        telemetry.stop_publishing()
+    assert 'gridsearcher_runs{state="queued"} 2' in body and 'gridsearcher_runs{state="running"} 1' in body
+    assert 'gridsearcher_gpu_slots_used{gpu="1"} 1' in body and 'gridsearcher_gpu_slots_total{gpu="0"} 2' in body
@@ -0,0 +1,40 @@
+import os
+import json
+from collections import defaultdict
+from string import Template
+import pytest
+from gridsearcher import GridSearcher, SchedulingConfig, TorchRunConfig, GSEngine
+
+TRAIN = """
+import time
+time.sleep(0.2)
+"""
+
+@pytest.mark.parametrize('engine', [GSEngine.POOL, GSEngine.ASYNCIO])
+def test_trace(tmp_path, write_script, engine):
+    gs = GridSearcher(script=write_script('train.py', TRAIN))
+    gs.run(param_name_for_exp_root_folder='root', exp_folder=Template(os.path.join(str(tmp_path), 'runs', 'i=${i}')),
+           cfg_sched=SchedulingConfig(distributed_training=False, max_jobs_per_gpu=2, gpus=[0], params_values=dict(i=list(range(5)))),
+           cfg_torchrun=TorchRunConfig(torchrun=False), engine=engine, trace=str(tmp_path / 'trace.json'))
+
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    tracks = {event['tid']: event['args']['name'] for event in events if event['name'] == 'thread_name'}
+    assert sorted(tracks.values()) == ['GPU 0 slot 0', 'GPU 0 slot 1', 'GridSearcher']
+
+    launcher = [event['name'] for event in events if event.get('ph') == 'X' and tracks[event['tid']] == 'GridSearcher']
+    assert launcher == ['expand grid and check finished runs', 'pause', 'execute']
+
+    runs = defaultdict(list)
+    for event in events:
+        if event['name'] == 'run':
+            runs[tracks[event['tid']]].append((event['ts'], event['ts'] + event['dur']))
+    assert sum(len(spans) for spans in runs.values()) == 5
+    for spans in runs.values(): # the runs of a slot do not overlap
+        spans.sort()
+        assert all(prev[1] <= span[0] for prev, span in zip(spans, spans[1:]))
+
+    waits = defaultdict(dict)
+    for event in events:
+        if event.get('cat') == 'queue':
+            waits[event['id']][event['ph']] = event['ts']
+    assert len(waits) == 5 and all(0 <= wait['e'] - wait['b'] < 0.5e6 for wait in waits.values())